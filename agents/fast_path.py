@@ -0,0 +1,164 @@
+# agents/fast_path.py
+"""
+Rule-based text-to-SQL for the common question shapes in few_shot_examples/examples.py.
+
+A question is answered here only when it names exactly one place and every
+other word is part of the template vocabulary below; anything else goes to the
+LLM. Place names come from the geography index, so the emitted SQL filters on
+the exact geo_id and no user text is pasted into it.
+"""
+from utils.geo_index import LEVEL_WORDS, LEVELS, tokenize
+
+# ---------------- Vocabulary ----------------
+DESC_WORDS = {"most", "highest", "largest", "maximum", "max", "top", "biggest", "greatest", "more"}
+ASC_WORDS = {"least", "lowest", "smallest", "minimum", "min", "bottom", "fewest", "underrepresented", "less"}
+CATEGORY_WORDS = {"beneficiary", "beneficiaries", "category", "categories", "group", "groups", "caste", "social"}
+LIST_WORDS = {"compare", "comparison", "show", "list", "display", "breakdown", "all", "each", "every", "across",
+              "distribution", "split", "allocations", "allocation", "allocated"}
+RECONCILE_WORDS = {"add", "sum", "up", "reconcile", "match", "tally", "consistent"}
+
+# Fund-flow indicators (state level only), keyed by the words that ask for them
+METRIC_WORDS = {
+    "allocated": "Allocated_Total",
+    "allocation": "Allocated_Total",
+    "allocations": "Allocated_Total",
+    "released": "Released_Total",
+    "release": "Released_Total",
+    "available": "Total Available Funds",
+    "utilization": "Utilization of Funds",
+    "utilisation": "Utilization of Funds",
+    "utilized": "Utilization of Funds",
+    "utilised": "Utilization of Funds",
+    "spent": "Utilization of Funds",
+    "opening": "Opening Balance",
+    "balance": "Opening Balance",
+}
+PERCENT_WORDS = {"percentage", "percent"}
+
+# Words that carry no meaning for the templates
+FILLER_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "has", "have", "had", "do", "does", "did",
+    "what", "which", "how", "much", "please", "can", "could", "you", "me", "tell", "give", "find", "get", "got",
+    "received", "receive", "receives", "given", "of", "in", "for", "to", "at", "on", "from", "within", "under",
+    "by", "and", "versus", "vs", "with", "between", "fund", "funds", "funding", "money", "amount", "amounts",
+    "total", "so", "far", "there", "this", "that", "its", "their", "wise", "gram",
+    "states", "pmay", "g", "pmayg",
+}
+CHILD_LEVEL_WORDS = {
+    "districts": "district",
+    "blocks": "block",
+    "talukas": "block",
+    "panchayats": "panchayat",
+    "villages": "panchayat",
+}
+
+VOCABULARY = (DESC_WORDS | ASC_WORDS | CATEGORY_WORDS | LIST_WORDS | RECONCILE_WORDS | set(METRIC_WORDS)
+              | PERCENT_WORDS | FILLER_WORDS | set(LEVEL_WORDS) | set(CHILD_LEVEL_WORDS))
+
+
+def quote(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def place_filter(place):
+    return f"geo_level={quote(place['level'])} AND geo_name={quote(place['name'])} AND geo_id={int(place['id'])}"
+
+
+def ancestor_filter(path):
+    """Rollup or wide-table filter selecting descendants of the first place in path (the place, then its ancestors)."""
+    return " AND ".join(f"{p.level}_name={quote(p.name)}" for p in reversed(path))
+
+
+# ---------------- Templates ----------------
+# A place's own figure, else the sum over its children: states report no
+# beneficiary figures of their own (as in pmayg_state_wide and utils/geo_tree.py)
+AMOUNT = "COALESCE(amount, children_amount, 0)"
+
+
+def fund_flow_sql(place, indicators):
+    names = ", ".join(quote(i) for i in indicators)
+    return f"""SELECT indicator, {AMOUNT} AS total
+FROM pmayg_rollup
+WHERE {place_filter(place)} AND indicator IN ({names})
+ORDER BY indicator;"""
+
+
+def categories_sql(place, order):
+    return f"""SELECT indicator, {AMOUNT} AS total
+FROM pmayg_rollup
+WHERE {place_filter(place)} AND indicator_type='beneficiary'
+ORDER BY total {order};"""
+
+
+def reconcile_sql(place):
+    return f"""SELECT indicator, COALESCE(amount,0) AS {place['level']}_total, COALESCE(children_amount,0) AS children_sum
+FROM pmayg_rollup
+WHERE {place_filter(place)} AND indicator_type='beneficiary'
+ORDER BY indicator;"""
+
+
+def children_sql(path, child_level):
+    return f"""SELECT {child_level}_name, COALESCE(sc,0) AS sc, COALESCE(st,0) AS st, COALESCE(minority,0) AS minority,
+       COALESCE(others,0) AS others, COALESCE(total,0) AS total
+FROM pmayg_{child_level}_wide
+WHERE {ancestor_filter(path)}
+ORDER BY {child_level}_name;"""
+
+
+# ---------------- Matching ----------------
+def match(question, places, geo_index):
+    """(intent, SQL) for a question that fits a template, or None."""
+    if len(places) != 1:
+        return None
+    place = places[0]
+
+    mention_words = set(tokenize(place["mention"]))
+    words = [w for w in tokenize(question) if w not in mention_words]
+    if not words or any(w not in VOCABULARY for w in words):
+        return None
+    present = set(words)
+
+    descending = bool(present & DESC_WORDS)
+    ascending = bool(present & ASC_WORDS)
+    if "underrepresented" in present:
+        # "(most) underrepresented" asks for the smallest share, "least underrepresented" for the largest
+        least = bool(present & (ASC_WORDS - {"underrepresented"}))
+        if present & (DESC_WORDS - {"most"}) or (least and "most" in present):
+            return None  # another ordering word as well: leave it to the LLM
+        ascending, descending = not least, least
+    wants_categories = bool(present & CATEGORY_WORDS)
+    child_levels = {CHILD_LEVEL_WORDS[w] for w in present & set(CHILD_LEVEL_WORDS)}
+
+    if child_levels:
+        if len(child_levels) != 1 or descending or ascending or not present & LIST_WORDS:
+            return None
+        child_level = child_levels.pop()
+        if LEVELS.index(child_level) <= LEVELS.index(place["level"]):
+            return None
+        path = geo_index.path(geo_index.get(place["level"], place["id"]))
+        if present & RECONCILE_WORDS:
+            return None
+        return "children", children_sql(path, child_level)
+
+    if present & RECONCILE_WORDS >= {"add", "up"} or present & (RECONCILE_WORDS - {"add", "up", "sum"}):
+        if descending or ascending or place["level"] == "panchayat":
+            return None
+        return "reconcile", reconcile_sql(place)
+
+    if wants_categories:
+        if descending and ascending:
+            return None
+        if descending or ascending:
+            return ("top_category" if descending else "bottom_category"), categories_sql(place, "DESC" if descending else "ASC")
+        if present & LIST_WORDS:
+            return "categories", categories_sql(place, "DESC")
+        return None
+
+    metrics = {METRIC_WORDS[w] for w in present & set(METRIC_WORDS)}
+    if present & PERCENT_WORDS:
+        if metrics - {"Utilization of Funds"}:
+            return None
+        metrics = {"Percentage Utilization"}
+    if metrics and place["level"] == "state" and not (descending or ascending):
+        return "fund_flow", fund_flow_sql(place, sorted(metrics))
+    return None
@@ -1,15 +1,19 @@
-from agents.llm_client import llm
+from agents.llm_client import astream_text, stream_text, stream_writer
 import pandas as pd
 
-def insights_agent(state):
+from utils.result_summary import summarize_result
+
+def insights_prompt(state):
     result = state.get("query_result", None)
-    query = state.get("user_query", "")
+    query = state["messages"][-1] if state.get("messages") else ""
     sql = state.get("sql_query", "")
 
     # ---------------- Preprocess the result ----------------
     def preprocess_result(result):
         if isinstance(result, pd.DataFrame):
-            return result.to_dict(orient="records")
+            # CSV for small results, statistics and top/bottom rows for large ones,
+            # so the prompt stays within INSIGHTS_TOKEN_BUDGET
+            return summarize_result(result, truncated=state.get("query_truncated", False))
         elif isinstance(result, list):
             return result if result else "No relevant data found."
         return str(result) if result else "No relevant data found."
@@ -42,6 +46,23 @@ Focus on making the data interpretable and meaningful for the user's question.
 Always answer the user's question directly and clearly FIRST.
 ONLY RETURN INSIGHTS. DO NOT RETURN SQL OR RAW DATA. DO NOT REPEAT THE USER'S QUESTION.
 """
-    
-    response = llm.invoke(prompt)
-    return {"insights": response.content}
+    return prompt
+
+def insights_agent(state):
+    # Tokens are published to the graph's custom stream as they arrive, so the
+    # app can render the insights while the LLM is still writing them
+    emit = stream_writer()
+    parts = []
+    for text in stream_text(insights_prompt(state)):
+        parts.append(text)
+        emit({"insights": text})
+    return {"insights": "".join(parts)}
+
+async def ainsights_agent(state):
+    """Async insights_agent."""
+    emit = stream_writer()
+    parts = []
+    async for text in astream_text(insights_prompt(state)):
+        parts.append(text)
+        emit({"insights": text})
+    return {"insights": "".join(parts)}
@@ -1,10 +1,473 @@
-from langchain_groq import ChatGroq
+import asyncio
+import hashlib
 import os
+import random
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
 from dotenv import load_dotenv
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langgraph.config import get_stream_writer
+
+from utils import tracing
 
 load_dotenv()
 
-llm = ChatGroq(
-    model="llama-3.1-8b-instant",  # lightweight & fast
-    api_key=os.getenv("GROQ_API_KEY"),
-)
\ No newline at end of file
+LLM_BACKEND = os.getenv("LLM_BACKEND", "groq")                       # 'groq', or 'fake' to run without network
+LLM_MODEL = os.getenv("LLM_MODEL", "llama-3.1-8b-instant")          # lightweight & fast
+REQUESTS_PER_MINUTE = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "30"))
+TOKENS_PER_MINUTE = float(os.getenv("LLM_TOKENS_PER_MINUTE", "6000"))
+MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+TIMEOUT = float(os.getenv("LLM_TIMEOUT", "60"))                      # seconds per attempt
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "0.5"))           # seconds; doubled per attempt, fully jittered
+BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "20"))
+FAKE_LATENCY_MS = float(os.getenv("LLM_FAKE_LATENCY_MS", "300"))
+FAKE_ERROR_RATE = float(os.getenv("LLM_FAKE_ERROR_RATE", "0"))       # share of fake calls that fail with a 429
+CHARS_PER_TOKEN = 4
+
+
+class LLMRateLimited(Exception):
+    """The backend rejected the call for rate limiting (HTTP 429)."""
+
+
+class LLMUnavailable(RuntimeError):
+    """An LLM call still failed after every retry."""
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+# ---------------- Backends ----------------
+class FakeChatModel:
+    """
+    Deterministic stand-in for ChatGroq, for running and benchmarking the
+    pipeline with no network. A text-to-SQL prompt (ending in "SQL:") is answered
+    with the first few-shot example's SQL; anything else gets a short text derived
+    from a hash of the prompt. Each call takes LLM_FAKE_LATENCY_MS.
+    """
+
+    SQL_RE = re.compile(r"^SQL:\s*(SELECT.*?;)", re.DOTALL | re.MULTILINE | re.IGNORECASE)
+
+    def __init__(self, latency_ms=FAKE_LATENCY_MS, error_rate=FAKE_ERROR_RATE, seed=0):
+        self.latency = latency_ms / 1000
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+
+    def respond(self, prompt):
+        if prompt.rstrip().endswith("SQL:"):
+            match = self.SQL_RE.search(prompt)
+            return match.group(1) if match else "SELECT 1 AS answer;"
+        digest = hashlib.sha256(prompt.encode()).hexdigest()
+        return (f"The data answers the question directly (ref {digest[:8]}).\n"
+                f"- The largest category accounts for most of the total.\n"
+                f"- Smaller categories receive a minor share of the funds.")
+
+    def _fail(self):
+        with self._random_lock:
+            return self._random.random() < self.error_rate
+
+    def _message(self, prompt, text, cls=AIMessage):
+        usage = {"input_tokens": estimate_tokens(prompt), "output_tokens": estimate_tokens(text)}
+        usage["total_tokens"] = usage["input_tokens"] + usage["output_tokens"]
+        return cls(content=text, usage_metadata=usage)
+
+    def _pieces(self, text):
+        words = re.findall(r"\S+\s*", text)
+        return words, self.latency / max(len(words), 1)
+
+    def invoke(self, prompt):
+        time.sleep(self.latency)
+        if self._fail():
+            raise LLMRateLimited("fake backend: rate limit")
+        return self._message(prompt, self.respond(prompt))
+
+    async def ainvoke(self, prompt):
+        await asyncio.sleep(self.latency)
+        if self._fail():
+            raise LLMRateLimited("fake backend: rate limit")
+        return self._message(prompt, self.respond(prompt))
+
+    def stream(self, prompt):
+        if self._fail():
+            raise LLMRateLimited("fake backend: rate limit")
+        words, delay = self._pieces(self.respond(prompt))
+        for word in words:
+            time.sleep(delay)
+            yield AIMessageChunk(content=word)
+
+    async def astream(self, prompt):
+        if self._fail():
+            raise LLMRateLimited("fake backend: rate limit")
+        words, delay = self._pieces(self.respond(prompt))
+        for word in words:
+            await asyncio.sleep(delay)
+            yield AIMessageChunk(content=word)
+
+
+def make_backend():
+    if LLM_BACKEND == "fake":
+        return FakeChatModel()
+    from langchain_groq import ChatGroq
+
+    return ChatGroq(
+        model=LLM_MODEL,
+        api_key=os.getenv("GROQ_API_KEY"),
+        request_timeout=TIMEOUT,
+        max_retries=0,  # retries are done by the gateway, with backoff shared across calls
+    )
+
+
+def retryable_errors():
+    errors = [LLMRateLimited, TimeoutError]
+    try:
+        import groq
+
+        errors += [groq.RateLimitError, groq.APITimeoutError, groq.APIConnectionError, groq.InternalServerError]
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+def retry_after(error):
+    """Seconds the server asked us to wait (Retry-After header), if any."""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+# ---------------- Rate limiting ----------------
+class TokenBucket:
+    """
+    Token bucket refilled at rate per second up to capacity. reserve() takes
+    tokens immediately (the level may go negative) and returns how long the
+    caller must wait for them, so waiting callers are served in arrival order.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, tokens=1):
+        if self.rate <= 0:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            self.level -= min(tokens, self.capacity)
+            return max(0.0, -self.level / self.rate)
+
+
+class _Slot:
+    """A concurrency slot held by a streamed call; release() is safe to call more than once."""
+
+    def __init__(self, semaphore):
+        self._semaphore = semaphore
+        self._held = True
+
+    def release(self):
+        if self._held:
+            self._held = False
+            self._semaphore.release()
+
+
+# ---------------- Gateway ----------------
+class LLMGateway:
+    """
+    Single entry point for LLM calls: rate limits (requests and tokens per
+    minute), caps concurrent calls, retries transient failures with jittered
+    exponential backoff, and shares one in-flight call between identical
+    concurrent invoke() requests. invoke/ainvoke/stream/astream mirror the
+    LangChain chat model methods the agents use.
+    """
+
+    def __init__(self, backend, requests_per_minute=REQUESTS_PER_MINUTE, tokens_per_minute=TOKENS_PER_MINUTE,
+                 max_concurrency=MAX_CONCURRENCY, timeout=TIMEOUT, max_retries=MAX_RETRIES):
+        self.backend = backend
+        self.requests = TokenBucket(requests_per_minute / 60, max(1.0, requests_per_minute / 6))
+        self.tokens = TokenBucket(tokens_per_minute / 60, max(1.0, tokens_per_minute / 6))
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retryable = retryable_errors()
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._inflight = {}  # prompt hash -> Future shared by identical concurrent calls
+        self._inflight_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.calls = deque(maxlen=1000)  # recent per-call records
+        self.stats = {"calls": 0, "errors": 0, "retries": 0, "deduplicated": 0, "seconds": 0.0,
+                      "wait_seconds": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    # ---------------- Accounting ----------------
+    def _record(self, kind, started, waited, prompt, text, usage, attempts, error=None, deduplicated=False):
+        usage = usage or {}
+        record = {
+            "kind": kind,
+            "seconds": time.perf_counter() - started,
+            "wait_seconds": waited,
+            "prompt_tokens": usage.get("input_tokens") or estimate_tokens(prompt),
+            "completion_tokens": usage.get("output_tokens") or estimate_tokens(text or ""),
+            "retries": max(attempts - 1, 0),
+            "deduplicated": deduplicated,
+            "error": type(error).__name__ if error else None,
+        }
+        with self._stats_lock:
+            self.calls.append(record)
+            self.stats["calls"] += 1
+            self.stats["errors"] += error is not None
+            self.stats["deduplicated"] += deduplicated
+            for key in ("retries", "seconds", "wait_seconds", "prompt_tokens", "completion_tokens"):
+                self.stats[key] += record[key]
+        tracing.record(f"llm.{kind}", record["seconds"], **{k: v for k, v in record.items() if k not in ("kind", "seconds")})
+        return record
+
+    def metrics(self):
+        with self._stats_lock:
+            snapshot = dict(self.stats)
+        calls = snapshot["calls"] - snapshot["deduplicated"]
+        snapshot["avg_seconds"] = snapshot["seconds"] / snapshot["calls"] if snapshot["calls"] else 0.0
+        snapshot["backend_calls"] = calls
+        return snapshot
+
+    # ---------------- Admission ----------------
+    def _admission_delay(self, prompt):
+        return max(self.requests.reserve(1), self.tokens.reserve(estimate_tokens(prompt)))
+
+    def _backoff(self, attempt, error):
+        delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        hinted = retry_after(error)
+        return max(delay, hinted) if hinted else delay
+
+    def _acquire_slot(self):
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError(f"No LLM slot free within {self.timeout}s")
+
+    async def _aacquire_slot(self):
+        # The slots are shared with threads making sync calls, so a busy slot is
+        # waited for in a worker thread rather than on the event loop
+        if self._slots.acquire(blocking=False):
+            return
+        acquire = asyncio.ensure_future(asyncio.to_thread(self._slots.acquire, timeout=self.timeout))
+        try:
+            acquired = await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            # The thread may still get the slot after the caller stopped waiting: give it back
+            acquire.add_done_callback(lambda f: not f.cancelled() and f.result() and self._slots.release())
+            raise
+        if not acquired:
+            raise TimeoutError(f"No LLM slot free within {self.timeout}s")
+
+    # ---------------- Calls ----------------
+    def _call(self, prompt):
+        started = time.perf_counter()
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            delay = self._admission_delay(prompt)
+            time.sleep(delay)
+            waited += delay
+            self._acquire_slot()
+            try:
+                response = self.backend.invoke(prompt)
+            except self.retryable as e:
+                if attempt == self.max_retries:
+                    self._record("invoke", started, waited, prompt, None, None, attempt + 1, e)
+                    raise LLMUnavailable(f"LLM call failed after {attempt + 1} attempts: {e}") from e
+                error = e
+            else:
+                self._record("invoke", started, waited, prompt, response.content,
+                             getattr(response, "usage_metadata", None), attempt + 1)
+                return response
+            finally:
+                self._slots.release()
+            pause = self._backoff(attempt, error)
+            time.sleep(pause)
+            waited += pause
+
+    async def _acall(self, prompt):
+        started = time.perf_counter()
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            delay = self._admission_delay(prompt)
+            await asyncio.sleep(delay)
+            waited += delay
+            await self._aacquire_slot()
+            try:
+                response = await asyncio.wait_for(self.backend.ainvoke(prompt), self.timeout)
+            except self.retryable as e:
+                if attempt == self.max_retries:
+                    self._record("invoke", started, waited, prompt, None, None, attempt + 1, e)
+                    raise LLMUnavailable(f"LLM call failed after {attempt + 1} attempts: {e}") from e
+                error = e
+            else:
+                self._record("invoke", started, waited, prompt, response.content,
+                             getattr(response, "usage_metadata", None), attempt + 1)
+                return response
+            finally:
+                self._slots.release()
+            pause = self._backoff(attempt, error)
+            await asyncio.sleep(pause)
+            waited += pause
+
+    def _join(self, prompt):
+        """(future, leader): leader is True when this caller must make the call and resolve the future."""
+        key = hashlib.sha256(prompt.encode()).hexdigest()
+        with self._inflight_lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                return key, future, False
+            future = Future()
+            self._inflight[key] = future
+            return key, future, True
+
+    def _finish(self, key, future, response=None, error=None):
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(response)
+
+    def invoke(self, prompt):
+        key, future, leader = self._join(prompt)
+        if not leader:
+            started = time.perf_counter()
+            response = future.result()
+            self._record("invoke", started, 0.0, prompt, response.content, None, 1, deduplicated=True)
+            return response
+        try:
+            response = self._call(prompt)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, response)
+        return response
+
+    async def ainvoke(self, prompt):
+        key, future, leader = self._join(prompt)
+        if not leader:
+            started = time.perf_counter()
+            response = await asyncio.wrap_future(future)
+            self._record("invoke", started, 0.0, prompt, response.content, None, 1, deduplicated=True)
+            return response
+        try:
+            response = await self._acall(prompt)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, response)
+        return response
+
+    def stream(self, prompt):
+        """
+        Streamed call; retried only while nothing has been yielded yet. The
+        concurrency slot is freed when the backend's stream ends, before the
+        last chunk is handed over, so it is not held for a slow consumer.
+        """
+        started = time.perf_counter()
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            delay = self._admission_delay(prompt)
+            time.sleep(delay)
+            waited += delay
+            self._acquire_slot()
+            slot = _Slot(self._slots)
+            upstream = self.backend.stream(prompt)
+            parts = []
+            try:
+                chunk = next(upstream, None)
+                while chunk is not None:
+                    following = next(upstream, None)
+                    parts.append(chunk.content)
+                    if following is None:
+                        slot.release()
+                        self._record("stream", started, waited, prompt, "".join(parts), None, attempt + 1)
+                    yield chunk
+                    chunk = following
+                if not parts:
+                    self._record("stream", started, waited, prompt, "", None, attempt + 1)
+                return
+            except self.retryable as e:
+                if parts or attempt == self.max_retries:
+                    self._record("stream", started, waited, prompt, "".join(parts), None, attempt + 1, e)
+                    raise LLMUnavailable(f"LLM stream failed after {attempt + 1} attempts: {e}") from e
+                error = e
+            finally:
+                slot.release()
+                if hasattr(upstream, "close"):
+                    upstream.close()
+            pause = self._backoff(attempt, error)
+            time.sleep(pause)
+            waited += pause
+
+    async def astream(self, prompt):
+        """Async stream."""
+        started = time.perf_counter()
+        waited = 0.0
+        for attempt in range(self.max_retries + 1):
+            delay = self._admission_delay(prompt)
+            await asyncio.sleep(delay)
+            waited += delay
+            await self._aacquire_slot()
+            slot = _Slot(self._slots)
+            upstream = self.backend.astream(prompt)
+            parts = []
+            try:
+                chunk = await anext(upstream, None)
+                while chunk is not None:
+                    following = await anext(upstream, None)
+                    parts.append(chunk.content)
+                    if following is None:
+                        slot.release()
+                        self._record("stream", started, waited, prompt, "".join(parts), None, attempt + 1)
+                    yield chunk
+                    chunk = following
+                if not parts:
+                    self._record("stream", started, waited, prompt, "", None, attempt + 1)
+                return
+            except self.retryable as e:
+                if parts or attempt == self.max_retries:
+                    self._record("stream", started, waited, prompt, "".join(parts), None, attempt + 1, e)
+                    raise LLMUnavailable(f"LLM stream failed after {attempt + 1} attempts: {e}") from e
+                error = e
+            finally:
+                slot.release()
+                if hasattr(upstream, "aclose"):
+                    await upstream.aclose()
+            pause = self._backoff(attempt, error)
+            await asyncio.sleep(pause)
+            waited += pause
+
+llm = LLMGateway(make_backend())
+
+
+def stream_writer():
+    """
+    The graph's custom stream writer, so a node can publish partial output while
+    it runs; a no-op when the node is called outside a streaming graph run.
+    """
+    try:
+        return get_stream_writer()
+    except RuntimeError:
+        return lambda chunk: None
+
+def stream_text(prompt):
+    """Yield the LLM response to prompt piece by piece as it is generated."""
+    for chunk in llm.stream(prompt):
+        if chunk.content:
+            yield chunk.content
+
+async def astream_text(prompt):
+    """Async stream_text."""
+    async for chunk in llm.astream(prompt):
+        if chunk.content:
+            yield chunk.content
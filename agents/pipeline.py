@@ -0,0 +1,45 @@
+# agents/pipeline.py
+from langgraph.graph import StateGraph, END
+
+from agents.insight_generator import ainsights_agent, insights_agent
+from agents.query_executor import aquery_executor_agent, query_executor_agent
+from agents.text_to_sql import atext_to_sql_agent, text_to_sql_agent
+from agents.visualization_agent import avisualization_agent, visualization_agent
+from utils.state import State
+from utils.tracing import traced_node
+
+SYNC_NODES = {
+    "text_to_sql": text_to_sql_agent,
+    "query_executor": query_executor_agent,
+    "insights": insights_agent,
+    "visualization": visualization_agent,
+}
+
+ASYNC_NODES = {
+    "text_to_sql": atext_to_sql_agent,
+    "query_executor": aquery_executor_agent,
+    "insights": ainsights_agent,
+    "visualization": avisualization_agent,
+}
+
+
+def build_graph(use_async=True):
+    """
+    text_to_sql -> query_executor -> {insights, visualization}.
+
+    With use_async the nodes are coroutines: drive the graph with ainvoke/astream
+    and the insights LLM call overlaps with building the chart.
+    """
+    nodes = ASYNC_NODES if use_async else SYNC_NODES
+    graph = StateGraph(State)
+    for name, node in nodes.items():
+        graph.add_node(name, traced_node(name, node))  # 'node.<name>' spans, see utils/tracing.py
+    graph.set_entry_point("text_to_sql")
+
+    # Edges
+    graph.add_edge("text_to_sql", "query_executor")
+    graph.add_edge("query_executor", "insights")
+    graph.add_edge("query_executor", "visualization")  # query result flows to visualization
+    graph.add_edge("insights", END)
+    graph.add_edge("visualization", END)
+    return graph.compile()
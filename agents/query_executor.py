@@ -1,51 +1,98 @@
 # agents/query_executor.py
+import asyncio
 import os
-import psycopg2
-import pandas as pd
-from utils.sql_validator import validate_sql
-from dotenv import load_dotenv
 
-load_dotenv()  # Load DB credentials
+from agents.text_to_sql import remember_sql
+from utils.backend import db
+from utils.result_cache import CACHE_ENABLED, ResultCache, sql_fingerprint
+from utils.sql_validator import QueryRejected, add_limit, check_plan, has_limit, validate_sql
 
-DB_PARAMS = {
-    "host": os.getenv("PGHOST"),
-    "port": os.getenv("PGPORT"),
-    "dbname": os.getenv("PGDATABASE"),
-    "user": os.getenv("PGUSER"),
-    "password": os.getenv("PGPASSWORD")
-}
+# Rows kept from a single result; anything beyond is dropped and flagged
+MAX_RESULT_ROWS = int(os.getenv("MAX_RESULT_ROWS", "50000"))
+# Planner estimates above which a query is refused before it runs
+COST_GUARD = os.getenv("SQL_COST_GUARD", "1") != "0"
+MAX_PLAN_COST = float(os.getenv("SQL_MAX_PLAN_COST", "1000000"))
+MAX_PLAN_ROWS = float(os.getenv("SQL_MAX_PLAN_ROWS", "10000000"))  # rows produced by any single plan step
+
+# ---------------- Result cache ----------------
+# Results are reused until db/setup.py loads new data, so a repeated question
+# is answered without a database round trip.
+result_cache = ResultCache()
+
+_last_version_error = [None]
+
+def data_version():
+    """Current data version, or None (cache bypassed) if it cannot be read."""
+    try:
+        return db.data_version()
+    except db.Error as e:
+        # db.data_version raises the same error until it checks again, so each failure is reported once
+        if e is not _last_version_error[0]:
+            _last_version_error[0] = e
+            print(f"[WARN] Result cache bypassed, data version unavailable: {e}")
+        return None
+
+def guard_query(conn, sql_query):
+    """
+    EXPLAIN the query first. A result larger than MAX_RESULT_ROWS gets a LIMIT
+    (the rows past it would be dropped anyway), then the query is refused if
+    its estimated cost or any step's row estimate is over the limits, so one
+    runaway join cannot tie up the database for other sessions.
+    """
+    if not COST_GUARD:
+        return sql_query
+    with conn.cursor() as cursor:
+        plan = db.explain(cursor, sql_query)
+        if plan["Plan Rows"] > MAX_RESULT_ROWS and not has_limit(sql_query):
+            print(f"[INFO] Query expected to return {plan['Plan Rows']:,.0f} rows; limited to {MAX_RESULT_ROWS:,}")
+            sql_query = add_limit(sql_query, MAX_RESULT_ROWS + 1)  # one extra row flags the truncation
+            plan = db.explain(cursor, sql_query)
+    check_plan(plan, MAX_PLAN_COST, MAX_PLAN_ROWS)
+    return sql_query
 
 def query_executor_agent(state):
     sql_query = state.get("sql_query", "")
     if not sql_query:
         return {"query_result": "No SQL query provided."}
 
+    truncated = False
+    result_key = None
     try:
         # Validate SQL before executing
         sql_query = validate_sql(sql_query)
 
-        conn = psycopg2.connect(**DB_PARAMS)
-        cursor = conn.cursor()
-        cursor.execute(sql_query)
+        version = data_version() if CACHE_ENABLED else None
+        if version is not None:
+            # The same SQL on the same data gives the same rows; later stages key their caches on it
+            result_key = f"{version}:{sql_fingerprint(sql_query)}"
+            cached = result_cache.get(sql_query, version)
+            if cached is not None:
+                result, truncated = cached
+                remember_sql(state)
+                return {"query_result": result, "query_truncated": truncated, "result_source": "cache",
+                        "result_key": result_key}
 
-        # If SELECT, fetch results
-        if cursor.description:
-            columns = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
-            # Convert to list of dicts for downstream processing
-            result = [dict(zip(columns, row)) for row in rows]
+        # Generated SQL runs in a read-only transaction on a pooled connection.
+        # A named (server-side) cursor streams the rows in batches into one
+        # DataFrame that the insights, visualization and display stages share.
+        with db.connection() as conn:
+            guarded_sql = guard_query(conn, sql_query)
+            with conn.cursor(name="query_executor") as cursor:
+                db.execute(cursor, guarded_sql)
+                result, truncated = db.fetch_frame(cursor, max_rows=MAX_RESULT_ROWS)
 
-        else:
-            conn.commit()
-            result = {"status": "success", "rows_affected": cursor.rowcount}
+        if version is not None:
+            result_cache.put(sql_query, version, result, truncated)
+        remember_sql(state)
 
+    except QueryRejected as e:
+        print(f"[WARN] {e}")
+        result, result_key = {"error": str(e)}, None
     except Exception as e:
-        result = {"error": str(e)}
+        result, result_key = {"error": str(e)}, None
 
-    finally:
-        if 'cursor' in locals():
-            cursor.close()
-        if 'conn' in locals():
-            conn.close()
+    return {"query_result": result, "query_truncated": truncated, "result_source": "db", "result_key": result_key}
 
-    return {"query_result": result}
\ No newline at end of file
+async def aquery_executor_agent(state):
+    """Async query_executor_agent; the database driver blocks, so the query runs in a worker thread."""
+    return await asyncio.to_thread(query_executor_agent, state)
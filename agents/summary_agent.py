@@ -1,48 +1,37 @@
 # agents/summary_agent.py
-from agents.llm_client import llm
-import pandas as pd
+import asyncio
 import os
-import psycopg2
-from dotenv import load_dotenv
+import time
 
-load_dotenv()
+from agents.llm_client import stream_text
+from utils.backend import db
 
-DB_PARAMS = {
-    "host": os.getenv("PGHOST"),
-    "port": os.getenv("PGPORT"),
-    "dbname": os.getenv("PGDATABASE"),
-    "user": os.getenv("PGUSER"),
-    "password": os.getenv("PGPASSWORD")
-}
-
-def query_db(query):
-    conn = psycopg2.connect(**DB_PARAMS)
-    try:
-        df = pd.read_sql_query(query, conn)
-    finally:
-        conn.close()
-    return df
+def query_db(query, params=None):
+    return db.query_df(query, params)
 
-def company_summary_agent(state=None):
+# Aggregates the summary is written from (also run by tests/test_backend_parity.py)
+SUMMARY_QUERIES = {
     # ----------------- State-level fund summary -----------------
-    state_df = query_db("""
-        SELECT i.name AS indicator, COALESCE(SUM(ff.amount),0) AS total
-        FROM pmayg_fund_fact ff
-        JOIN pmayg_state s ON ff.state_id = s.state_id
-        JOIN pmayg_indicator i ON ff.indicator_id = i.indicator_id
-        WHERE i.name IN ('Allocated_Total','Released_Total','Total Available Funds','Utilization of Funds','Percentage Utilization')
-        GROUP BY i.name
-    """)
-
+    "state fund flow": """
+        SELECT indicator, COALESCE(SUM(amount),0) AS total
+        FROM pmayg_rollup
+        WHERE geo_level = 'state'
+          AND indicator IN ('Allocated_Total','Released_Total','Total Available Funds','Utilization of Funds','Percentage Utilization')
+        GROUP BY indicator
+    """,
     # ----------------- District/Block beneficiary summary -----------------
-    beneficiary_df = query_db("""
-        SELECT b.name AS block_name, i.name AS indicator, COALESCE(SUM(ff.amount),0) AS total
-        FROM pmayg_fund_fact ff
-        JOIN pmayg_block b ON ff.block_id = b.block_id
-        JOIN pmayg_indicator i ON ff.indicator_id = i.indicator_id
-        WHERE i.name IN ('SC','ST','Minority','Others','Total')
-        GROUP BY b.name, i.name
-    """)
+    "block beneficiaries": """
+        SELECT geo_name AS block_name, indicator, COALESCE(SUM(amount),0) AS total
+        FROM pmayg_rollup
+        WHERE geo_level = 'block'
+          AND indicator IN ('SC','ST','Minority','Others','Total')
+        GROUP BY geo_name, indicator
+    """,
+}
+
+def summary_prompt():
+    state_df = query_db(SUMMARY_QUERIES["state fund flow"])
+    beneficiary_df = query_db(SUMMARY_QUERIES["block beneficiaries"])
 
     summary_data = {
         "State Fund Flow Summary": state_df.to_dict(orient="records"),
@@ -65,6 +54,116 @@ Write a concise, high-level summary (10-15 lines):
 - Avoid mechanically repeating numbers.
 - If no data exists at a level, mention it clearly.
 """
+    return prompt
+
+# ---------------- Stored summary ----------------
+# The summary depends only on the loaded data, so it is generated once per data
+# version (db.data_version) and kept in pmayg_summary for every session and process.
+# The first caller claims the row (an empty summary) in a short transaction, streams
+# the LLM output with no connection or transaction open, and stores the text in a
+# second short transaction. Other callers poll for it; a claim older than
+# SUMMARY_GENERATION_TIMEOUT_MS is taken over.
+GENERATION_TIMEOUT_MS = int(os.getenv("SUMMARY_GENERATION_TIMEOUT_MS", "180000"))
+POLL_SECONDS = float(os.getenv("SUMMARY_POLL_SECONDS", "1"))
+
+CLAIM_SQL = """
+INSERT INTO pmayg_summary (report_id, data_version, summary)
+VALUES ((SELECT max(report_id) FROM pmayg_report), %s, '')
+ON CONFLICT (report_id) DO UPDATE
+SET data_version = EXCLUDED.data_version, summary = '', generated_at = now()
+WHERE pmayg_summary.data_version <> EXCLUDED.data_version
+   OR (pmayg_summary.summary = '' AND pmayg_summary.generated_at < now() - %s * interval '1 millisecond')
+RETURNING report_id
+"""
+
+_summaries = {}  # data version -> summary text, for the current data version only
+
+def summary_table_exists():
+    return db.table_exists("pmayg_summary")
+
+def _write(sql, params):
+    """Run one statement in its own short read-write transaction; the first row it returns, if any."""
+    with db.connection(read_only=False) as conn:
+        with conn.cursor() as cursor:
+            db.execute(cursor, sql, params)
+            return cursor.fetchone() if cursor.description else None
+
+def _remember(version, summary):
+    """Keep the summary for this data version; summaries of older data are dropped."""
+    for old in [v for v in _summaries if v != version]:
+        _summaries.pop(old, None)
+    _summaries[version] = summary
+
+def _read_stored(version):
+    if version in _summaries:
+        return _summaries[version]
+    df = query_db("SELECT summary FROM pmayg_summary WHERE data_version = %s AND summary <> ''", (version,))
+    if df.empty:
+        return None
+    _remember(version, df.iloc[0, 0])
+    return _summaries[version]
+
+def stored_summary():
+    """Summary for the current data from memory or pmayg_summary; None if it has not been generated yet."""
+    version = db.data_version()
+    if version in _summaries:
+        return _summaries[version]
+    if not summary_table_exists():
+        return None
+    return _read_stored(version)
+
+def company_summary_stream():
+    """
+    The overview summary as a stream of text pieces. A stored summary comes back
+    in one piece; otherwise the LLM output is yielded as it is generated and then
+    stored. Concurrent first requests, in this or another process, wait for the
+    one generating it instead of calling the LLM again.
+    """
+    version = db.data_version()
+    if version in _summaries:
+        yield _summaries[version]
+        return
+    if not summary_table_exists():
+        # No pmayg_summary (an older database, or the read-only DuckDB file):
+        # generate without storing, and keep it for this process only
+        parts = []
+        for text in stream_text(summary_prompt()):
+            parts.append(text)
+            yield text
+        _remember(version, "".join(parts))
+        return
+
+    while True:
+        summary = _read_stored(version)
+        if summary is not None:
+            yield summary
+            return
+        claim = _write(CLAIM_SQL, (version, GENERATION_TIMEOUT_MS))
+        if claim is not None:
+            break
+        time.sleep(POLL_SECONDS)  # another session is generating it
+
+    report_id = claim[0]
+    stored = False
+    try:
+        parts = []
+        for text in stream_text(summary_prompt()):
+            parts.append(text)
+            yield text
+        summary = "".join(parts)
+        _write("UPDATE pmayg_summary SET summary = %s, generated_at = now() WHERE report_id = %s AND data_version = %s",
+               (summary, report_id, version))
+        stored = True
+        _remember(version, summary)
+    finally:
+        if not stored:
+            # Failed or abandoned: release the claim so the next caller generates it
+            _write("DELETE FROM pmayg_summary WHERE report_id = %s AND data_version = %s AND summary = ''",
+                   (report_id, version))
+
+def company_summary_agent(state=None):
+    return {"summary": "".join(company_summary_stream())}
 
-    response = llm.invoke(prompt)
-    return {"summary": response.content}
\ No newline at end of file
+async def acompany_summary_agent(state=None):
+    """Async company_summary_agent; the database work runs in a worker thread."""
+    return await asyncio.to_thread(company_summary_agent, state)
@@ -1,21 +1,77 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+from agents import fast_path
 from agents.llm_client import llm
 from few_shot_examples.examples import examples
+from utils.backend import db
+from utils.geo_index import LEVEL_WORDS, LEVELS, GeoIndex, tokenize
+from utils.sql_cache import CACHE_ENABLED, SQLCache
+from utils.tfidf import TfidfIndex
 
-# Build few-shot prompt
-FEW_SHOT_PROMPT = "\n".join([f"Q: {ex['query']}\nSQL: {ex['sql']}" for ex in examples])
-
-# PostgreSQL-compatible PMAY-G schema
-SCHEMA = """
-Table pmayg_state(state_id SERIAL PRIMARY KEY, name TEXT)
-Table pmayg_district(district_id SERIAL PRIMARY KEY, state_id INT, name TEXT)
-Table pmayg_block(block_id SERIAL PRIMARY KEY, district_id INT, name TEXT)
-Table pmayg_panchayat(panchayat_id SERIAL PRIMARY KEY, block_id INT, name TEXT)
-Table pmayg_indicator(indicator_id SERIAL PRIMARY KEY, name TEXT, type TEXT)
-Table pmayg_report(report_id SERIAL PRIMARY KEY, report_type TEXT, report_date TIMESTAMP, source_file TEXT)
-Table pmayg_fund_fact(fact_id SERIAL PRIMARY KEY, report_id INT, state_id INT, district_id INT, block_id INT, panchayat_id INT, indicator_id INT, amount NUMERIC)
-"""
+FEW_SHOT_K = int(os.getenv("FEW_SHOT_K", "3"))                    # examples sent with each question
+SCHEMA_PRUNING = os.getenv("PROMPT_SCHEMA_PRUNING", "1") != "0"
+
+# ---------------- Few-shot examples ----------------
+def format_examples(selected):
+    return "\n".join([f"Q: {ex['query']}\nSQL: {ex['sql']}" for ex in selected])
+
+FEW_SHOT_PROMPT = format_examples(examples)
+EXAMPLE_INDEX = TfidfIndex([ex["query"] for ex in examples])
+
+def select_examples(question, k=FEW_SHOT_K):
+    """The k examples whose questions are lexically closest to this one, best first."""
+    return [examples[i] for i, _ in EXAMPLE_INDEX.search(question, k)]
+
+# ---------------- Schema ----------------
+# PostgreSQL-compatible PMAY-G schema, one entry per table
+SCHEMA_TABLES = {
+    "pmayg_state_wide": """Table pmayg_state_wide(report_id INT, state_id INT, state_name TEXT, sc NUMERIC, st NUMERIC, minority NUMERIC, others NUMERIC, total NUMERIC, opening_balance NUMERIC, allocated_central NUMERIC, allocated_state NUMERIC, allocated_total NUMERIC, released_central NUMERIC, released_state NUMERIC, released_total NUMERIC, total_available_funds NUMERIC, utilization_of_funds NUMERIC, percentage_utilization NUMERIC)
+  -- one row per state, one column per indicator; sc..total are the sums over the state's districts""",
+    "pmayg_district_wide": "Table pmayg_district_wide(report_id INT, district_id INT, district_name TEXT, state_name TEXT, sc NUMERIC, st NUMERIC, minority NUMERIC, others NUMERIC, total NUMERIC) -- one row per district",
+    "pmayg_block_wide": "Table pmayg_block_wide(report_id INT, block_id INT, block_name TEXT, state_name TEXT, district_name TEXT, sc NUMERIC, st NUMERIC, minority NUMERIC, others NUMERIC, total NUMERIC) -- one row per block",
+    "pmayg_panchayat_wide": "Table pmayg_panchayat_wide(report_id INT, panchayat_id INT, panchayat_name TEXT, state_name TEXT, district_name TEXT, block_name TEXT, sc NUMERIC, st NUMERIC, minority NUMERIC, others NUMERIC, total NUMERIC) -- one row per panchayat",
+    "pmayg_rollup": """Table pmayg_rollup(report_id INT, geo_level TEXT, geo_id INT, geo_name TEXT, state_name TEXT, district_name TEXT, block_name TEXT, indicator_id INT, indicator TEXT, indicator_type TEXT, amount NUMERIC, children_amount NUMERIC)
+  -- one row per geography and indicator, already aggregated; geo_level is 'state', 'district', 'block' or 'panchayat'
+  -- state_name/district_name/block_name are the geography's ancestors (and itself); children_amount is the sum over its direct children""",
+    "pmayg_state": "Table pmayg_state(state_id SERIAL PRIMARY KEY, name TEXT)",
+    "pmayg_district": "Table pmayg_district(district_id SERIAL PRIMARY KEY, state_id INT, name TEXT)",
+    "pmayg_block": "Table pmayg_block(block_id SERIAL PRIMARY KEY, district_id INT, name TEXT)",
+    "pmayg_panchayat": "Table pmayg_panchayat(panchayat_id SERIAL PRIMARY KEY, block_id INT, name TEXT)",
+    "pmayg_indicator": "Table pmayg_indicator(indicator_id SERIAL PRIMARY KEY, name TEXT, type TEXT)",
+    "pmayg_report": "Table pmayg_report(report_id SERIAL PRIMARY KEY, report_type TEXT, report_date TIMESTAMP, source_file TEXT)",
+    "pmayg_fund_fact": "Table pmayg_fund_fact(fact_id SERIAL PRIMARY KEY, report_id INT, state_id INT, district_id INT, block_id INT, panchayat_id INT, indicator_id INT, amount NUMERIC, geo_level TEXT -- 'state', 'district', 'block' or 'panchayat')",
+}
+SCHEMA = "\n".join(SCHEMA_TABLES.values())
+
+# Tables every pruned schema keeps; wide and geography tables are added per level
+CORE_TABLES = ("pmayg_rollup", "pmayg_indicator", "pmayg_fund_fact")
+
+def detect_levels(question, places):
+    """Geography levels the question is about: resolved places plus level words such as 'blocks'."""
+    levels = {p["level"] for p in places}
+    for word in tokenize(question):
+        level = LEVEL_WORDS.get(word) or LEVEL_WORDS.get(word.rstrip("s"))
+        if level:
+            levels.add(level)
+    return levels
+
+def prune_schema(levels):
+    """
+    Schema limited to the core tables, the wide tables of the levels asked about
+    and the geography tables down to the deepest of them.
+    """
+    if not levels:
+        return SCHEMA
+    deepest = max(LEVELS.index(level) for level in levels)
+    tables = (set(CORE_TABLES) | {f"pmayg_{level}_wide" for level in levels}
+              | {f"pmayg_{level}" for level in LEVELS[:deepest + 1]})
+    return "\n".join(text for name, text in SCHEMA_TABLES.items() if name in tables)
 
-SYSTEM_PROMPT = f"""
+SYSTEM_PROMPT = """
 You are a PostgreSQL SQL assistant specialized in PMAY-G fund allocation data.
 
 Hierarchy rules:
@@ -25,6 +81,7 @@ Hierarchy rules:
 - For fund flow queries, always query at state level.
 
 Rules:
+0. Prefer the wide tables (pmayg_state_wide, pmayg_district_wide, pmayg_block_wide, pmayg_panchayat_wide): one row per place with a column per indicator, so comparing places or categories needs no join, indicator filter or GROUP BY. Use pmayg_rollup to rank the categories of one place or compare a place with the sum of its children (children_amount), and the base tables only when neither can answer.
 1. Output ONLY ONE SQL query, no explanations.
 2. Use COALESCE(column,0) for SUM aggregates.
 3. Avoid window functions unless strictly necessary.
@@ -33,24 +90,119 @@ Rules:
 6. Follow PostgreSQL syntax strictly.
 
 For questions asking about most/least, return all rows, do not limit.
-
-Database schema:
-{SCHEMA}
 """
 
-def text_to_sql_agent(state):
-    user_query = state["messages"][-1]
+# ---------------- Place resolution ----------------
+_geo_index = {"index": None, "version": None}
+_geo_index_lock = threading.Lock()
+
+def get_geo_index():
+    """
+    Geography index for the loaded data, rebuilt when the data version changes
+    (as utils/geo_tree.get_tree does); the previous index, or None, while the
+    database is unreachable.
+    """
+    try:
+        version = db.data_version()
+    except db.Error:
+        return _geo_index["index"]
+    with _geo_index_lock:
+        if _geo_index["index"] is None or _geo_index["version"] != version:
+            try:
+                with db.connection() as conn:
+                    geo_index = GeoIndex.from_db(conn.cursor())
+            except db.Error:
+                return _geo_index["index"]
+            geo_index.build_fuzzy_index()  # misspelt place names are looked up on every question
+            _geo_index.update(index=geo_index, version=version)
+        return _geo_index["index"]
+
+def resolve_places(question, geo_index):
+    """Map place names in the question, misspelt ones included, to exact geography rows."""
+    places = []
+    for mention in geo_index.mentions(question, fuzzy=True):
+        for place in mention["places"]:
+            ancestors = geo_index.path(place)[1:]
+            places.append({
+                "mention": mention["text"],
+                "level": place.level,
+                "id": place.id,
+                "name": place.name,
+                "within": " > ".join(p.name for p in reversed(ancestors)),
+            })
+    return places
+
+def format_places(places):
+    if not places:
+        return ""
+    lines = []
+    for p in places:
+        within = f", in {p['within']}" if p["within"] else ""
+        lines.append(f"- \"{p['mention']}\": {p['level']} '{p['name']}' ({p['level']}_id={p['id']}{within})")
+    return "Places mentioned in the question (use these exact names or ids):\n" + "\n".join(lines) + "\n\n"
+
+# ---------------- SQL cache ----------------
+# Changing the schema, rules or few-shot examples changes the version and
+# drops the SQL cached for the previous prompt.
+PROMPT_VERSION = hashlib.sha256((SYSTEM_PROMPT + SCHEMA + FEW_SHOT_PROMPT).encode()).hexdigest()[:16]
+sql_cache = SQLCache(PROMPT_VERSION)
+
+def places_context(places):
+    return ",".join(f"{p['level']}:{p['id']}" for p in places)
 
-    prompt = f"""{SYSTEM_PROMPT}
+# ---------------- Path metrics ----------------
+SQL_SOURCES = ("template", "cache", "llm")
+_sql_stats_lock = threading.Lock()
+_sql_stats = {source: {"count": 0, "seconds": 0.0} for source in SQL_SOURCES}
+
+def _record_source(source, started):
+    with _sql_stats_lock:
+        _sql_stats[source]["count"] += 1
+        _sql_stats[source]["seconds"] += time.perf_counter() - started
+
+def sql_metrics():
+    """Questions answered by each path (fast-path template, SQL cache, LLM) with their share and mean latency."""
+    with _sql_stats_lock:
+        snapshot = {source: dict(stats) for source, stats in _sql_stats.items()}
+    total = sum(stats["count"] for stats in snapshot.values())
+    for stats in snapshot.values():
+        stats["share"] = stats["count"] / total if total else 0.0
+        stats["avg_ms"] = stats["seconds"] / stats["count"] * 1000 if stats["count"] else 0.0
+    return snapshot
+
+def build_prompt(question, places, k=FEW_SHOT_K, prune=SCHEMA_PRUNING):
+    """Prompt with the k closest examples and, if prune is set, only the tables the question needs."""
+    schema = prune_schema(detect_levels(question, places)) if prune else SCHEMA
+    return f"""{SYSTEM_PROMPT}
+Database schema:
+{schema}
 
 Few-shot examples:
-{FEW_SHOT_PROMPT}
+{format_examples(select_examples(question, k))}
 
-Q: {user_query}
+{format_places(places)}Q: {question}
 SQL:"""
 
-    response = llm.invoke(prompt)
-    sql_raw = response.content.strip()
+def answer_without_llm(user_query, started):
+    """(state update, places): the update is None unless a template or the SQL cache answered."""
+    geo_index = get_geo_index()
+    places = resolve_places(user_query, geo_index) if geo_index else []
+
+    # Common question shapes are answered from templates, without an LLM call
+    matched = fast_path.match(user_query, places, geo_index) if geo_index else None
+    if matched:
+        _record_source("template", started)
+        return {"sql_query": matched[1], "places": places, "sql_source": "template"}, places
+
+    if CACHE_ENABLED:
+        cached_sql, _ = sql_cache.get(user_query, places_context(places))
+        if cached_sql:
+            _record_source("cache", started)
+            return {"sql_query": cached_sql, "places": places, "sql_source": "cache"}, places
+    return None, places
+
+def answer_from_llm(user_query, places, sql_raw, started):
+    sql_raw = sql_raw.strip()
 
     # Extract first SELECT statement
     select_index = sql_raw.lower().find("select")
@@ -60,4 +212,35 @@ SQL:"""
     sql_clean = sql_raw[select_index:].strip().rstrip(";")  # remove trailing semicolons
     sql_clean += ";"  # ensure exactly one semicolon
 
-    return {"sql_query": sql_clean}
\ No newline at end of file
+    # Cached by the query executor once the SQL has run (see remember_sql), so
+    # SQL that fails validation, the cost guard or execution is never reused
+    _record_source("llm", started)
+    return {"sql_query": sql_clean, "places": places, "sql_source": "llm"}
+
+def remember_sql(state):
+    """Cache LLM-generated SQL for the question; called after the query ran successfully."""
+    if CACHE_ENABLED and state.get("sql_source") == "llm":
+        sql_cache.put(state["messages"][-1], state["sql_query"], places_context(state.get("places") or []))
+
+def text_to_sql_agent(state):
+    started = time.perf_counter()
+    user_query = state["messages"][-1]
+
+    update, places = answer_without_llm(user_query, started)
+    if update:
+        return update
+
+    response = llm.invoke(build_prompt(user_query, places))
+    return answer_from_llm(user_query, places, response.content, started)
+
+async def atext_to_sql_agent(state):
+    """Async text_to_sql_agent: the LLM call is awaited, index and cache lookups run in a worker thread."""
+    started = time.perf_counter()
+    user_query = state["messages"][-1]
+
+    update, places = await asyncio.to_thread(answer_without_llm, user_query, started)
+    if update:
+        return update
+
+    response = await llm.ainvoke(build_prompt(user_query, places))
+    return await asyncio.to_thread(answer_from_llm, user_query, places, response.content, started)
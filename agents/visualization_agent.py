@@ -1,59 +1,152 @@
 # agents/visualization_agent.py
+import asyncio
+import hashlib
+import os
+import re
+import time
+
 import pandas as pd
 import plotly.express as px
+import plotly.graph_objects as go
+import plotly.io as pio
 
-def visualization_agent(state):
+from utils.figure_cache import CACHE_ENABLED, MIN_BUILD_MS, FigureCache, result_fingerprint
+
+# Bars shown before the remaining rows are folded into one "Others (n)" bar
+CHART_TOP_N = int(os.getenv("CHART_TOP_N", "30"))
+# Up to this many bars get a trace (and colour) each; more share a single trace
+CHART_MAX_TRACES = int(os.getenv("CHART_MAX_TRACES", "12"))
+# Scatter plots with more points than this are drawn with WebGL
+CHART_WEBGL_POINTS = int(os.getenv("CHART_WEBGL_POINTS", "1000"))
+
+# Columns averaged rather than summed into the "Others" bar
+RATIO_COLUMN_RE = re.compile(r"percent|pct|ratio|share|rate", re.IGNORECASE)
+
+# ---------------- Figure cache ----------------
+# The same result (a repeated question, or the result cache answering another
+# session) reuses the serialized figure instead of rebuilding it.
+figure_cache = FigureCache()
+CHART_SETTINGS = f"top_n={CHART_TOP_N},max_traces={CHART_MAX_TRACES},webgl={CHART_WEBGL_POINTS}"
+
+
+def figure_key(state, df):
+    """Cache key of the chart: the executor's result_key, or a hash of the rows when there is none."""
+    if state.get("result_key"):
+        return hashlib.sha256(f"{CHART_SETTINGS}|{state['result_key']}".encode()).hexdigest()
+    try:
+        return result_fingerprint(df, CHART_SETTINGS)
+    except TypeError:
+        return None  # unhashable cell values (lists, dicts): build the chart uncached
+
+
+def top_n_with_others(df, cat_col, value_cols, n=CHART_TOP_N):
     """
-    Generates visualizations based on SQL query results.
-    Input:
-        state: dict with key 'query_result' containing list of dicts or a DataFrame
-    Output:
-        dict with 'visualization' key containing a Plotly figure
+    At most n rows plus one "Others (k)" row holding the sum of the rest
+    (the mean for percentage-like columns). A result already sorted by its
+    value keeps the query's first n rows, so "least" questions keep the
+    smallest; otherwise the n largest are kept, in their original order.
     """
-    result = state.get("query_result", None)
-    fig = None
-
-    # Convert list of dicts to DataFrame if needed
-    if isinstance(result, list) and result:
-        df = pd.DataFrame(result)
-    elif isinstance(result, pd.DataFrame):
-        df = result.copy()
+    if len(df) <= n + 1:
+        return df
+    rank = df[value_cols].sum(axis=1) if len(value_cols) > 1 else df[value_cols[0]]
+    if rank.is_monotonic_increasing or rank.is_monotonic_decreasing:
+        keep = df.index[:n]
     else:
-        return {"visualization": None}
+        keep = df.index[df.index.isin(rank.abs().nlargest(n).index)]
+    rest = df.drop(keep)
+    others = {cat_col: f"Others ({len(rest):,})"}
+    for col in value_cols:
+        others[col] = rest[col].mean() if RATIO_COLUMN_RE.search(str(col)) else rest[col].sum()
+    return pd.concat([df.loc[keep, [cat_col] + value_cols], pd.DataFrame([others])], ignore_index=True)
 
-    # Remove empty columns
-    df = df.dropna(axis=1, how='all')
+
+def build_figure(df):
+    """Plotly figure for a query result, or None when no chart fits its columns."""
+    # Ignore empty columns
+    non_empty = df.columns[df.notna().any()]
 
     # --- Detect suitable chart types ---
-    numeric_cols = df.select_dtypes(include=["number"]).columns.tolist()
-    categorical_cols = df.select_dtypes(exclude=["number"]).columns.tolist()
+    numeric_cols = [c for c in non_empty if pd.api.types.is_numeric_dtype(df[c])]
+    categorical_cols = [c for c in non_empty if c not in numeric_cols]
 
     # Simple heuristic: one categorical + one numeric column -> bar chart
     if len(numeric_cols) == 1 and len(categorical_cols) == 1:
         cat_col = categorical_cols[0]
         num_col = numeric_cols[0]
-        fig = px.bar(
-            df,
-            x=cat_col,
-            y=num_col,
-            text=num_col,
-            title=f"{num_col} by {cat_col}",
-            labels={cat_col: cat_col, num_col: num_col},
-            color=cat_col
-        )
+        data = top_n_with_others(df, cat_col, [num_col])
+        if len(data) <= CHART_MAX_TRACES:
+            fig = px.bar(
+                data,
+                x=cat_col,
+                y=num_col,
+                text=num_col,
+                title=f"{num_col} by {cat_col}",
+                labels={cat_col: cat_col, num_col: num_col},
+                color=cat_col
+            )
+        else:
+            # One trace for all bars: a trace per category grows the figure with every row
+            fig = go.Figure(go.Bar(x=data[cat_col], y=data[num_col], text=data[num_col], name=num_col))
+            fig.update_layout(title=f"{num_col} by {cat_col}")
         fig.update_traces(texttemplate='%{text}', textposition='outside')
         fig.update_layout(yaxis_title=f"{num_col} (in lakhs)", xaxis_title=cat_col, uniformtext_minsize=8, uniformtext_mode='hide')
 
     # Multiple numeric columns & categorical -> grouped bar chart
     elif len(numeric_cols) > 1 and len(categorical_cols) == 1:
-        fig = px.bar(
-            df,
-            x=categorical_cols[0],
-            y=numeric_cols,
+        data = top_n_with_others(df, categorical_cols[0], numeric_cols)
+        fig = go.Figure([go.Bar(name=col, x=data[categorical_cols[0]], y=data[col]) for col in numeric_cols])
+        fig.update_layout(
             barmode='group',
-            title=f"Comparison of {', '.join(numeric_cols)} by {categorical_cols[0]}"
+            title=f"Comparison of {', '.join(numeric_cols)} by {categorical_cols[0]}",
+            xaxis_title=categorical_cols[0],
         )
 
+    # Numeric columns only -> scatter of the first two, in WebGL for large results
+    elif len(numeric_cols) >= 2 and not categorical_cols and len(df) > 1:
+        x_col, y_col = numeric_cols[:2]
+        scatter = go.Scattergl if len(df) > CHART_WEBGL_POINTS else go.Scatter
+        fig = go.Figure(scatter(x=df[x_col], y=df[y_col], mode="markers"))
+        fig.update_layout(title=f"{y_col} vs {x_col}", xaxis_title=x_col, yaxis_title=y_col)
+
     # Time series (date + numeric) could be added here as a future enhancement
+    else:
+        fig = None
+    return fig
+
+
+def visualization_agent(state):
+    """
+    Generates visualizations based on SQL query results.
+    Input:
+        state: dict with key 'query_result' containing a DataFrame (shared with the
+               other stages, so it is read but never modified or copied here)
+    Output:
+        dict with 'visualization' key containing a Plotly figure
+
+    Large results are drawn with at most CHART_TOP_N bars plus "Others", so the
+    figure stays small whatever the row count.
+    """
+    result = state.get("query_result", None)
+
+    if isinstance(result, list) and result:
+        df = pd.DataFrame(result)
+    elif isinstance(result, pd.DataFrame) and not result.empty:
+        df = result
+    else:
+        return {"visualization": None}
+
+    key = figure_key(state, df) if CACHE_ENABLED else None
+    if key is not None:
+        cached = figure_cache.get(key)
+        if cached is not None:
+            return {"visualization": pio.from_json(cached)}
+
+    started = time.perf_counter()
+    fig = build_figure(df)
+    if key is not None and fig is not None and (time.perf_counter() - started) * 1000 >= MIN_BUILD_MS:
+        figure_cache.put(key, fig.to_json())
+    return {"visualization": fig}
 
-    return {"visualization": fig}
\ No newline at end of file
+async def avisualization_agent(state):
+    """Async visualization_agent; figure building is CPU-bound, so it runs in a worker thread."""
+    return await asyncio.to_thread(visualization_agent, state)
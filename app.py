@@ -1,51 +1,63 @@
 import streamlit as st
 import re
 import pandas as pd
-import psycopg2
 import os
-from dotenv import load_dotenv
+import time
 import plotly.express as px
+import plotly.graph_objects as go
 
-from langgraph.graph import StateGraph, END
-from utils.state import State
-from agents.text_to_sql import text_to_sql_agent
-from agents.query_executor import query_executor_agent
-from agents.insight_generator import insights_agent
-from agents.summary_agent import company_summary_agent
-from agents.visualization_agent import visualization_agent  # new
-
-load_dotenv()  # Load DB credentials
-
-DB_PARAMS = {
-    "host": os.getenv("PGHOST"),
-    "port": os.getenv("PGPORT"),
-    "dbname": os.getenv("PGDATABASE"),
-    "user": os.getenv("PGUSER"),
-    "password": os.getenv("PGPASSWORD")
-}
+from agents.llm_client import llm
+from agents.pipeline import build_graph
+from agents.text_to_sql import sql_metrics
+from agents.summary_agent import company_summary_stream, stored_summary
+from utils import event_loop, tracing
+from utils.backend import db
+from utils.excel_cache import load_sheet
+from utils.geo_index import LEVELS
+from utils.geo_tree import get_tree
 
 # ---------------- Streamlit Page Setup ----------------
 st.set_page_config(page_title="PMAY-G Insights Dashboard", layout="wide", page_icon="🏘️")
 
 # ---------------- State Graph Setup ----------------
-graph = StateGraph(State)
-graph.add_node("text_to_sql", text_to_sql_agent)
-graph.add_node("query_executor", query_executor_agent)
-graph.add_node("insights", insights_agent)
-graph.add_node("visualization", visualization_agent)  # new node
-graph.set_entry_point("text_to_sql")
-
-# Edges
-graph.add_edge("text_to_sql", "query_executor")
-graph.add_edge("query_executor", "insights")
-graph.add_edge("query_executor", "visualization")  # query result flows to visualization
-graph.add_edge("insights", END)
-graph.add_edge("visualization", END)
-app = graph.compile()
+@st.cache_resource
+def get_app():
+    # Async graph, compiled once per process; every session drives it on the
+    # shared background event loop
+    return build_graph(use_async=True)
+
+app = get_app()
 
 # ---------------- Sidebar ----------------
 st.sidebar.title("PMAY-G Insights")
-page = st.sidebar.radio("Navigate to", ["Home", "Ask a Question", "View Data"], index=0)
+page = st.sidebar.radio("Navigate to", ["Home", "Ask a Question", "Explore", "View Data", "Performance"], index=0)
+
+with st.sidebar.expander("Database pool"):
+    pool_stats = db.metrics()
+    st.caption(
+        f"{pool_stats['checkouts']} checkouts, avg wait {pool_stats['pool_wait_avg'] * 1000:.1f} ms "
+        f"(max {pool_stats['pool_wait_max'] * 1000:.1f} ms)"
+    )
+    st.caption(
+        f"{pool_stats['queries']} queries, avg {pool_stats['query_avg'] * 1000:.1f} ms "
+        f"(max {pool_stats['query_max'] * 1000:.1f} ms), {pool_stats['query_errors']} errors"
+    )
+
+with st.sidebar.expander("LLM"):
+    llm_stats = llm.metrics()
+    st.caption(
+        f"{llm_stats['calls']} calls ({llm_stats['deduplicated']} shared), avg {llm_stats['avg_seconds'] * 1000:.0f} ms, "
+        f"{llm_stats['retries']} retries, {llm_stats['errors']} failed"
+    )
+    st.caption(f"{llm_stats['prompt_tokens']:,} prompt / {llm_stats['completion_tokens']:,} completion tokens")
+
+with st.sidebar.expander("Text-to-SQL"):
+    for source, label in (("template", "Fast path"), ("cache", "SQL cache"), ("llm", "LLM")):
+        path_stats = sql_metrics()[source]
+        st.caption(
+            f"{label}: {path_stats['count']} questions ({path_stats['share']:.0%}), "
+            f"avg {path_stats['avg_ms']:.1f} ms"
+        )
 
 # ---------------- Home Page ----------------
 if page == "Home":
@@ -100,16 +112,17 @@ if page == "Home":
 elif page == "Ask a Question":
     st.title("💬 Ask a PMAY-G Question")
 
-    # Company Summary
-    if "company_summary" not in st.session_state:
-        with st.spinner("Generating PMAY-G summary..."):
-            summary_output = company_summary_agent({})
-            st.session_state.company_summary = summary_output.get("summary", "Summary not available.")
-    else:
-        summary_output = {"summary": st.session_state.company_summary}
-
+    # Company Summary: generated once per data version and shared by all sessions;
+    # only the first viewer after a data load waits for (and sees) it being streamed
     st.subheader("🏢 PMAY-G Overview")
-    st.info(summary_output["summary"])
+    try:
+        summary = stored_summary()
+        if summary is None:
+            st.write_stream(company_summary_stream())
+        else:
+            st.info(summary)
+    except db.Error as e:
+        st.warning(f"The overview is unavailable while the database cannot be reached: {e}")
 
     # Example Questions
     with st.expander("💡 Example Questions"):
@@ -126,38 +139,24 @@ elif page == "Ask a Question":
         value=st.session_state.get("user_query", "")
     )
 
-    if st.button("Submit") and user_query:
-        st.session_state.user_query = user_query
-        with st.spinner("Generating SQL, Insights, and Visualizations..."):
-            output = app.invoke({"messages": [user_query]})
-            st.session_state.query_output = output
-
-    # Display Output
-    if "query_output" in st.session_state:
-        output = st.session_state.query_output
-
-        tabs = st.tabs(["Insights", "Generated SQL Query", "Query Result", "Visualization"])
-
-        # SQL Query
-        with tabs[1]:
+    def show_sql(container, output):
+        with container.container():
             st.subheader("SQL Query Generated")
             st.code(output.get("sql_query", "N/A"))
 
-        # Query Result
-        with tabs[2]:
+    def show_result(container, output):
+        with container.container():
             st.subheader("Query Result")
             result = output.get("query_result", None)
-            if isinstance(result, list) and result:
-                df = pd.DataFrame(result).fillna(0)
-                st.dataframe(df)
-            elif isinstance(result, pd.DataFrame):
-                df = result.fillna(0)
-                st.dataframe(df)
+            if isinstance(result, pd.DataFrame):
+                if output.get("query_truncated"):
+                    st.warning(f"Showing the first {len(result):,} rows; the full result was larger.")
+                st.dataframe(result)  # the same frame the insights and chart were built from
             else:
                 st.write(result if result else "No data returned.")
 
-        # Insights
-        with tabs[0]:
+    def show_insights(container, output):
+        with container.container():
             st.subheader("Insights")
             insights_text = output.get("insights", "No insights generated.")
             insights_text = re.sub(r'\n+', '\n', insights_text)
@@ -165,14 +164,126 @@ elif page == "Ask a Question":
             insights_text = insights_text.strip()
             st.success(insights_text)
 
-        # Visualization
-        with tabs[3]:
+    def show_visualization(container, output):
+        with container.container():
             fig = output.get("visualization", None)
             if fig:
                 st.plotly_chart(fig, use_container_width=True)
             else:
                 st.info("No visualization available for this query.")
 
+    # Which display each graph node fills in
+    NODE_VIEWS = {
+        "text_to_sql": show_sql,
+        "query_executor": show_result,
+        "insights": show_insights,
+        "visualization": show_visualization,
+    }
+
+    submitted = st.button("Submit") and user_query
+    if submitted or "query_output" in st.session_state:
+        tabs = st.tabs(["Insights", "Generated SQL Query", "Query Result", "Visualization"])
+        slots = {
+            "insights": tabs[0].empty(),
+            "text_to_sql": tabs[1].empty(),
+            "query_executor": tabs[2].empty(),
+            "visualization": tabs[3].empty(),
+        }
+
+    if submitted:
+        st.session_state.user_query = user_query
+        st.session_state.pop("query_output", None)
+        for node, slot in slots.items():
+            slot.caption("Waiting for the previous steps...")
+
+        # Each stage is shown as soon as it finishes; insight tokens are rendered
+        # as the LLM produces them
+        output = {}
+        streamed_insights = ""
+        trace_id = tracing.new_trace_id()
+        started = time.perf_counter()
+        stream = app.astream({"messages": [user_query], "trace_id": trace_id}, stream_mode=["updates", "custom"])
+        for mode, chunk in event_loop.iterate(stream):
+            if mode == "custom" and "insights" in chunk:
+                streamed_insights += chunk["insights"]
+                slots["insights"].success(streamed_insights)
+            elif mode == "updates":
+                for node, update in chunk.items():
+                    output.update(update or {})
+                    if node in NODE_VIEWS:
+                        NODE_VIEWS[node](slots[node], output)
+        tracing.record("pipeline", time.perf_counter() - started, trace_id=trace_id)
+        st.session_state.query_output = output
+
+    # Display Output
+    elif "query_output" in st.session_state:
+        output = st.session_state.query_output
+        for node, show in NODE_VIEWS.items():
+            show(slots[node], output)
+
+# ---------------- Explore Page ----------------
+elif page == "Explore":
+    st.title("🗺️ Explore by Geography")
+    st.caption("Drill down from states to panchayats. Figures come from an in-memory copy of the rollup, "
+               "loaded once per data version: no question to type, no LLM call and no query per click.")
+
+    try:
+        tree = get_tree()
+    except db.Error as e:
+        st.error(f"Could not load the geography tree: {e}")
+        st.stop()
+
+    started = time.perf_counter()
+
+    # One selector per level, keyed by its parent: choosing another parent starts the levels below at "All"
+    place = None
+    for level, column in zip(LEVELS, st.columns(len(LEVELS))):
+        children = tree.children(place)
+        if not children:
+            break
+        choice = column.selectbox(
+            level.title(), [None] + children,
+            format_func=lambda p: "All" if p is None else p.name,
+            key=f"explore_{level}_{place.id if place else 'root'}",
+        )
+        if choice is None:
+            break
+        place = choice
+
+    breakdown = tree.breakdown(place)
+    if place is not None:
+        st.markdown(" › ".join(f"**{p.name}** ({p.level})" for p in tree.path(place)))
+
+    if breakdown.empty:
+        values = tree.place_values(place) if place is not None else pd.DataFrame()
+        if values.empty:
+            st.info("No figures reported for this place.")
+        else:
+            st.dataframe(values, hide_index=True)
+            fig = go.Figure(go.Bar(x=values["indicator"], y=values["amount"], text=values["amount"]))
+            fig.update_layout(title=f"{place.name} by indicator")
+            st.plotly_chart(fig, use_container_width=True)
+    else:
+        name_col = breakdown.columns[0]
+        child_level = name_col[:-len("_name")]
+        st.subheader(f"{child_level.title()}s in {place.name}" if place is not None else "States")
+        st.dataframe(breakdown, hide_index=True)
+
+        measures = list(breakdown.columns[1:])
+        categories = [m for m in ("SC", "ST", "Minority", "Others") if m in measures]
+        fund_flows = [m for m in ("Allocated_Total", "Released_Total", "Utilization of Funds") if m in measures]
+        chosen = st.multiselect("Chart", measures, default=categories or fund_flows or measures[:1],
+                                key=f"explore_chart_{place.level}_{place.id}" if place else "explore_chart_root")
+        if chosen:
+            # graph_objects directly: plotly.express takes tens of ms to build the same figure
+            fig = go.Figure([go.Bar(name=measure, x=breakdown[name_col], y=breakdown[measure]) for measure in chosen])
+            fig.update_layout(barmode="group", title=f"{', '.join(chosen)} by {child_level}")
+            st.plotly_chart(fig, use_container_width=True)
+
+    elapsed = time.perf_counter() - started
+    tracing.record("explorer.render", elapsed, level=place.level if place else "root")
+    st.caption(f"Rendered in {elapsed * 1000:.1f} ms from the cached tree of {len(tree):,} places.")
+
 # ---------------- View Data Page ----------------
 elif page == "View Data":
     st.title("📊 View PMAY-G Excel Sheets")
@@ -193,8 +304,39 @@ elif page == "View Data":
         file_path = os.path.join(EXCEL_FOLDER, file_name)
 
         if os.path.exists(file_path):
-            df = pd.read_excel(file_path)
-            df.columns = [str(c).strip() for c in df.columns]
+            # The workbook as it is, total rows included; memory-mapped from the parse cache when unchanged
+            df = load_sheet(file_path, clean=False)
             st.dataframe(df)
         else:
-            st.warning(f"Excel file for {table_name} not found at {file_path}")
\ No newline at end of file
+            st.warning(f"Excel file for {table_name} not found at {file_path}")
+
+# ---------------- Performance Page ----------------
+elif page == "Performance":
+    st.title("⏱️ Pipeline Performance")
+    st.caption("Latency per pipeline stage, database query and LLM call, from the traces recorded by this process.")
+
+    windows = {"Last 5 minutes": 300, "Last hour": 3600, "Last 24 hours": 86400, "Since start-up": None}
+    window = st.selectbox("Window", list(windows.keys()), index=1)
+    stats = tracing.stage_percentiles(windows[window])
+
+    if stats:
+        perf_df = pd.DataFrame.from_dict(stats, orient="index")
+        perf_df.index.name = "stage"
+        st.dataframe(perf_df.rename(columns={
+            "count": "Calls", "p50": "p50 (ms)", "p95": "p95 (ms)", "p99": "p99 (ms)", "max": "Max (ms)"
+        }).round(1))
+    else:
+        st.info("No traces recorded yet. Ask a question first.")
+
+    with st.expander("Prometheus metrics"):
+        st.code(tracing.prometheus_text(), language="text")
+        if tracing.PROMETHEUS_PATH:
+            st.caption(f"Also written every {tracing.PROMETHEUS_INTERVAL:.0f}s to {tracing.PROMETHEUS_PATH}")
+
+    recent = tracing.recent_spans(windows[window])
+    if recent:
+        st.download_button(
+            "Download traces (JSONL)",
+            tracing.to_jsonl(recent),
+            file_name="traces.jsonl",
+        )
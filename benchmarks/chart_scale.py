@@ -0,0 +1,128 @@
+"""
+Figure-building time and payload size of visualization_agent against result size.
+
+For each row count, synthetic results of three shapes are charted:
+  bar      one name column and one value column (e.g. panchayats by total)
+  grouped  one name column and the five beneficiary columns of a wide table
+  scatter  two numeric columns
+and three ways of building the chart are timed (best of --repeat):
+  legacy   the previous agent: px.bar with one trace per category, every row
+  build    the current agent with an empty figure cache
+  cached   the current agent on a repeat of the same result (the figure cache
+           only keeps figures that took over CHART_CACHE_MIN_BUILD_MS to build)
+Results carry a result_key, as they do when the query executor produced them.
+Payload is the size of the figure JSON the browser receives. The legacy chart
+is skipped above --legacy-max rows (at 3,000 rows it takes seconds).
+
+    python benchmarks/chart_scale.py [--rows 10,100,1000,10000,50000] [--output FILE]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agents import visualization_agent as viz
+
+SHAPES = ("bar", "grouped", "scatter")
+
+
+def synthetic_result(shape, rows, seed=0):
+    rng = np.random.default_rng(seed)
+    names = [f"PANCHAYAT {i:05d}" for i in range(rows)]
+    if shape == "bar":
+        return pd.DataFrame({"panchayat_name": names, "total": rng.gamma(2.0, 50.0, rows).round(2)})
+    if shape == "grouped":
+        df = pd.DataFrame({"panchayat_name": names})
+        for col in ("sc", "st", "minority", "others"):
+            df[col] = rng.gamma(2.0, 10.0, rows).round(2)
+        df["total"] = df[["sc", "st", "minority", "others"]].sum(axis=1)
+        return df
+    return pd.DataFrame({"allocated_total": rng.gamma(2.0, 1000.0, rows), "percentage_utilization": rng.uniform(0, 100, rows)})
+
+
+def legacy_figure(df):
+    """The chart the agent built before results were capped: every row, one trace per category."""
+    non_empty = df.columns[df.notna().any()]
+    numeric_cols = [c for c in non_empty if pd.api.types.is_numeric_dtype(df[c])]
+    categorical_cols = [c for c in non_empty if c not in numeric_cols]
+    if len(numeric_cols) == 1 and len(categorical_cols) == 1:
+        cat_col, num_col = categorical_cols[0], numeric_cols[0]
+        fig = px.bar(df, x=cat_col, y=num_col, text=num_col, title=f"{num_col} by {cat_col}", color=cat_col)
+        fig.update_traces(texttemplate='%{text}', textposition='outside')
+        return fig
+    if len(numeric_cols) > 1 and len(categorical_cols) == 1:
+        return px.bar(df, x=categorical_cols[0], y=numeric_cols, barmode='group')
+    return None
+
+
+def timed(fn, repeat):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+def payload(fig):
+    return len(fig.to_json()) if fig is not None else 0
+
+
+def measure(shape, rows, repeat, legacy_max):
+    df = synthetic_result(shape, rows)
+    state = {"query_result": df, "result_key": f"bench:{shape}:{rows}"}
+    row = {"shape": shape, "rows": rows}
+
+    if rows <= legacy_max:
+        fig, seconds = timed(lambda: legacy_figure(df), repeat)
+        row.update(legacy_ms=seconds * 1000, legacy_bytes=payload(fig), legacy_traces=len(fig.data) if fig else 0)
+
+    def build():
+        viz.figure_cache.invalidate()
+        return viz.visualization_agent(state)["visualization"]
+
+    fig, seconds = timed(build, repeat)
+    row.update(build_ms=seconds * 1000, build_bytes=payload(fig), build_traces=len(fig.data) if fig else 0,
+               trace_type=fig.data[0].type if fig else None)
+    _, seconds = timed(lambda: viz.visualization_agent(state)["visualization"], repeat)
+    row.update(cached_ms=seconds * 1000)
+    return row
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", default="10,100,1000,10000,50000", help="comma-separated result sizes")
+    parser.add_argument("--shapes", default=",".join(SHAPES), help=f"comma-separated subset of {', '.join(SHAPES)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--legacy-max", type=int, default=1000, help="largest result charted the legacy way")
+    parser.add_argument("--output", default=None, help="also write the measurements to this JSON file")
+    args = parser.parse_args()
+
+    viz.visualization_agent({"query_result": synthetic_result("bar", 5)})  # import and template warm-up
+    results = [measure(shape, int(rows), args.repeat, args.legacy_max)
+               for shape in args.shapes.split(",") for rows in args.rows.split(",")]
+
+    print(f"best of {args.repeat}; top_n={viz.CHART_TOP_N}, max_traces={viz.CHART_MAX_TRACES}, "
+          f"webgl above {viz.CHART_WEBGL_POINTS} points")
+    print(f"{'shape':<9}{'rows':>7}{'legacy ms':>11}{'legacy kB':>11}{'traces':>8}"
+          f"{'build ms':>10}{'cached ms':>11}{'kB':>8}{'traces':>8}  trace")
+    for r in results:
+        legacy = (f"{r['legacy_ms']:>11.1f}{r['legacy_bytes'] / 1024:>11.1f}{r['legacy_traces']:>8}"
+                  if "legacy_ms" in r else f"{'-':>11}{'-':>11}{'-':>8}")
+        print(f"{r['shape']:<9}{r['rows']:>7}{legacy}{r['build_ms']:>10.1f}{r['cached_ms']:>11.1f}"
+              f"{r['build_bytes'] / 1024:>8.1f}{r['build_traces']:>8}  {r['trace_type']}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"settings": viz.CHART_SETTINGS, "repeat": args.repeat, "results": results}, f, indent=2)
+        print(f"[INFO] Measurements written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+ETL scale benchmark: generates synthetic workbooks at 1x, 10x and 100x the
+bundled data (db/generate_data.py) and times a full db/setup.py load of each
+into a scratch database, reporting load time, fact rows/sec and peak memory.
+
+db/setup.py runs as a subprocess with a fresh parse cache, so every run is a
+cold load; peak memory is the largest resident set of the loader or its parse
+workers. The scratch database is created next to the one configured in .env
+and dropped afterwards unless --keep is given.
+
+    python benchmarks/etl_scale.py [--scales 1 10 100] [--output etl.json]
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+from dotenv import load_dotenv
+import psycopg2
+from psycopg2 import sql
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+from db.generate_data import SCALES, generate
+
+load_dotenv()
+
+SETUP_SCRIPT = os.path.join(PROJECT_ROOT, "db", "setup.py")
+# Phases reported by db/setup.py
+PHASES = {
+    "parse": re.compile(r"Parsed \d+ changed workbook\(s\) in ([\d.]+)s"),
+    "rollup": re.compile(r"Rollup refreshed in ([\d.]+)s"),
+}
+
+
+def admin_execute(statement):
+    """Run a CREATE/DROP DATABASE statement on the database configured in .env."""
+    conn = psycopg2.connect(host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"), dbname=os.getenv("DB_NAME"),
+                            user=os.getenv("DB_USER"), password=os.getenv("DB_PASS"))
+    conn.autocommit = True  # CREATE/DROP DATABASE cannot run in a transaction
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(statement)
+    finally:
+        conn.close()
+
+
+def recreate_database(name):
+    admin_execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(name)))
+    admin_execute(sql.SQL("CREATE DATABASE {}").format(sql.Identifier(name)))
+
+
+def drop_database(name):
+    admin_execute(sql.SQL("DROP DATABASE IF EXISTS {}").format(sql.Identifier(name)))
+
+
+def run_setup(excel_dir, database, cache_dir):
+    """Run db/setup.py on excel_dir; returns (seconds, peak RSS in MB, setup.py output)."""
+    env = dict(os.environ, DB_NAME=database, EXCEL_CACHE_DIR=cache_dir)
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, SETUP_SCRIPT, "--excel-dir", excel_dir], env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    output = proc.stdout.read()
+    # wait4 reports the child's own peak RSS, including parse workers it waited for
+    _, status, usage = os.wait4(proc.pid, 0)
+    proc.returncode = os.waitstatus_to_exitcode(status)
+    seconds = time.perf_counter() - started
+    if proc.returncode:
+        raise RuntimeError(f"db/setup.py failed with exit code {proc.returncode}:\n{output}")
+    return seconds, usage.ru_maxrss / 1024, output
+
+
+def phase_seconds(output):
+    phases = {}
+    for phase, pattern in PHASES.items():
+        found = pattern.search(output)
+        if found:
+            phases[phase] = float(found.group(1))
+    return phases
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", choices=sorted(SCALES), default=sorted(SCALES))
+    parser.add_argument("--database", default="pmayg_etl_bench", help="scratch database (recreated per run)")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch database after the last run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="print db/setup.py output")
+    parser.add_argument("--output", help="write the JSON report here")
+    args = parser.parse_args()
+
+    results = []
+    try:
+        for scale in args.scales:
+            with tempfile.TemporaryDirectory() as work_dir:
+                excel_dir = os.path.join(work_dir, "excel")
+                started = time.perf_counter()
+                counts = generate(excel_dir, *SCALES[scale], seed=args.seed)
+                generated = time.perf_counter() - started
+
+                recreate_database(args.database)
+                seconds, peak_mb, output = run_setup(excel_dir, args.database, os.path.join(work_dir, "cache"))
+                if args.verbose:
+                    print(output, end="")
+                results.append({
+                    "scale": scale,
+                    "shape": dict(zip(("states", "districts", "blocks", "panchayats"), SCALES[scale])),
+                    **counts,
+                    "generate_seconds": round(generated, 3),
+                    "load_seconds": round(seconds, 3),
+                    "rows_per_second": round(counts["facts"] / seconds, 1),
+                    "peak_rss_mb": round(peak_mb, 1),
+                    "phases": phase_seconds(output),
+                })
+                print(f"[INFO] {scale}x: {counts['files']} workbooks, {counts['facts']:,} facts loaded in "
+                      f"{seconds:.2f}s, peak {peak_mb:.0f} MB")
+    finally:
+        if not args.keep:
+            drop_database(args.database)
+
+    print(f"{'scale':>6}{'files':>7}{'facts':>10}{'load s':>9}{'parse s':>9}{'rows/s':>10}{'peak MB':>9}")
+    for r in results:
+        print(f"{r['scale']:>5}x{r['files']:>7}{r['facts']:>10,}{r['load_seconds']:>9.2f}"
+              f"{r['phases'].get('parse', float('nan')):>9.2f}{r['rows_per_second']:>10,.0f}{r['peak_rss_mb']:>9.0f}")
+
+    if args.output:
+        report = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"), "seed": args.seed, "runs": results}
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[INFO] Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Place-name lookup latency of the geography index (utils/geo_index.py) at scale.
+
+Builds an index of a synthetic hierarchy with --panchayats panchayats (names
+from db/generate_data.py, about 100 per block) and times, per call:
+  find      exact name lookup
+  parent    parent-scoped lookup, as db/setup.py resolves a workbook's parent
+  prefix    the first four letters of a panchayat name (up to 10 places)
+  fuzzy     a panchayat name with one typo (swap, deletion, insertion or substitution)
+  mentions  place resolution of a question naming a panchayat, as the query
+            pipeline runs it (text_to_sql.resolve_places)
+  misspelt  the same with the panchayat name misspelt
+p50, p99 and max are over --lookups calls; the requirement is under 1 ms.
+
+    python benchmarks/geo_lookup.py [--panchayats 250000] [--lookups 2000] [--output FILE]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.generate_data import NameGenerator
+from utils.geo_index import GeoIndex
+
+PANCHAYATS_PER_BLOCK = 100
+BLOCKS_PER_DISTRICT = 10
+DISTRICTS_PER_STATE = 25
+
+
+def build_index(panchayats, seed=0):
+    """(index, [(panchayat name, block id)]) for a synthetic hierarchy with about `panchayats` panchayats."""
+    names = NameGenerator(np.random.default_rng(seed))
+    blocks = max(1, panchayats // PANCHAYATS_PER_BLOCK)
+    districts = max(1, blocks // BLOCKS_PER_DISTRICT)
+    states = max(1, districts // DISTRICTS_PER_STATE)
+    index = GeoIndex()
+    for state_id, name in enumerate(names.unique(states, set()), start=1):
+        index.add("state", state_id, name)
+    for district_id, name in enumerate(names.unique(districts, set()), start=1):
+        index.add("district", district_id, name, (district_id - 1) % states + 1)
+    for block_id, name in enumerate(names.unique(blocks, set()), start=1):
+        index.add("block", block_id, name, (block_id - 1) % districts + 1)
+    entries = []
+    panchayat_id = 0
+    for block_id in range(1, blocks + 1):
+        for name in names.unique(PANCHAYATS_PER_BLOCK, set(), suffixes=True):
+            panchayat_id += 1
+            index.add("panchayat", panchayat_id, name, block_id)
+            entries.append((name, block_id))
+    return index, entries
+
+
+def misspell(name, rng):
+    """name with one typo: two letters swapped, or one deleted, inserted or replaced."""
+    i = int(rng.integers(1, len(name) - 1))
+    kind = rng.choice(["swap", "delete", "insert", "replace"])
+    letter = chr(int(rng.integers(ord("A"), ord("Z") + 1)))
+    if kind == "swap":
+        return name[:i - 1] + name[i] + name[i - 1] + name[i + 1:]
+    if kind == "delete":
+        return name[:i] + name[i + 1:]
+    if kind == "insert":
+        return name[:i] + letter + name[i:]
+    return name[:i] + letter + name[i + 1:]
+
+
+def timed(fn, inputs):
+    """Per-call latencies in microseconds, and the results."""
+    latencies, results = [], []
+    for value in inputs:
+        started = time.perf_counter()
+        results.append(fn(value))
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return np.array(latencies), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--panchayats", type=int, default=250000)
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--output", default=None, help="also write the measurements to this JSON file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    index, entries = build_index(args.panchayats)
+    build_seconds = time.perf_counter() - started
+    started = time.perf_counter()
+    index.build_fuzzy_index()
+    fuzzy_build_seconds = time.perf_counter() - started
+    hashes, owners, _ = index._deletions
+    print(f"[INFO] {len(index):,} places indexed in {build_seconds:.2f}s; fuzzy index built in "
+          f"{fuzzy_build_seconds:.2f}s ({(hashes.nbytes + owners.nbytes) / 2**20:.0f} MB)")
+
+    rng = np.random.default_rng(1)
+    sample = [entries[i] for i in rng.integers(0, len(entries), args.lookups)]
+    typos = [misspell(name, rng) for name, _ in sample]
+    cases = {
+        "find": timed(lambda entry: index.find(entry[0]), sample),
+        "parent": timed(lambda entry: index.resolve(entry[0], "panchayat", entry[1]), sample),
+        "prefix": timed(lambda entry: index.prefix(entry[0][:4]), sample),
+        "fuzzy": timed(index.fuzzy, typos),
+        "mentions": timed(lambda entry: index.mentions(f"Which category received the most funds in {entry[0]} panchayat?",
+                                                       fuzzy=True), sample),
+        "misspelt": timed(lambda typo: index.mentions(f"Which category received the most funds in {typo} panchayat?",
+                                                      fuzzy=True), typos),
+    }
+    # A misspelt name counts as found when its closest match is the intended name
+    found = sum(any(p.name == name for p in result) for (name, _), result in zip(sample, cases["fuzzy"][1]))
+
+    results = []
+    print(f"{'lookup':<10}{'p50 us':>9}{'p99 us':>9}{'max us':>9}")
+    for label, (latencies, _) in cases.items():
+        row = {"lookup": label, "p50_us": float(np.percentile(latencies, 50)),
+               "p99_us": float(np.percentile(latencies, 99)), "max_us": float(latencies.max())}
+        results.append(row)
+        print(f"{label:<10}{row['p50_us']:>9.1f}{row['p99_us']:>9.1f}{row['max_us']:>9.1f}")
+    print(f"[INFO] {found}/{len(typos)} misspelt names found by fuzzy lookup")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"places": len(index), "build_seconds": build_seconds,
+                       "fuzzy_build_seconds": fuzzy_build_seconds, "misspelt_found": found,
+                       "lookups": args.lookups, "results": results}, f, indent=2)
+        print(f"[INFO] Measurements written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
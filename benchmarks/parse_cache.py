@@ -0,0 +1,54 @@
+"""
+Timing report for Excel parsing: cold sequential parse, cold parallel parse
+and warm (memory-mapped) cache reads over the workbooks in db/excel.
+
+    python benchmarks/parse_cache.py [--excel-dir DIR] [--repeat N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.excel_cache import load_sheets
+
+DEFAULT_EXCEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "db", "excel")
+
+
+def timed(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--excel-dir", default=DEFAULT_EXCEL_DIR)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.excel_dir, f) for f in os.listdir(args.excel_dir)
+        if f[:3] in ("01_", "02_", "03_", "04_") and f.endswith(".xlsx")
+    )
+    rows = sum(len(df) for df in load_sheets(paths, use_cache=False, workers=1).values())
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cold = timed(lambda: load_sheets(paths, use_cache=False, workers=1), args.repeat)
+        parallel = timed(lambda: load_sheets(paths, use_cache=False, workers=args.workers), args.repeat)
+        load_sheets(paths, cache_dir=cache_dir, workers=args.workers)  # populate the cache
+        warm = timed(lambda: load_sheets(paths, cache_dir=cache_dir), args.repeat)
+
+    print(f"{len(paths)} workbook(s), {rows} rows, best of {args.repeat}")
+    print(f"{'mode':<18}{'seconds':>10}{'speed-up':>10}")
+    for mode, seconds in [("cold sequential", cold), ("cold parallel", parallel), ("warm cache", warm)]:
+        print(f"{mode:<18}{seconds:>10.3f}{cold / seconds:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,212 @@
+"""
+End-to-end pipeline benchmark: replays a question corpus through the compiled
+LangGraph pipeline at a given concurrency and reports throughput and per-stage
+p50/p99 latency (graph nodes, DB queries and LLM calls, from utils/tracing.py).
+
+The LLM is the fake backend from agents/llm_client.py, so runs are offline and
+repeatable; --llm-latency-ms sets its per-call latency. Queries go to the
+database configured by PG* in the environment (load it first with --load, or
+python db/setup.py). SQL and result caches are off unless --caches is given.
+
+Results are written as JSON so runs can be compared between commits:
+
+    python benchmarks/pipeline_bench.py --concurrency 8 --output bench.json
+    python benchmarks/pipeline_bench.py --concurrency 8 --baseline bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+# Template-shaped questions (answered without the LLM) and free-form ones
+QUESTIONS = [
+    "Which beneficiary category received the highest funds in Maharashtra?",
+    "Which beneficiary category received the least funds in Pune district?",
+    "Show allocations for all beneficiary categories in Khed block.",
+    "Compare allocations across districts in Maharashtra",
+    "Show the category breakdown for blocks in Pune district",
+    "Do the district totals add up to the Maharashtra total?",
+    "What is the total allocation versus total released funds in Maharashtra?",
+    "What is the percentage utilization in Maharashtra?",
+    "Which district in Maharashtra has the highest utilization?",
+    "How much was allocated to SC beneficiaries across districts in Maharashtra?",
+    "Which panchayats in Khed block received no funds for ST beneficiaries?",
+    "What share of the Pune district total went to Minority beneficiaries?",
+    "Rank blocks in Pune district by their Others allocation",
+    "Which states have utilized less than half of their available funds?",
+]
+
+# Span names reported as stages, in pipeline order; anything else recorded is listed after them
+STAGES = ("pipeline", "node.text_to_sql", "node.query_executor", "node.insights", "node.visualization",
+          "db.query", "db.fetch", "llm.invoke", "llm.stream")
+
+
+def configure(args, cache_dir):
+    """Environment for the fake LLM, caches and tracing; must run before the agents are imported."""
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["LLM_FAKE_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["LLM_FAKE_ERROR_RATE"] = str(args.llm_error_rate)
+    # The gateway's Groq quotas would dominate the timings; keep only the concurrency cap
+    os.environ.setdefault("LLM_REQUESTS_PER_MINUTE", "1000000")
+    os.environ.setdefault("LLM_TOKENS_PER_MINUTE", "1000000000")
+    os.environ["SQL_CACHE_ENABLED"] = "1" if args.caches else "0"
+    os.environ["RESULT_CACHE_ENABLED"] = "1" if args.caches else "0"
+    os.environ["SQL_CACHE_PATH"] = os.path.join(cache_dir, "text_to_sql.sqlite")
+    os.environ["RESULT_CACHE_SPILL"] = "0"
+    os.environ["TRACING_ENABLED"] = "1"
+    os.environ["TRACE_JSONL_PATH"] = args.traces or ""
+    os.environ["TRACE_PROMETHEUS_PATH"] = ""
+    os.environ["TRACE_BUFFER_SIZE"] = str(max(20000, args.requests * 50))
+
+
+def load_questions(path):
+    if not path:
+        return QUESTIONS
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PROJECT_ROOT,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def replay(app, questions, requests, concurrency):
+    """Run `requests` questions (cycling through the corpus) with at most `concurrency` in flight."""
+    from utils import tracing
+
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = {"ok": 0, "query_error": 0, "exception": 0}
+    sources = {}
+
+    async def one(i):
+        question = questions[i % len(questions)]
+        trace_id = tracing.new_trace_id()
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                output = await app.ainvoke({"messages": [question], "trace_id": trace_id})
+            except Exception as e:
+                outcomes["exception"] += 1
+                print(f"[WARN] {question!r}: {type(e).__name__}: {e}")
+                return
+            finally:
+                tracing.record("pipeline", time.perf_counter() - started, trace_id=trace_id)
+        result = output.get("query_result")
+        outcomes["query_error" if isinstance(result, dict) and "error" in result else "ok"] += 1
+        source = output.get("sql_source", "unknown")
+        sources[source] = sources.get(source, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - started, outcomes, sources
+
+
+def stage_report(stats):
+    ordered = [name for name in STAGES if name in stats] + sorted(set(stats) - set(STAGES))
+    return {
+        name: {"count": stats[name]["count"], "p50_ms": round(float(stats[name]["p50"]), 3),
+               "p99_ms": round(float(stats[name]["p99"]), 3), "max_ms": round(float(stats[name]["max"]), 3)}
+        for name in ordered
+    }
+
+
+def print_report(report, baseline=None):
+    base_stages = (baseline or {}).get("stages", {})
+    print(f"[INFO] {report['requests']} requests at concurrency {report['config']['concurrency']}: "
+          f"{report['throughput_rps']:.2f} req/s over {report['wall_seconds']:.2f}s")
+    if baseline:
+        change = report["throughput_rps"] / baseline["throughput_rps"] - 1 if baseline.get("throughput_rps") else 0
+        print(f"[INFO] Baseline ({baseline.get('commit') or 'unknown commit'}): "
+              f"{baseline['throughput_rps']:.2f} req/s ({change:+.1%})")
+    print(f"[INFO] Outcomes: {report['outcomes']}; SQL sources: {report['sql_sources']}")
+    print(f"{'stage':<22}{'count':>7}{'p50 ms':>10}{'p99 ms':>10}" + (f"{'p50 Δ':>9}{'p99 Δ':>9}" if baseline else ""))
+    for name, s in report["stages"].items():
+        line = f"{name:<22}{s['count']:>7}{s['p50_ms']:>10.1f}{s['p99_ms']:>10.1f}"
+        base = base_stages.get(name)
+        if base:
+            for key in ("p50_ms", "p99_ms"):
+                line += f"{s[key] / base[key] - 1:>+9.0%}" if base[key] else f"{'':>9}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=4, help="questions in flight at once")
+    parser.add_argument("--requests", type=int, default=None, help="questions to run (default: the corpus twice)")
+    parser.add_argument("--warmup", type=int, default=2, help="questions run first and left out of the report")
+    parser.add_argument("--questions", help="file with one question per line (default: built-in corpus)")
+    parser.add_argument("--llm-latency-ms", type=float, default=300, help="latency of each fake LLM call")
+    parser.add_argument("--llm-error-rate", type=float, default=0, help="share of fake LLM calls failing with a 429")
+    parser.add_argument("--caches", action="store_true", help="keep the SQL and result caches on")
+    parser.add_argument("--load", action="store_true", help="(re)load db/excel into the database first")
+    parser.add_argument("--output", help="write the JSON report here (default: stdout only)")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    parser.add_argument("--traces", help="also append every span to this JSONL file")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    args.requests = args.requests or 2 * len(questions)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        configure(args, cache_dir)
+        from agents.pipeline import build_graph
+        from utils import event_loop, tracing
+
+        if args.load:
+            from db import setup
+            setup.main()
+
+        app = build_graph(use_async=True)
+        if args.warmup:
+            event_loop.run(replay(app, questions, args.warmup, 1))
+        measured_from = time.time()
+        wall, outcomes, sources = event_loop.run(replay(app, questions, args.requests, args.concurrency))
+        stats = tracing.stage_percentiles(time.time() - measured_from)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "config": {
+            "concurrency": args.concurrency,
+            "warmup": args.warmup,
+            "questions": len(questions),
+            "llm_latency_ms": args.llm_latency_ms,
+            "llm_error_rate": args.llm_error_rate,
+            "caches": args.caches,
+        },
+        "requests": args.requests,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(args.requests / wall, 3),
+        "outcomes": outcomes,
+        "sql_sources": sources,
+        "stages": stage_report(stats),
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"[INFO] Report written to {args.output}")
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
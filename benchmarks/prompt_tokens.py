@@ -0,0 +1,72 @@
+"""
+Token-budget report for the text-to-SQL prompt: every few-shot example and the
+full schema (before) against the top-k retrieved examples and the schema pruned
+to the question's geography levels (after).
+
+Token counts use tiktoken's cl100k_base encoding when it is installed and a
+four-characters-per-token estimate otherwise. Places are resolved against the
+database when it is reachable.
+
+    python benchmarks/prompt_tokens.py [--k K]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agents.text_to_sql import FEW_SHOT_K, build_prompt, get_geo_index, resolve_places
+from few_shot_examples.examples import examples
+
+QUESTIONS = [ex["query"] for ex in examples] + [
+    "What is the total allocation versus total released funds in Maharashtra?",
+    "Show allocations for all beneficiary categories in Khed block.",
+    "Which district in Maharashtra has the highest utilization?",
+    "How much was allocated to SC beneficiaries across districts in Maharashtra?",
+    "Which panchayats in Khed block received no funds for ST beneficiaries?",
+    "What share of the Pune district total went to Minority beneficiaries?",
+    "Rank blocks in Pune district by their Others allocation",
+    "Which states have utilized less than half of their available funds?",
+]
+
+try:
+    import tiktoken
+
+    _encoding = tiktoken.get_encoding("cl100k_base")
+    TOKENIZER = "cl100k_base"
+
+    def count_tokens(text):
+        return len(_encoding.encode(text))
+except ImportError:
+    TOKENIZER = "~4 chars/token estimate"
+
+    def count_tokens(text):
+        return (len(text) + 3) // 4
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=FEW_SHOT_K, help="examples retrieved per question")
+    args = parser.parse_args()
+
+    geo_index = get_geo_index()
+    if geo_index is None:
+        print("[WARN] Database unreachable: places are not resolved, so schemas are only pruned by level words.")
+
+    before_total = after_total = 0
+    print(f"{'before':>7} {'after':>7}  question")
+    for question in QUESTIONS:
+        places = resolve_places(question, geo_index) if geo_index else []
+        before = count_tokens(build_prompt(question, places, k=len(examples), prune=False))
+        after = count_tokens(build_prompt(question, places, k=args.k, prune=True))
+        before_total += before
+        after_total += after
+        print(f"{before:>7} {after:>7}  {question}")
+
+    n = len(QUESTIONS)
+    print(f"[INFO] Tokenizer: {TOKENIZER}; {len(examples)} examples, k={args.k}")
+    print(f"[INFO] Average prompt: {before_total / n:.0f} tokens before, {after_total / n:.0f} after "
+          f"({1 - after_total / before_total:.0%} smaller)")
+
+
+if __name__ == "__main__":
+    main()
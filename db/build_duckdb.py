@@ -0,0 +1,177 @@
+"""
+Build the embedded DuckDB database (DB_BACKEND=duckdb) from the db/excel workbooks.
+
+The workbooks are parsed with the same cache and cleanup as db/setup.py,
+geography ids are assigned in the order db/setup.py inserts them, and
+pmayg_rollup and the per-level wide tables are created from the materialized
+view queries in schema.sql, so both engines answer the same SQL with the same
+results (see tests/test_backend_parity.py).
+
+The database is written to a temporary file and moved into place, so a running
+app keeps reading the previous version until it notices the new file.
+
+    python db/build_duckdb.py [--excel-dir DIR] [--output FILE] [--export-parquet DIR]
+"""
+import argparse
+import os
+import sys
+import time
+
+import duckdb
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from db.setup import EXCEL_FOLDER, INDICATORS, LEVEL_FILES, LEVELS, MATERIALIZED_VIEWS, resolve_parent, to_long_facts
+from utils.duckdb_db import DUCKDB_PATH
+from utils.excel_cache import file_hash, load_sheets
+from utils.geo_index import GeoIndex
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DUCKDB_SCHEMA_FILE = os.path.join(PROJECT_ROOT, "schema_duckdb.sql")
+POSTGRES_SCHEMA_FILE = os.path.join(PROJECT_ROOT, "schema.sql")
+
+REPORT_ID = 1
+
+# Sort order of the tables built from schema.sql's materialized views
+VIEW_ORDER = {
+    "pmayg_rollup": "geo_level, geo_name, indicator",
+    "pmayg_state_wide": "state_name",
+    "pmayg_district_wide": "district_name",
+    "pmayg_block_wide": "block_name",
+    "pmayg_panchayat_wide": "panchayat_name",
+}
+
+
+def view_query(view):
+    """The SELECT behind a materialized view in schema.sql, so the two engines share one definition."""
+    with open(POSTGRES_SCHEMA_FILE) as f:
+        schema = f.read()
+    header = f"CREATE MATERIALIZED VIEW {view} AS"
+    start = schema.index(header) + len(header)
+    return schema[start:schema.index("WITH NO DATA;", start)].strip()
+
+
+def workbook_files(excel_dir):
+    return {prefix: sorted(f for f in os.listdir(excel_dir) if f.startswith(prefix) and f.endswith(".xlsx"))
+            for prefix, _ in LEVEL_FILES}
+
+
+def build_frames(excel_dir):
+    """Geography, fact and source-file DataFrames for every workbook in excel_dir."""
+    files = workbook_files(excel_dir)
+    paths = [os.path.join(excel_dir, f) for prefix, _ in LEVEL_FILES for f in files[prefix]]
+    started = time.perf_counter()
+    sheets = load_sheets(paths)
+    print(f"[INFO] Parsed {len(paths)} workbook(s) in {time.perf_counter() - started:.2f}s")
+
+    indicator_map = {name: i for i, (name, _) in enumerate(INDICATORS, start=1)}
+    geo_index = GeoIndex()
+    places = {level: {} for _, level in LEVEL_FILES}  # level -> {(parent_id, name): id}
+    sheet_facts = {}  # (level, parent_id) -> facts; a later sheet for the same parent replaces it, as in setup.py
+    sources = []
+
+    for prefix, level in LEVEL_FILES:
+        spec = LEVELS[level]
+        for file in files[prefix]:
+            parent_id = None
+            if spec["parent_level"]:
+                parent = resolve_parent(geo_index, file, level)
+                if parent is None:
+                    continue
+                parent_id = parent.id
+
+            df = sheets[file]
+            geo_ids = {}
+            for name in dict.fromkeys(df[spec["name_col"]]):
+                key = (parent_id, name)
+                if key not in places[level]:
+                    places[level][key] = len(places[level]) + 1
+                    geo_index.add(level, places[level][key], name, parent_id)
+                geo_ids[name] = places[level][key]
+
+            facts = to_long_facts(df, spec["name_col"], geo_ids, indicator_map)
+            sheet_facts[(level, parent_id)] = facts.rename(columns={"geo_id": spec["id_col"]}).assign(geo_level=level)
+            path = os.path.join(excel_dir, file)
+            sources.append((file, REPORT_ID, file_hash(path), os.path.getmtime(path)))
+
+    geography = {}
+    for _, level in LEVEL_FILES:
+        spec = LEVELS[level]
+        rows = [(geo_id, parent_id, name) for (parent_id, name), geo_id in places[level].items()]
+        geography[spec["table"]] = pd.DataFrame(rows, columns=[spec["id_col"], spec["parent_col"] or "parent", "name"])
+
+    facts = pd.concat(sheet_facts.values(), ignore_index=True) if sheet_facts else pd.DataFrame()
+    facts = facts.reindex(columns=["state_id", "district_id", "block_id", "panchayat_id", "indicator_id", "amount",
+                                   "geo_level"])
+    facts.insert(0, "report_id", REPORT_ID)
+    facts.insert(0, "fact_id", range(1, len(facts) + 1))
+    for col in ("state_id", "district_id", "block_id", "panchayat_id"):
+        facts[col] = facts[col].astype("Int64")
+    sources = pd.DataFrame(sources, columns=["file_name", "report_id", "content_hash", "mtime"])
+    return geography, facts, sources
+
+
+def write_database(path, geography, facts, sources):
+    conn = duckdb.connect(path)
+    try:
+        with open(DUCKDB_SCHEMA_FILE) as f:
+            conn.execute(f.read())
+        conn.executemany("INSERT INTO pmayg_indicator VALUES (?, ?, ?)",
+                         [(i, name, type_) for i, (name, type_) in enumerate(INDICATORS, start=1)])
+        conn.execute("INSERT INTO pmayg_report (report_id, report_type, report_date, source_file) "
+                     "VALUES (?, 'allocation', now(), NULL)", [REPORT_ID])
+
+        for table, df in geography.items():
+            columns = [c for c in df.columns if c != "parent"]
+            conn.register("frame", df)
+            conn.execute(f"INSERT INTO {table} ({', '.join(columns)}) SELECT {', '.join(columns)} FROM frame")
+            conn.unregister("frame")
+        conn.register("frame", facts)
+        conn.execute("INSERT INTO pmayg_fund_fact (fact_id, report_id, state_id, district_id, block_id, panchayat_id, "
+                     "indicator_id, amount, geo_level) SELECT * FROM frame")
+        conn.unregister("frame")
+        conn.register("frame", sources)
+        conn.execute("INSERT INTO pmayg_source_file (file_name, report_id, content_hash, mtime) SELECT * FROM frame")
+        conn.unregister("frame")
+
+        started = time.perf_counter()
+        # Sorted so lookups by level and name only read the row groups that can match
+        for view in MATERIALIZED_VIEWS:
+            conn.execute(f"CREATE TABLE {view} AS SELECT * FROM ({view_query(view)}) v ORDER BY {VIEW_ORDER[view]}")
+        conn.execute("UPDATE pmayg_report SET refreshed_at = now() WHERE report_id = ?", [REPORT_ID])
+        print(f"[INFO] Rollup built in {time.perf_counter() - started:.2f}s")
+        conn.execute("CHECKPOINT")
+    finally:
+        conn.close()
+
+
+def main(excel_dir=None, output=None, export_parquet=None):
+    excel_dir = os.path.abspath(excel_dir or EXCEL_FOLDER)
+    output = os.path.abspath(output or DUCKDB_PATH)
+    started = time.perf_counter()
+
+    geography, facts, sources = build_frames(excel_dir)
+    tmp = f"{output}.{os.getpid()}.tmp"
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    write_database(tmp, geography, facts, sources)
+    os.replace(tmp, output)
+    print(f"[INFO] {len(facts)} facts from {len(sources)} workbook(s) written to {output} "
+          f"in {time.perf_counter() - started:.2f}s")
+
+    if export_parquet:
+        conn = duckdb.connect(output, read_only=True)
+        try:
+            conn.execute(f"EXPORT DATABASE '{os.path.abspath(export_parquet)}' (FORMAT parquet)")
+        finally:
+            conn.close()
+        print(f"[INFO] Tables exported as Parquet to {export_parquet}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the embedded DuckDB database from the PMAY-G workbooks.")
+    parser.add_argument("--excel-dir", default=None, help=f"folder with the 01_-04_ workbooks (default: {EXCEL_FOLDER})")
+    parser.add_argument("--output", default=None, help=f"DuckDB file to write (default: DUCKDB_PATH, {DUCKDB_PATH})")
+    parser.add_argument("--export-parquet", default=None, metavar="DIR",
+                        help="also export every table as Parquet to DIR")
+    args = parser.parse_args()
+    main(excel_dir=args.excel_dir, output=args.output, export_parquet=args.export_parquet)
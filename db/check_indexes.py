@@ -0,0 +1,81 @@
+"""
+Check that the few-shot example queries read the rollup, wide and fact tables through an index.
+
+Each query in few_shot_examples/examples.py is planned with EXPLAIN (FORMAT JSON).
+On the small bundled dataset a sequential scan is often cheapest, so by default
+sequential scans are disabled for the check: the planner then falls back to a
+seq scan only when no usable index exists. Pass --natural to see the plans the
+planner would pick on its own. A sequential scan of a wide table with no filter
+is accepted: the query asks for every row of that level, and the table holds
+nothing else.
+
+    python db/check_indexes.py [--natural]
+"""
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+import psycopg2
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from few_shot_examples.examples import examples
+
+load_dotenv()
+
+WIDE_TABLES = {"pmayg_state_wide", "pmayg_district_wide", "pmayg_block_wide", "pmayg_panchayat_wide"}
+FACT_TABLES = {"pmayg_rollup", "pmayg_fund_fact"} | WIDE_TABLES
+INDEX_NODES = {"Index Scan", "Index Only Scan", "Bitmap Heap Scan"}
+
+
+def fact_scans(plan, found=None):
+    """(relation, node type, index names, filtered) for every scan of a fact table in a plan tree."""
+    found = [] if found is None else found
+    if plan.get("Relation Name") in FACT_TABLES:
+        indexes = [plan["Index Name"]] if "Index Name" in plan else [
+            child["Index Name"] for child in plan.get("Plans", []) if "Index Name" in child
+        ]
+        found.append((plan["Relation Name"], plan["Node Type"], indexes, "Filter" in plan))
+    for child in plan.get("Plans", []):
+        fact_scans(child, found)
+    return found
+
+
+def uses_indexes(scans):
+    """True when every fact table scan of a plan goes through an index, or reads a whole wide table."""
+    return bool(scans) and all(node in INDEX_NODES or (relation in WIDE_TABLES and node == "Seq Scan" and not filtered)
+                               for relation, node, _, filtered in scans)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--natural", action="store_true", help="do not disable sequential scans")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(
+        host=os.getenv("DB_HOST"), port=os.getenv("DB_PORT"), dbname=os.getenv("DB_NAME"),
+        user=os.getenv("DB_USER"), password=os.getenv("DB_PASS"),
+    )
+    cursor = conn.cursor()
+    if not args.natural:
+        cursor.execute("SET enable_seqscan = off")
+
+    failures = 0
+    for ex in examples:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + ex["sql"])
+        plan = cursor.fetchone()[0][0]["Plan"]
+        scans = fact_scans(plan)
+        ok = uses_indexes(scans)
+        failures += not ok
+        detail = "; ".join(f"{node} on {relation} ({', '.join(indexes) or 'no index'})"
+                           for relation, node, indexes, _ in scans)
+        print(f"[{'OK' if ok else 'FAIL'}] {ex['query']}\n       {detail or 'fact tables not scanned'}")
+
+    cursor.close()
+    conn.close()
+    print(f"[INFO] {len(examples) - failures}/{len(examples)} example queries use index scans or read a whole wide table.")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""
+Generate a synthetic PMAY-G hierarchy as 01_-04_ workbooks in the layout
+db/setup.py loads: one state workbook, a district workbook per state, a block
+workbook per district and a panchayat workbook per block.
+
+Beneficiary amounts are drawn per panchayat and summed upwards, so every
+'Total' row and every parent row matches its children, as in the real data.
+State fund-flow columns keep their identities (Allocated_Total =
+Allocated_Central + Allocated_State, Total Available Funds = Opening Balance +
+Released_Total, ...). Parent names are single unique words because db/setup.py
+resolves a workbook's parent from its file name (03_<district>_blocks.xlsx).
+
+    python db/generate_data.py OUT_DIR --scale 10
+    python db/generate_data.py OUT_DIR --states 20 --districts 30 --blocks 12 --panchayats 100
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# Children per parent: (states, districts per state, blocks per district, panchayats per block).
+# 1x matches the bundled db/excel data in fact rows (about 1,300); 10x and 100x scale it up.
+SCALES = {
+    1: (2, 4, 3, 10),
+    10: (4, 8, 6, 12),
+    100: (10, 15, 10, 16),
+}
+
+CATEGORIES = ["SC", "ST", "Minority", "Others"]
+FUND_FLOW_COLUMNS = [
+    "Opening Balance", "Allocated_Central", "Allocated_State", "Allocated_Total", "Released_Central",
+    "Released_ State", "Released_Total", "Total Available Funds", "Utilization of Funds", "Percentage Utilization",
+]
+
+SYLLABLES = ["ka", "ra", "ma", "na", "pa", "la", "sa", "ta", "va", "da", "ga", "ha", "ba", "ja", "ko", "ro",
+             "mo", "no", "po", "lo", "so", "ki", "ri", "mi", "ni", "pi", "li", "si", "ti", "vi", "ku", "ru",
+             "mu", "nu", "pu", "lu", "su", "chi", "dha", "kha", "sha", "bha", "the", "ve", "re", "me"]
+NAME_ENDINGS = ["", "", "", "pur", "gaon", "wadi", "nagar", "abad", "ali", "ner", "oli"]
+PANCHAYAT_SUFFIXES = [" KHURD", " BUDRUK", " TARF", " MAL"]
+
+
+class NameGenerator:
+    """Pronounceable place names, unique within a scope (a level, or the children of one parent)."""
+
+    def __init__(self, rng):
+        self.rng = rng
+
+    def word(self):
+        syllables = self.rng.choice(SYLLABLES, size=self.rng.integers(2, 4))
+        return ("".join(syllables) + self.rng.choice(NAME_ENDINGS)).upper()
+
+    def unique(self, count, used, suffixes=False):
+        names = []
+        while len(names) < count:
+            name = self.word()
+            if suffixes and self.rng.random() < 0.1:
+                name += self.rng.choice(PANCHAYAT_SUFFIXES)
+            if name not in used:
+                used.add(name)
+                names.append(name)
+        return names
+
+
+def round_to(values, step=0.05):
+    return np.round(np.round(np.asarray(values) / step) * step, 2)
+
+
+def beneficiary_amounts(rng, count, shares):
+    """count x 4 category amounts (in multiples of 0.05) with the given category mix."""
+    totals = rng.lognormal(mean=1.6, sigma=0.8, size=count)
+    mix = rng.dirichlet(np.asarray(shares) * 20, size=count)
+    amounts = round_to(totals[:, None] * mix)
+    amounts[rng.random(amounts.shape) < 0.08] = 0  # no allocation to a category is common at panchayat level
+    return amounts
+
+
+def beneficiary_sheet(names, name_col, amounts):
+    df = pd.DataFrame(amounts, columns=CATEGORIES)
+    df.insert(0, name_col, names)
+    df["Total"] = round_to(df[CATEGORIES].sum(axis=1))
+    return df
+
+
+def fund_flow_sheet(rng, names, beneficiary_totals):
+    """State fund-flow rows scaled to each state's beneficiary allocation, with the sheet's identities."""
+    n = len(names)
+    allocated = np.round(np.asarray(beneficiary_totals) * rng.uniform(2.5, 3.5, n), 4)
+    central = np.round(allocated * rng.uniform(0.55, 0.65, n), 4)
+    opening = np.round(allocated * rng.uniform(0, 1.5, n), 4)
+    released_central = np.round(central * rng.uniform(0.5, 1.5, n), 4)
+    released_total = released_central.copy()  # the state share is rarely released in the source data
+    available = np.round(opening + released_total, 4)
+    utilized = np.round(available * rng.uniform(0.3, 0.95, n), 4)
+
+    df = pd.DataFrame({
+        "State Name": names,
+        "Opening Balance": opening,
+        "Allocated_Central": central,
+        "Allocated_State": np.round(allocated - central, 4),
+        "Allocated_Total": allocated,
+        "Released_Central": released_central,
+        "Released_ State": np.zeros(n),
+        "Released_Total": released_total,
+        "Total Available Funds": available,
+        "Utilization of Funds": utilized,
+    })
+    # A few states report nothing, like TELANGANA in the bundled workbook
+    idle = rng.random(n) < 0.05
+    df.loc[idle, FUND_FLOW_COLUMNS[:-1]] = 0
+    percentage = pd.Series(np.round(utilized / np.where(available, available, 1) * 100, 4), dtype=object)
+    percentage[idle] = "N.A."
+    df["Percentage Utilization"] = percentage
+    return df
+
+
+def with_totals(df, name_col):
+    """Add #SNo and the 'Total' rows the source workbooks carry at the top and bottom."""
+    numeric = [c for c in df.columns if c != name_col and c != "Percentage Utilization"]
+    total = {name_col: "Total", **{c: round(float(df[c].sum()), 4) for c in numeric}}
+    if "Percentage Utilization" in df.columns:
+        total["Percentage Utilization"] = round(total["Utilization of Funds"] / total["Total Available Funds"] * 100, 2)
+    df = df.copy()
+    df.insert(0, "#SNo", range(1, len(df) + 1))
+    total_row = pd.DataFrame([total])
+    return pd.concat([total_row, df, total_row], ignore_index=True)[df.columns]
+
+
+def write_sheet(df, out_dir, file_name, name_col):
+    with_totals(df, name_col).to_excel(os.path.join(out_dir, file_name), index=False)
+
+
+def generate(out_dir, states, districts, blocks, panchayats, seed=0):
+    """
+    Write the workbooks for states x districts x blocks x panchayats (children
+    per parent) into out_dir; returns counts of files, places and fact rows.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    names = NameGenerator(rng)
+    parent_names = set()  # unique across levels, so a file name never resolves to two places
+    counts = {"files": 0, "places": 0, "facts": 0}
+
+    def written(df, indicators):
+        counts["files"] += 1
+        counts["places"] += len(df)
+        counts["facts"] += len(df) * indicators
+
+    state_names = names.unique(states, parent_names)
+    state_totals = []
+    for state in state_names:
+        shares = rng.dirichlet([2, 1.5, 0.5, 6])  # category mix differs by state
+        district_names = names.unique(districts, parent_names)
+        district_rows = []
+        for district in district_names:
+            block_names = names.unique(blocks, parent_names)
+            block_rows = []
+            for block in block_names:
+                panchayat_df = beneficiary_sheet(names.unique(panchayats, set(), suffixes=True), "Panchayat Name",
+                                                 beneficiary_amounts(rng, panchayats, shares))
+                write_sheet(panchayat_df, out_dir, f"04_{block.lower()}_panchayats.xlsx", "Panchayat Name")
+                written(panchayat_df, len(CATEGORIES) + 1)
+                block_rows.append(panchayat_df[CATEGORIES].sum().to_numpy())
+
+            block_df = beneficiary_sheet(block_names, "Block Name", round_to(block_rows))
+            write_sheet(block_df, out_dir, f"03_{district.lower()}_blocks.xlsx", "Block Name")
+            written(block_df, len(CATEGORIES) + 1)
+            district_rows.append(block_df[CATEGORIES].sum().to_numpy())
+
+        district_df = beneficiary_sheet(district_names, "District Name", round_to(district_rows))
+        write_sheet(district_df, out_dir, f"02_{state.lower()}_districts.xlsx", "District Name")
+        written(district_df, len(CATEGORIES) + 1)
+        state_totals.append(district_df["Total"].sum())
+
+    state_df = fund_flow_sheet(rng, state_names, state_totals)
+    write_sheet(state_df, out_dir, "01_states.xlsx", "State Name")
+    written(state_df, len(FUND_FLOW_COLUMNS))
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("out_dir", help="folder to write the workbooks to (load with db/setup.py --excel-dir)")
+    parser.add_argument("--scale", type=int, choices=sorted(SCALES), default=1,
+                        help="preset hierarchy size relative to the bundled data")
+    parser.add_argument("--states", type=int, help="number of states")
+    parser.add_argument("--districts", type=int, help="districts per state")
+    parser.add_argument("--blocks", type=int, help="blocks per district")
+    parser.add_argument("--panchayats", type=int, help="panchayats per block")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    preset = SCALES[args.scale]
+    shape = [given if given is not None else default for given, default in
+             zip((args.states, args.districts, args.blocks, args.panchayats), preset)]
+    started = time.perf_counter()
+    counts = generate(args.out_dir, *shape, seed=args.seed)
+    print(f"[INFO] {counts['files']} workbooks, {counts['places']:,} places, {counts['facts']:,} fact rows "
+          f"written to {args.out_dir} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
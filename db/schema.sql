@@ -1,3 +1,10 @@
+DROP MATERIALIZED VIEW IF EXISTS pmayg_panchayat_wide;
+DROP MATERIALIZED VIEW IF EXISTS pmayg_block_wide;
+DROP MATERIALIZED VIEW IF EXISTS pmayg_district_wide;
+DROP MATERIALIZED VIEW IF EXISTS pmayg_state_wide;
+DROP MATERIALIZED VIEW IF EXISTS pmayg_rollup;
+DROP TABLE IF EXISTS pmayg_summary CASCADE;
+DROP TABLE IF EXISTS pmayg_source_file CASCADE;
 DROP TABLE IF EXISTS pmayg_fund_fact CASCADE;
 DROP TABLE IF EXISTS pmayg_indicator CASCADE;
 DROP TABLE IF EXISTS pmayg_report CASCADE;
@@ -53,7 +60,27 @@ CREATE TABLE pmayg_report (
     report_id SERIAL PRIMARY KEY,
     report_type TEXT NOT NULL,       -- e.g. 'allocation', 'utilization'
     report_date TIMESTAMP NOT NULL,  -- the "As On" timestamp from Excel
-    source_file TEXT                 -- filename or source path
+    source_file TEXT,                -- filename or source path
+    refreshed_at TIMESTAMP           -- when pmayg_rollup was last rebuilt from this report
+);
+
+-- Fingerprint of every Excel workbook loaded into a report.
+-- Incremental loads (db/setup.py --incremental) skip files whose hash is unchanged.
+CREATE TABLE pmayg_source_file (
+    file_name TEXT PRIMARY KEY,      -- e.g. '03_pune_blocks.xlsx'
+    report_id INT NOT NULL REFERENCES pmayg_report(report_id) ON DELETE CASCADE,
+    content_hash TEXT NOT NULL,      -- sha256 of the file contents
+    mtime DOUBLE PRECISION NOT NULL, -- modification time when last checked
+    loaded_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+-- Overview summary shown on "Ask a Question", generated once per data version
+-- (see agents/summary_agent.py) and shared by every session and process.
+CREATE TABLE pmayg_summary (
+    report_id INT PRIMARY KEY REFERENCES pmayg_report(report_id) ON DELETE CASCADE,
+    data_version TEXT NOT NULL,      -- report_id and rollup refresh time it was written for
+    summary TEXT NOT NULL,           -- '' while a session is generating it
+    generated_at TIMESTAMP NOT NULL DEFAULT now()
 );
 
 -- =====================
@@ -91,5 +118,201 @@ CREATE TABLE pmayg_fund_fact (
 
     indicator_id INT NOT NULL REFERENCES pmayg_indicator(indicator_id),
     amount NUMERIC,   -- Example: 478164.35 (Maharashtra Utilization of Funds)
-    note TEXT         -- Optional annotation, e.g. "From PMAY-G Report Sep 2025"
-);
\ No newline at end of file
+    note TEXT,        -- Optional annotation, e.g. "From PMAY-G Report Sep 2025"
+
+    -- Derived from whichever geography id is filled: 'state', 'district', 'block' or 'panchayat'
+    geo_level TEXT GENERATED ALWAYS AS (
+        CASE
+            WHEN panchayat_id IS NOT NULL THEN 'panchayat'
+            WHEN block_id IS NOT NULL THEN 'block'
+            WHEN district_id IS NOT NULL THEN 'district'
+            ELSE 'state'
+        END
+    ) STORED
+);
+
+-- =====================
+-- Indexes
+-- =====================
+
+-- One partial index per level: queries pick a geography (joined by its id) and
+-- an indicator. report_id and amount are included so the fact lookup can be
+-- answered from the index alone.
+CREATE INDEX idx_fund_fact_state ON pmayg_fund_fact (state_id, indicator_id)
+    INCLUDE (report_id, amount) WHERE state_id IS NOT NULL;
+CREATE INDEX idx_fund_fact_district ON pmayg_fund_fact (district_id, indicator_id)
+    INCLUDE (report_id, amount) WHERE district_id IS NOT NULL;
+CREATE INDEX idx_fund_fact_block ON pmayg_fund_fact (block_id, indicator_id)
+    INCLUDE (report_id, amount) WHERE block_id IS NOT NULL;
+CREATE INDEX idx_fund_fact_panchayat ON pmayg_fund_fact (panchayat_id, indicator_id)
+    INCLUDE (report_id, amount) WHERE panchayat_id IS NOT NULL;
+
+-- Whole-level scans of a report (e.g. "all districts"), by indicator
+CREATE INDEX idx_fund_fact_report_level ON pmayg_fund_fact (report_id, geo_level, indicator_id);
+
+-- Name filters on the dimensions; the UNIQUE constraints lead with the parent id
+CREATE INDEX idx_district_name ON pmayg_district (name);
+CREATE INDEX idx_block_name ON pmayg_block (name);
+CREATE INDEX idx_panchayat_name ON pmayg_panchayat (name);
+CREATE INDEX idx_indicator_type ON pmayg_indicator (type);
+
+-- =====================
+-- Rollup cube
+-- =====================
+
+-- One row per report x level x geography x indicator:
+--   amount           the figure reported for that geography
+--   children_amount  the sum of the figures reported for its direct children
+--                    (e.g. the panchayats of a block); NULL at panchayat level
+-- Each row carries the names of the geography and its ancestors, so typical
+-- questions become a single indexed lookup. Refreshed by db/setup.py.
+CREATE MATERIALIZED VIEW pmayg_rollup AS
+WITH geo AS (
+    SELECT 'state' AS geo_level, s.state_id AS geo_id, NULL::INT AS parent_id, s.name AS geo_name,
+           s.name AS state_name, NULL::TEXT AS district_name, NULL::TEXT AS block_name
+    FROM pmayg_state s
+    UNION ALL
+    SELECT 'district', d.district_id, d.state_id, d.name, s.name, d.name, NULL
+    FROM pmayg_district d
+    JOIN pmayg_state s ON d.state_id = s.state_id
+    UNION ALL
+    SELECT 'block', b.block_id, b.district_id, b.name, s.name, d.name, b.name
+    FROM pmayg_block b
+    JOIN pmayg_district d ON b.district_id = d.district_id
+    JOIN pmayg_state s ON d.state_id = s.state_id
+    UNION ALL
+    SELECT 'panchayat', p.panchayat_id, p.block_id, p.name, s.name, d.name, b.name
+    FROM pmayg_panchayat p
+    JOIN pmayg_block b ON p.block_id = b.block_id
+    JOIN pmayg_district d ON b.district_id = d.district_id
+    JOIN pmayg_state s ON d.state_id = s.state_id
+),
+facts AS (
+    SELECT report_id, geo_level, COALESCE(panchayat_id, block_id, district_id, state_id) AS geo_id,
+           indicator_id, SUM(amount) AS amount
+    FROM pmayg_fund_fact
+    GROUP BY report_id, geo_level, COALESCE(panchayat_id, block_id, district_id, state_id), indicator_id
+),
+children AS (
+    SELECT f.report_id,
+           CASE g.geo_level WHEN 'district' THEN 'state' WHEN 'block' THEN 'district' ELSE 'block' END AS geo_level,
+           g.parent_id AS geo_id, f.indicator_id, SUM(f.amount) AS children_amount
+    FROM facts f
+    JOIN geo g ON g.geo_level = f.geo_level AND g.geo_id = f.geo_id
+    WHERE g.parent_id IS NOT NULL
+    GROUP BY f.report_id, g.geo_level, g.parent_id, f.indicator_id
+),
+cube AS (
+    SELECT COALESCE(f.report_id, c.report_id) AS report_id,
+           COALESCE(f.geo_level, c.geo_level) AS geo_level,
+           COALESCE(f.geo_id, c.geo_id) AS geo_id,
+           COALESCE(f.indicator_id, c.indicator_id) AS indicator_id,
+           f.amount, c.children_amount
+    FROM facts f
+    FULL JOIN children c
+      ON c.report_id = f.report_id AND c.geo_level = f.geo_level
+     AND c.geo_id = f.geo_id AND c.indicator_id = f.indicator_id
+)
+SELECT cube.report_id, cube.geo_level, cube.geo_id, g.geo_name,
+       g.state_name, g.district_name, g.block_name,
+       cube.indicator_id, i.name AS indicator, i.type AS indicator_type,
+       cube.amount, cube.children_amount
+FROM cube
+JOIN geo g ON g.geo_level = cube.geo_level AND g.geo_id = cube.geo_id
+JOIN pmayg_indicator i ON i.indicator_id = cube.indicator_id
+WITH NO DATA;
+
+-- The unique index allows REFRESH MATERIALIZED VIEW CONCURRENTLY
+CREATE UNIQUE INDEX idx_rollup_key ON pmayg_rollup (report_id, geo_level, geo_id, indicator_id);
+CREATE INDEX idx_rollup_name ON pmayg_rollup (geo_level, geo_name);
+CREATE INDEX idx_rollup_state ON pmayg_rollup (geo_level, state_name);
+CREATE INDEX idx_rollup_district ON pmayg_rollup (geo_level, district_name);
+CREATE INDEX idx_rollup_block ON pmayg_rollup (geo_level, block_name);
+
+-- =====================
+-- Wide tables, one per level
+-- =====================
+
+-- One row per report and geography with one column per indicator, pivoted from
+-- pmayg_rollup, so comparing categories or places is a single-table scan with
+-- no indicator filter or GROUP BY:
+--   sc, st, minority, others, total   beneficiary figures; at state level the
+--                                     sum over the state's districts (the state
+--                                     workbooks only report fund flows)
+--   opening_balance ... percentage_utilization
+--                                     fund flows, state level only
+-- Refreshed by db/setup.py after pmayg_rollup.
+
+CREATE MATERIALIZED VIEW pmayg_state_wide AS
+SELECT report_id, geo_id AS state_id, geo_name AS state_name,
+       MAX(COALESCE(amount, children_amount)) FILTER (WHERE indicator = 'SC') AS sc,
+       MAX(COALESCE(amount, children_amount)) FILTER (WHERE indicator = 'ST') AS st,
+       MAX(COALESCE(amount, children_amount)) FILTER (WHERE indicator = 'Minority') AS minority,
+       MAX(COALESCE(amount, children_amount)) FILTER (WHERE indicator = 'Others') AS others,
+       MAX(COALESCE(amount, children_amount)) FILTER (WHERE indicator = 'Total') AS total,
+       MAX(amount) FILTER (WHERE indicator = 'Opening Balance') AS opening_balance,
+       MAX(amount) FILTER (WHERE indicator = 'Allocated_Central') AS allocated_central,
+       MAX(amount) FILTER (WHERE indicator = 'Allocated_State') AS allocated_state,
+       MAX(amount) FILTER (WHERE indicator = 'Allocated_Total') AS allocated_total,
+       MAX(amount) FILTER (WHERE indicator = 'Released_Central') AS released_central,
+       MAX(amount) FILTER (WHERE indicator = 'Released_ State') AS released_state,
+       MAX(amount) FILTER (WHERE indicator = 'Released_Total') AS released_total,
+       MAX(amount) FILTER (WHERE indicator = 'Total Available Funds') AS total_available_funds,
+       MAX(amount) FILTER (WHERE indicator = 'Utilization of Funds') AS utilization_of_funds,
+       MAX(amount) FILTER (WHERE indicator = 'Percentage Utilization') AS percentage_utilization
+FROM pmayg_rollup
+WHERE geo_level = 'state'
+GROUP BY report_id, geo_id, geo_name
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW pmayg_district_wide AS
+SELECT report_id, geo_id AS district_id, geo_name AS district_name, state_name,
+       MAX(amount) FILTER (WHERE indicator = 'SC') AS sc,
+       MAX(amount) FILTER (WHERE indicator = 'ST') AS st,
+       MAX(amount) FILTER (WHERE indicator = 'Minority') AS minority,
+       MAX(amount) FILTER (WHERE indicator = 'Others') AS others,
+       MAX(amount) FILTER (WHERE indicator = 'Total') AS total
+FROM pmayg_rollup
+WHERE geo_level = 'district'
+GROUP BY report_id, geo_id, geo_name, state_name
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW pmayg_block_wide AS
+SELECT report_id, geo_id AS block_id, geo_name AS block_name, state_name, district_name,
+       MAX(amount) FILTER (WHERE indicator = 'SC') AS sc,
+       MAX(amount) FILTER (WHERE indicator = 'ST') AS st,
+       MAX(amount) FILTER (WHERE indicator = 'Minority') AS minority,
+       MAX(amount) FILTER (WHERE indicator = 'Others') AS others,
+       MAX(amount) FILTER (WHERE indicator = 'Total') AS total
+FROM pmayg_rollup
+WHERE geo_level = 'block'
+GROUP BY report_id, geo_id, geo_name, state_name, district_name
+WITH NO DATA;
+
+CREATE MATERIALIZED VIEW pmayg_panchayat_wide AS
+SELECT report_id, geo_id AS panchayat_id, geo_name AS panchayat_name, state_name, district_name, block_name,
+       MAX(amount) FILTER (WHERE indicator = 'SC') AS sc,
+       MAX(amount) FILTER (WHERE indicator = 'ST') AS st,
+       MAX(amount) FILTER (WHERE indicator = 'Minority') AS minority,
+       MAX(amount) FILTER (WHERE indicator = 'Others') AS others,
+       MAX(amount) FILTER (WHERE indicator = 'Total') AS total
+FROM pmayg_rollup
+WHERE geo_level = 'panchayat'
+GROUP BY report_id, geo_id, geo_name, state_name, district_name, block_name
+WITH NO DATA;
+
+-- Unique keys for REFRESH ... CONCURRENTLY, then the name and ancestor filters
+CREATE UNIQUE INDEX idx_state_wide_key ON pmayg_state_wide (report_id, state_id);
+CREATE INDEX idx_state_wide_name ON pmayg_state_wide (state_name);
+CREATE UNIQUE INDEX idx_district_wide_key ON pmayg_district_wide (report_id, district_id);
+CREATE INDEX idx_district_wide_name ON pmayg_district_wide (district_name);
+CREATE INDEX idx_district_wide_state ON pmayg_district_wide (state_name);
+CREATE UNIQUE INDEX idx_block_wide_key ON pmayg_block_wide (report_id, block_id);
+CREATE INDEX idx_block_wide_name ON pmayg_block_wide (block_name);
+CREATE INDEX idx_block_wide_state ON pmayg_block_wide (state_name);
+CREATE INDEX idx_block_wide_district ON pmayg_block_wide (district_name);
+CREATE UNIQUE INDEX idx_panchayat_wide_key ON pmayg_panchayat_wide (report_id, panchayat_id);
+CREATE INDEX idx_panchayat_wide_name ON pmayg_panchayat_wide (panchayat_name);
+CREATE INDEX idx_panchayat_wide_state ON pmayg_panchayat_wide (state_name);
+CREATE INDEX idx_panchayat_wide_district ON pmayg_panchayat_wide (district_name);
+CREATE INDEX idx_panchayat_wide_block ON pmayg_panchayat_wide (block_name);
@@ -0,0 +1,70 @@
+-- ==============================================================
+-- PMAY-G schema for the embedded DuckDB backend (DB_BACKEND=duckdb)
+-- ==============================================================
+-- Same tables and columns as schema.sql, built by db/build_duckdb.py, except
+-- pmayg_summary: the app opens the file read-only and keeps the summary in memory.
+-- Ids are assigned by the loader, amounts are DOUBLE, and pmayg_rollup and the
+-- per-level wide tables are tables created from the materialized view queries
+-- in schema.sql. DuckDB prunes scans with per-block min/max statistics, so the
+-- B-tree indexes are left out and those tables are stored sorted by name instead.
+
+CREATE TABLE pmayg_state (
+    state_id INTEGER PRIMARY KEY,
+    name TEXT UNIQUE NOT NULL
+);
+
+CREATE TABLE pmayg_district (
+    district_id INTEGER PRIMARY KEY,
+    state_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE(state_id, name)
+);
+
+CREATE TABLE pmayg_block (
+    block_id INTEGER PRIMARY KEY,
+    district_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE(district_id, name)
+);
+
+CREATE TABLE pmayg_panchayat (
+    panchayat_id INTEGER PRIMARY KEY,
+    block_id INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    UNIQUE(block_id, name)
+);
+
+CREATE TABLE pmayg_report (
+    report_id INTEGER PRIMARY KEY,
+    report_type TEXT NOT NULL,
+    report_date TIMESTAMP NOT NULL,
+    source_file TEXT,
+    refreshed_at TIMESTAMP
+);
+
+CREATE TABLE pmayg_source_file (
+    file_name TEXT PRIMARY KEY,
+    report_id INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    mtime DOUBLE NOT NULL,
+    loaded_at TIMESTAMP NOT NULL DEFAULT now()
+);
+
+CREATE TABLE pmayg_indicator (
+    indicator_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    type TEXT NOT NULL CHECK (type IN ('beneficiary', 'fund_flow'))
+);
+
+CREATE TABLE pmayg_fund_fact (
+    fact_id INTEGER PRIMARY KEY,
+    report_id INTEGER NOT NULL,
+    state_id INTEGER,
+    district_id INTEGER,
+    block_id INTEGER,
+    panchayat_id INTEGER,
+    indicator_id INTEGER NOT NULL,
+    amount DOUBLE,
+    note TEXT,
+    geo_level TEXT NOT NULL  -- 'state', 'district', 'block' or 'panchayat', set by the loader
+);
@@ -1,8 +1,16 @@
+import argparse
+import io
 import os
+import sys
+import time
 from dotenv import load_dotenv
 import psycopg2
+from psycopg2.extras import execute_values
 import pandas as pd
-import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils.excel_cache import file_hash, load_sheets
+from utils.geo_index import GeoIndex
 
 # ----------------------------
 # Load .env
@@ -22,8 +30,20 @@ PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
 DB_SCHEMA_FILE = os.path.join(PROJECT_ROOT, "schema.sql")
 EXCEL_FOLDER = os.path.join(PROJECT_ROOT, "excel")
 
-# List of values representing missing data
-NA_VALUES = ["N.A.", "NA", "na", "-", "--", "", " "]
+# Geography tables per level, with the sheet column holding the name
+LEVELS = {
+    "state": {"table": "pmayg_state", "id_col": "state_id", "parent_col": None,
+              "parent_level": None, "name_col": "State Name"},
+    "district": {"table": "pmayg_district", "id_col": "district_id", "parent_col": "state_id",
+                 "parent_level": "state", "name_col": "District Name"},
+    "block": {"table": "pmayg_block", "id_col": "block_id", "parent_col": "district_id",
+              "parent_level": "district", "name_col": "Block Name"},
+    "panchayat": {"table": "pmayg_panchayat", "id_col": "panchayat_id", "parent_col": "block_id",
+                  "parent_level": "block", "name_col": "Panchayat Name"},
+}
+
+# Workbook prefix per level, in load order (parents before children)
+LEVEL_FILES = [("01_", "state"), ("02_", "district"), ("03_", "block"), ("04_", "panchayat")]
 
 # ----------------------------
 # Helper function to execute SQL
@@ -31,11 +51,6 @@ NA_VALUES = ["N.A.", "NA", "na", "-", "--", "", " "]
 def execute_sql(cursor, sql, params=None):
     cursor.execute(sql, params or ())
 
-def get_indicator_id(cursor, name):
-    cursor.execute("SELECT indicator_id FROM pmayg_indicator WHERE name = %s", (name.strip(),))
-    result = cursor.fetchone()
-    return result[0] if result else None
-
 # ----------------------------
 # Load schema
 # ----------------------------
@@ -47,25 +62,26 @@ def load_schema(cursor):
 # ----------------------------
 # Load indicators
 # ----------------------------
+INDICATORS = [
+    ("SC", "beneficiary"),
+    ("ST", "beneficiary"),
+    ("Minority", "beneficiary"),
+    ("Others", "beneficiary"),
+    ("Total", "beneficiary"),
+    ("Opening Balance", "fund_flow"),
+    ("Allocated_Central", "fund_flow"),
+    ("Allocated_State", "fund_flow"),
+    ("Allocated_Total", "fund_flow"),
+    ("Released_Central", "fund_flow"),
+    ("Released_ State", "fund_flow"),
+    ("Released_Total", "fund_flow"),
+    ("Total Available Funds", "fund_flow"),
+    ("Utilization of Funds", "fund_flow"),
+    ("Percentage Utilization", "fund_flow"),
+]
+
 def load_indicators(cursor):
-    indicators = [
-        ("SC", "beneficiary"),
-        ("ST", "beneficiary"),
-        ("Minority", "beneficiary"),
-        ("Others", "beneficiary"),
-        ("Total", "beneficiary"),
-        ("Opening Balance", "fund_flow"),
-        ("Allocated_Central", "fund_flow"),
-        ("Allocated_State", "fund_flow"),
-        ("Allocated_Total", "fund_flow"),
-        ("Released_Central", "fund_flow"),
-        ("Released_ State", "fund_flow"),
-        ("Released_Total", "fund_flow"),
-        ("Total Available Funds", "fund_flow"),
-        ("Utilization of Funds", "fund_flow"),
-        ("Percentage Utilization", "fund_flow"),
-    ]
-    for name, type_ in indicators:
+    for name, type_ in INDICATORS:
         execute_sql(
             cursor,
             "INSERT INTO pmayg_indicator (name, type) VALUES (%s, %s) ON CONFLICT DO NOTHING",
@@ -89,159 +105,277 @@ def create_report(cursor, report_type="allocation", report_date=None, source_fil
     print(f"[INFO] Report created with report_id={report_id}")
     return report_id
 
+# ----------------------------
+# Bulk loading helpers
+# ----------------------------
+def get_indicator_map(cursor):
+    cursor.execute("SELECT name, indicator_id FROM pmayg_indicator")
+    return {name: indicator_id for name, indicator_id in cursor.fetchall()}
+
+def upsert_geography(cursor, table, id_col, names, parent_col=None, parent_id=None):
+    """Insert or reuse one geography row per name and return {name: id}."""
+    names = list(dict.fromkeys(names))
+    if parent_col:
+        sql = (f"INSERT INTO {table} ({parent_col}, name) VALUES %s "
+               f"ON CONFLICT ({parent_col}, name) DO UPDATE SET name = EXCLUDED.name "
+               f"RETURNING {id_col}, name")
+        rows = [(parent_id, name) for name in names]
+    else:
+        sql = (f"INSERT INTO {table} (name) VALUES %s "
+               f"ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name "
+               f"RETURNING {id_col}, name")
+        rows = [(name,) for name in names]
+    returned = execute_values(cursor, sql, rows, page_size=1000, fetch=True)
+    return {name: geo_id for geo_id, name in returned}
+
+def delete_facts(cursor, report_id, level, parent_id=None):
+    """Remove the facts a sheet previously contributed to the report."""
+    spec = LEVELS[level]
+    if spec["parent_col"] is None:
+        cursor.execute(f"DELETE FROM pmayg_fund_fact WHERE report_id = %s AND {spec['id_col']} IS NOT NULL",
+                       (report_id,))
+    else:
+        cursor.execute(
+            f"""DELETE FROM pmayg_fund_fact WHERE report_id = %s AND {spec['id_col']} IN (
+                    SELECT {spec['id_col']} FROM {spec['table']} WHERE {spec['parent_col']} = %s)""",
+            (report_id, parent_id),
+        )
+
+def to_long_facts(df, name_col, geo_ids, indicator_map):
+    """Reshape a wide sheet into (geo_id, indicator_id, amount) rows."""
+    value_cols = [c for c in df.columns if c != name_col and c in indicator_map]
+    long_df = df.melt(id_vars=[name_col], value_vars=value_cols, var_name="indicator", value_name="amount")
+    return pd.DataFrame({
+        "geo_id": long_df[name_col].map(geo_ids).astype("int64"),
+        "indicator_id": long_df["indicator"].map(indicator_map).astype("int64"),
+        "amount": pd.to_numeric(long_df["amount"], errors="coerce"),
+    })
+
+def copy_facts(cursor, report_id, geo_col, facts):
+    """Stream facts into pmayg_fund_fact with COPY FROM STDIN; returns the row count."""
+    if facts.empty:
+        return 0
+    buf = io.StringIO()
+    facts.insert(0, "report_id", report_id)
+    facts.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    cursor.copy_expert(
+        f"COPY pmayg_fund_fact (report_id, {geo_col}, indicator_id, amount) FROM STDIN WITH (FORMAT csv)",
+        buf,
+    )
+    return len(facts)
+
+def report_level(level, rows, started, skipped=0):
+    elapsed = time.perf_counter() - started
+    rate = rows / elapsed if elapsed > 0 else float("inf")
+    note = f", {skipped} unchanged file(s) skipped" if skipped else ""
+    print(f"[INFO] {level}: {rows} facts loaded in {elapsed:.2f}s ({rate:,.0f} rows/sec){note}")
+
+def level_files(prefix):
+    return sorted(f for f in os.listdir(EXCEL_FOLDER) if f.startswith(prefix) and f.endswith(".xlsx"))
+
+# ----------------------------
+# Source file fingerprints
+# ----------------------------
+def load_fingerprints(cursor):
+    cursor.execute("SELECT file_name, content_hash, mtime FROM pmayg_source_file")
+    return {name: (content_hash, mtime) for name, content_hash, mtime in cursor.fetchall()}
+
+def check_file(fingerprints, file):
+    """Return (changed, content_hash, mtime); the hash is only computed when the mtime moved."""
+    path = os.path.join(EXCEL_FOLDER, file)
+    mtime = os.path.getmtime(path)
+    known = fingerprints.get(file)
+    if known and known[1] == mtime:
+        return False, known[0], mtime
+    content_hash = file_hash(path)
+    return not known or known[0] != content_hash, content_hash, mtime
+
+def record_file(cursor, report_id, file, content_hash, mtime):
+    execute_sql(
+        cursor,
+        """INSERT INTO pmayg_source_file (file_name, report_id, content_hash, mtime, loaded_at)
+           VALUES (%s, %s, %s, %s, now())
+           ON CONFLICT (file_name) DO UPDATE
+           SET report_id = EXCLUDED.report_id, content_hash = EXCLUDED.content_hash,
+               mtime = EXCLUDED.mtime, loaded_at = EXCLUDED.loaded_at""",
+        (file, report_id, content_hash, mtime),
+    )
+
+def touch_file(cursor, fingerprints, file, mtime):
+    """Remember a new mtime for a file whose content did not change."""
+    if fingerprints[file][1] != mtime:
+        execute_sql(cursor, "UPDATE pmayg_source_file SET mtime = %s WHERE file_name = %s", (mtime, file))
+
+def resolve_parent(geo_index, file, level):
+    """Parent place named in the workbook file name, e.g. 03_pune_blocks.xlsx -> PUNE district."""
+    parent_level = LEVELS[level]["parent_level"]
+    parent_name = file.split("_")[1]
+    matches = geo_index.find(parent_name, level=parent_level)
+    if len(matches) != 1:
+        problem = "ambiguous" if matches else "unknown"
+        print(f"[WARN] Skipping {file}: {problem} {parent_level} '{parent_name}'")
+        return None
+    return matches[0]
+
+def replace_sheet(cursor, report_id, df, level, indicator_map, parent_id=None):
+    """Upsert the sheet's geography and replace its facts; returns ({name: id}, fact rows)."""
+    spec = LEVELS[level]
+    geo_ids = upsert_geography(cursor, spec["table"], spec["id_col"], df[spec["name_col"]],
+                               parent_col=spec["parent_col"], parent_id=parent_id)
+    delete_facts(cursor, report_id, level, parent_id)
+    rows = copy_facts(cursor, report_id, spec["id_col"],
+                      to_long_facts(df, spec["name_col"], geo_ids, indicator_map))
+    return geo_ids, rows
+
 # ----------------------------
 # Load hierarchical data
 # ----------------------------
-def load_geography_and_facts(cursor, report_id):
-    state_map = {}
-    district_map = {}
-    block_map = {}
-
-    # --------------------
-    # Level 1: States
-    # --------------------
-    df_states = pd.read_excel(os.path.join(EXCEL_FOLDER, "01_states.xlsx"))
-    df_states.columns = [str(c).strip() for c in df_states.columns]
-    df_states.replace(NA_VALUES, np.nan, inplace=True)
-    df_states = df_states[df_states["State Name"].notna()]
-    df_states = df_states[~df_states["State Name"].str.strip().str.lower().isin(["total", "grand total"])]
-
-    for _, row in df_states.iterrows():
-        state_name = str(row["State Name"]).strip()
-        execute_sql(cursor, "INSERT INTO pmayg_state (name) VALUES (%s) RETURNING state_id", (state_name,))
-        state_id = cursor.fetchone()[0]
-        state_map[state_name.lower()] = state_id
-
-        for col in df_states.columns[2:]:
-            indicator_id = get_indicator_id(cursor, col)
-            if indicator_id:
-                amount = row[col] if pd.notna(row[col]) else None
-                execute_sql(
-                    cursor,
-                    "INSERT INTO pmayg_fund_fact (report_id, state_id, indicator_id, amount) VALUES (%s, %s, %s, %s)",
-                    (report_id, state_id, indicator_id, amount),
-                )
-
-    # --------------------
-    # Level 2: Districts
-    # --------------------
-    for file in os.listdir(EXCEL_FOLDER):
-        if file.startswith("02_") and file.endswith(".xlsx"):
-            state_name = file.split("_")[1].lower()  # e.g., 'maharashtra'
-            df = pd.read_excel(os.path.join(EXCEL_FOLDER, file))
-            df.columns = [str(c).strip() for c in df.columns]
-            df.replace(NA_VALUES, np.nan, inplace=True)
-            df = df[df["District Name"].notna()]
-            df = df[~df["District Name"].str.strip().str.lower().isin(["total", "grand total"])]
-            state_id = state_map[state_name]
-
-            for _, row in df.iterrows():
-                district_name = str(row["District Name"]).strip()
-                execute_sql(cursor, "INSERT INTO pmayg_district (state_id, name) VALUES (%s, %s) RETURNING district_id",
-                            (state_id, district_name))
-                district_id = cursor.fetchone()[0]
-                district_map[(state_name, district_name.lower())] = district_id
-
-                for col in df.columns[1:]:
-                    indicator_id = get_indicator_id(cursor, col)
-                    if indicator_id:
-                        amount = row[col] if pd.notna(row[col]) else None
-                        execute_sql(cursor,
-                                    "INSERT INTO pmayg_fund_fact (report_id, district_id, indicator_id, amount) VALUES (%s, %s, %s, %s)",
-                                    (report_id, district_id, indicator_id, amount))
-
-    # --------------------
-    # Level 3: Blocks
-    # --------------------
-    for file in os.listdir(EXCEL_FOLDER):
-        if file.startswith("03_") and file.endswith(".xlsx"):
-            district_name = file.split("_")[1].lower()  # e.g., 'pune'
-            df = pd.read_excel(os.path.join(EXCEL_FOLDER, file))
-            df.columns = [str(c).strip() for c in df.columns]
-            df.replace(NA_VALUES, np.nan, inplace=True)
-            df = df[df["Block Name"].notna()]
-            df = df[~df["Block Name"].str.strip().str.lower().isin(["total", "grand total"])]
-
-            parent = next(((s, d) for (s, d) in district_map if d == district_name), None)
-            if not parent:
-                continue
-            state_name, district_name = parent
-            state_id = state_map[state_name]
-            district_id = district_map[(state_name, district_name)]
-
-            for _, row in df.iterrows():
-                block_name = str(row["Block Name"]).strip()
-                execute_sql(cursor, "INSERT INTO pmayg_block (district_id, name) VALUES (%s, %s) RETURNING block_id",
-                            (district_id, block_name))
-                block_id = cursor.fetchone()[0]
-                block_map[(state_name, district_name, block_name.lower())] = block_id
-
-                for col in df.columns[1:]:
-                    indicator_id = get_indicator_id(cursor, col)
-                    if indicator_id:
-                        amount = row[col] if pd.notna(row[col]) else None
-                        execute_sql(cursor,
-                                    "INSERT INTO pmayg_fund_fact (report_id, block_id, indicator_id, amount) VALUES (%s, %s, %s, %s)",
-                                    (report_id, block_id, indicator_id, amount))
-
-    # --------------------
-    # Level 4: Panchayats
-    # --------------------
-    for file in os.listdir(EXCEL_FOLDER):
-        if file.startswith("04_") and file.endswith(".xlsx"):
-            block_name = file.split("_")[1].lower()
-            df = pd.read_excel(os.path.join(EXCEL_FOLDER, file))
-            df.columns = [str(c).strip() for c in df.columns]
-            df.replace(NA_VALUES, np.nan, inplace=True)
-            df = df[df["Panchayat Name"].notna()]
-            df = df[~df["Panchayat Name"].str.strip().str.lower().isin(["total", "grand total"])]
-
-            parent = next(((s, d, b) for (s, d, b) in block_map if b == block_name), None)
-            if not parent:
+# Each level is loaded in its own transaction. Workbooks whose fingerprint
+# matches pmayg_source_file are skipped; the others are parsed up front in a
+# process pool (or read from the parse cache), their parent is resolved from
+# the file name through the geography index, their geography rows are
+# upserted and the facts the sheet contributed are replaced via COPY.
+def parse_changed_files(fingerprints):
+    status = {}
+    for prefix, _ in LEVEL_FILES:
+        for file in level_files(prefix):
+            status[file] = check_file(fingerprints, file)
+    changed = [file for file, (is_changed, _, _) in status.items() if is_changed]
+
+    started = time.perf_counter()
+    sheets = load_sheets([os.path.join(EXCEL_FOLDER, file) for file in changed],
+                         hashes=[status[file][1] for file in changed])
+    print(f"[INFO] Parsed {len(changed)} changed workbook(s) in {time.perf_counter() - started:.2f}s")
+    return status, sheets
+
+def load_geography_and_facts(conn, report_id):
+    """Load every changed workbook; returns the number of workbooks loaded."""
+    cursor = conn.cursor()
+    indicator_map = get_indicator_map(cursor)
+    fingerprints = load_fingerprints(cursor)
+    geo_index = GeoIndex.from_db(cursor)  # parents of changed sheets may come from earlier loads
+    status, sheets = parse_changed_files(fingerprints)
+    loaded = 0
+
+    for prefix, level in LEVEL_FILES:
+        started = time.perf_counter()
+        rows = skipped = 0
+        for file in level_files(prefix):
+            changed, content_hash, mtime = status[file]
+            if not changed:
+                skipped += 1
+                touch_file(cursor, fingerprints, file, mtime)
                 continue
-            state_name, district_name, block_name = parent
-            block_id = block_map[(state_name, district_name, block_name)]
 
-            for _, row in df.iterrows():
-                panchayat_name = str(row["Panchayat Name"]).strip()
-                execute_sql(cursor, "INSERT INTO pmayg_panchayat (block_id, name) VALUES (%s, %s) RETURNING panchayat_id",
-                            (block_id, panchayat_name))
-                panchayat_id = cursor.fetchone()[0]
+            parent_id = None
+            if LEVELS[level]["parent_level"]:
+                parent = resolve_parent(geo_index, file, level)
+                if parent is None:
+                    continue
+                parent_id = parent.id
+
+            geo_ids, n = replace_sheet(cursor, report_id, sheets[file], level, indicator_map, parent_id)
+            for name, geo_id in geo_ids.items():
+                geo_index.add(level, geo_id, name, parent_id)
+            record_file(cursor, report_id, file, content_hash, mtime)
+            rows += n
+            loaded += 1
+        conn.commit()
+        report_level(f"{level.title()}s", rows, started, skipped)
 
-                for col in df.columns[1:]:
-                    indicator_id = get_indicator_id(cursor, col)
-                    if indicator_id:
-                        amount = row[col] if pd.notna(row[col]) else None
-                        execute_sql(cursor,
-                                    "INSERT INTO pmayg_fund_fact (report_id, panchayat_id, indicator_id, amount) VALUES (%s, %s, %s, %s)",
-                                    (report_id, panchayat_id, indicator_id, amount))
+    cursor.close()
+    return loaded
+
+# ----------------------------
+# Refresh rollup
+# ----------------------------
+# Refreshed in this order: the wide tables are pivoted from pmayg_rollup
+MATERIALIZED_VIEWS = ("pmayg_rollup", "pmayg_state_wide", "pmayg_district_wide", "pmayg_block_wide",
+                      "pmayg_panchayat_wide")
+
+def refresh_rollup(conn, report_id):
+    cursor = conn.cursor()
+    cursor.execute("SELECT matviewname, ispopulated FROM pg_matviews WHERE matviewname = ANY(%s)",
+                   (list(MATERIALIZED_VIEWS),))
+    populated = dict(cursor.fetchall())
+    started = time.perf_counter()
+    for view in MATERIALIZED_VIEWS:
+        # CONCURRENTLY keeps the view readable during the refresh, but needs a first full build
+        cursor.execute(f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if populated[view] else ''}{view}")
+    # Stamped in the same transaction as the refresh: the app's result cache keys
+    # on it, so cached results never outlive the data they were computed from
+    cursor.execute("UPDATE pmayg_report SET refreshed_at = now() WHERE report_id = %s", (report_id,))
+    conn.commit()
+    cursor.close()
+    print(f"[INFO] Rollup refreshed in {time.perf_counter() - started:.2f}s")
 
 
 # ----------------------------
 # Main
 # ----------------------------
-def main():
+def schema_exists(cursor):
+    # The newest view in schema.sql: databases set up by an older schema are rebuilt
+    cursor.execute("SELECT to_regclass('pmayg_panchayat_wide') IS NOT NULL")
+    return cursor.fetchone()[0]
+
+def latest_report_id(cursor):
+    cursor.execute("SELECT max(report_id) FROM pmayg_report")
+    return cursor.fetchone()[0]
+
+def main(incremental=False, summary=False, excel_dir=None):
+    global EXCEL_FOLDER
+    if excel_dir:
+        EXCEL_FOLDER = os.path.abspath(excel_dir)
+
     conn = psycopg2.connect(
         host=DB_HOST, port=DB_PORT, dbname=DB_NAME, user=DB_USER, password=DB_PASS
     )
     cursor = conn.cursor()
 
-    load_schema(cursor)
-    conn.commit()
+    # Incremental runs keep the existing tables and only reload changed workbooks
+    if not incremental or not schema_exists(cursor):
+        load_schema(cursor)
+        conn.commit()
 
     load_indicators(cursor)
     conn.commit()
 
-    report_id = create_report(cursor)
+    report_id = latest_report_id(cursor) if incremental else None
+    if report_id is None:
+        report_id = create_report(cursor)
+    else:
+        print(f"[INFO] Refreshing report_id={report_id}")
     conn.commit()
 
-    load_geography_and_facts(cursor, report_id)
-    conn.commit()
+    loaded = load_geography_and_facts(conn, report_id)
+    if loaded:
+        refresh_rollup(conn, report_id)
+
+        # Refresh planner statistics so the new indexes are picked up right away
+        cursor.execute("ANALYZE")
+        conn.commit()
 
     cursor.close()
     conn.close()
+
+    if summary:
+        # Generate the overview summary now so the first app session does not wait for it.
+        # Uses the app's connection settings (PG* variables) and GROQ_API_KEY.
+        from agents.summary_agent import company_summary_agent
+        started = time.perf_counter()
+        company_summary_agent()
+        print(f"[INFO] Overview summary ready in {time.perf_counter() - started:.2f}s")
     print("[INFO] PMAY-G database setup completed.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Load the PMAY-G Excel workbooks into PostgreSQL.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="keep existing data and reload only workbooks that changed since the last run")
+    parser.add_argument("--summary", action="store_true",
+                        help="generate the overview summary for the loaded data (needs GROQ_API_KEY)")
+    parser.add_argument("--excel-dir", default=None,
+                        help=f"folder with the 01_-04_ workbooks (default: {EXCEL_FOLDER})")
+    args = parser.parse_args()
+    main(incremental=args.incremental, summary=args.summary, excel_dir=args.excel_dir)
\ No newline at end of file
@@ -2,86 +2,90 @@ examples = [
     {
         "query": "How much fund has been released in Maharashtra?",
         "sql": """
-SELECT i.name AS indicator, COALESCE(SUM(ff.amount),0) AS total_released
-FROM pmayg_fund_fact ff
-JOIN pmayg_state s ON ff.state_id = s.state_id
-JOIN pmayg_indicator i ON ff.indicator_id = i.indicator_id
-WHERE s.name='MAHARASHTRA' AND i.name='Released_Total'
-GROUP BY i.name;
+SELECT state_name, COALESCE(released_total,0) AS total_released
+FROM pmayg_state_wide
+WHERE state_name='MAHARASHTRA';
 """
     },
     {
         "query": "Which beneficiary category received the most funds in Pune district?",
         "sql": """
-SELECT i.name AS indicator, COALESCE(SUM(ff.amount),0) AS total
-FROM pmayg_fund_fact ff
-JOIN pmayg_district d ON ff.district_id = d.district_id
-JOIN pmayg_indicator i ON ff.indicator_id = i.indicator_id
-WHERE d.name='PUNE' AND i.type='beneficiary'
-GROUP BY i.name
+SELECT indicator, COALESCE(amount,0) AS total
+FROM pmayg_rollup
+WHERE geo_level='district' AND geo_name='PUNE' AND indicator_type='beneficiary'
 ORDER BY total DESC;
 """
     },
     {
         "query": "Which beneficiary category received the least funds in Pune district?",
         "sql": """
-SELECT i.name AS indicator, COALESCE(SUM(ff.amount),0) AS total
-FROM pmayg_fund_fact ff
-JOIN pmayg_district d ON ff.district_id = d.district_id
-JOIN pmayg_indicator i ON ff.indicator_id = i.indicator_id
-WHERE d.name='PUNE' AND i.type='beneficiary'
-GROUP BY i.name
+SELECT indicator, COALESCE(amount,0) AS total
+FROM pmayg_rollup
+WHERE geo_level='district' AND geo_name='PUNE' AND indicator_type='beneficiary'
 ORDER BY total ASC;
 """
     },
     {
         "query": "Which beneficiary category is most underrepresented in Khed block?",
         "sql": """
-SELECT i.name AS indicator, COALESCE(SUM(ff.amount),0) AS total
-FROM pmayg_fund_fact ff
-JOIN pmayg_block b ON ff.block_id = b.block_id
-JOIN pmayg_indicator i ON ff.indicator_id = i.indicator_id
-WHERE b.name='KHED' AND i.type='beneficiary'
-GROUP BY i.name
+SELECT indicator, COALESCE(amount,0) AS total
+FROM pmayg_rollup
+WHERE geo_level='block' AND geo_name='KHED' AND indicator_type='beneficiary'
 ORDER BY total ASC;
 """
     },
     {
         "query": "Compare fund allocation across beneficiary categories in Khed block",
         "sql": """
-SELECT i.name AS indicator, COALESCE(SUM(ff.amount),0) AS total
-FROM pmayg_fund_fact ff
-JOIN pmayg_block b ON ff.block_id = b.block_id
-JOIN pmayg_indicator i ON ff.indicator_id = i.indicator_id
-WHERE b.name='KHED' AND i.type='beneficiary'
-GROUP BY i.name
+SELECT indicator, COALESCE(amount,0) AS total
+FROM pmayg_rollup
+WHERE geo_level='block' AND geo_name='KHED' AND indicator_type='beneficiary'
 ORDER BY total DESC;
 """
     },
     {
         "query": "Which beneficiary received the most funds in BHOSE panchayat?",
         "sql": """
-SELECT i.name AS indicator, COALESCE(SUM(ff.amount),0) AS total
-FROM pmayg_fund_fact ff
-JOIN pmayg_panchayat p ON ff.panchayat_id = p.panchayat_id
-JOIN pmayg_indicator i ON ff.indicator_id = i.indicator_id
-WHERE p.name='BHOSE' AND i.type='beneficiary'
-GROUP BY i.name
+SELECT indicator, COALESCE(amount,0) AS total
+FROM pmayg_rollup
+WHERE geo_level='panchayat' AND geo_name='BHOSE' AND indicator_type='beneficiary'
 ORDER BY total DESC;
 """
     },
     {
         "query": "Compare fund allocation across blocks in Maharashtra",
         "sql": """
-SELECT b.name AS block_name, i.name AS indicator, COALESCE(SUM(ff.amount),0) AS total
-FROM pmayg_fund_fact ff
-JOIN pmayg_block b ON ff.block_id = b.block_id
-JOIN pmayg_district d ON b.district_id = d.district_id
-JOIN pmayg_state s ON d.state_id = s.state_id
-JOIN pmayg_indicator i ON ff.indicator_id = i.indicator_id
-WHERE s.name='MAHARASHTRA' AND i.type='beneficiary'
-GROUP BY b.name, i.name
-ORDER BY b.name, i.name;
+SELECT block_name, COALESCE(sc,0) AS sc, COALESCE(st,0) AS st, COALESCE(minority,0) AS minority,
+       COALESCE(others,0) AS others, COALESCE(total,0) AS total
+FROM pmayg_block_wide
+WHERE state_name='MAHARASHTRA'
+ORDER BY block_name;
+"""
+    },
+    {
+        "query": "Which district in Maharashtra has the most ST beneficiaries?",
+        "sql": """
+SELECT district_name, COALESCE(st,0) AS st_total
+FROM pmayg_district_wide
+WHERE state_name='MAHARASHTRA'
+ORDER BY st_total DESC;
+"""
+    },
+    {
+        "query": "Compare fund utilization percentage across states",
+        "sql": """
+SELECT state_name, COALESCE(percentage_utilization,0) AS percentage_utilization
+FROM pmayg_state_wide
+ORDER BY percentage_utilization DESC;
+"""
+    },
+    {
+        "query": "Do the panchayat allocations in Khed block add up to the block total?",
+        "sql": """
+SELECT indicator, COALESCE(amount,0) AS block_total, COALESCE(children_amount,0) AS panchayat_sum
+FROM pmayg_rollup
+WHERE geo_level='block' AND geo_name='KHED' AND indicator_type='beneficiary'
+ORDER BY indicator;
 """
     }
 ]
@@ -0,0 +1,63 @@
+import os
+import shutil
+import uuid
+
+import psycopg2
+import pytest
+
+# Tests never call Groq: importing the agents builds the LLM client, which needs a key otherwise
+os.environ.setdefault("LLM_BACKEND", "fake")
+
+from db import generate_data, setup
+from utils import excel_cache
+
+
+@pytest.fixture(scope="session")
+def generated_workbooks(tmp_path_factory):
+    """A small synthetic hierarchy (2 states x 2 districts x 2 blocks x 3 panchayats) and its counts."""
+    out_dir = tmp_path_factory.mktemp("workbooks")
+    counts = generate_data.generate(str(out_dir), 2, 2, 2, 3)
+    return out_dir, counts
+
+
+@pytest.fixture
+def workbooks(generated_workbooks, tmp_path):
+    """A copy of the generated workbooks that a test may change."""
+    out_dir = tmp_path / "excel"
+    shutil.copytree(generated_workbooks[0], out_dir)
+    return out_dir
+
+
+@pytest.fixture
+def scratch_database(monkeypatch, tmp_path):
+    """
+    An empty PostgreSQL database on the server db/setup.py is configured for
+    (DB_* variables), dropped afterwards; db/setup.py is pointed at it. Yields
+    a function returning a new connection to it. Skipped when the server cannot
+    be reached.
+    """
+    params = dict(host=setup.DB_HOST, port=setup.DB_PORT, user=setup.DB_USER, password=setup.DB_PASS)
+    try:
+        admin = psycopg2.connect(dbname="postgres", **params)
+    except psycopg2.Error as e:
+        pytest.skip(f"PostgreSQL unavailable: {e}".strip())
+    admin.autocommit = True
+    name = f"pmayg_test_{uuid.uuid4().hex[:12]}"
+    with admin.cursor() as cursor:
+        cursor.execute(f"CREATE DATABASE {name}")
+    monkeypatch.setattr(setup, "DB_NAME", name)
+    monkeypatch.setattr(setup, "EXCEL_FOLDER", setup.EXCEL_FOLDER)  # main(excel_dir=...) changes it
+    monkeypatch.setattr(excel_cache, "CACHE_DIR", str(tmp_path / "sheets"))
+    connections = []
+
+    def connect():
+        conn = psycopg2.connect(dbname=name, **params)
+        connections.append(conn)
+        return conn
+
+    yield connect
+    for conn in connections:
+        conn.close()
+    with admin.cursor() as cursor:
+        cursor.execute(f"DROP DATABASE {name} WITH (FORCE)")
+    admin.close()
@@ -0,0 +1,127 @@
+"""
+PostgreSQL and DuckDB backends return the same results.
+
+Covers every few-shot example query, the fast-path template SQL for the
+example questions, the overview summary queries and a full read of each
+per-level wide table. Results must have the same columns, the same number of
+rows and, after sorting the rows, the same values (numbers to a relative
+tolerance of 1e-9, since NUMERIC and DOUBLE sums can differ in the last bits).
+
+The DuckDB tests need the file built by python db/build_duckdb.py (DUCKDB_PATH)
+and are skipped without it; the comparisons also need the PostgreSQL database
+from python db/setup.py, loaded from the same workbooks, and are skipped when
+it cannot be reached.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents import fast_path
+from agents.summary_agent import SUMMARY_QUERIES
+from agents.text_to_sql import resolve_places
+from db.setup import MATERIALIZED_VIEWS
+from few_shot_examples.examples import examples
+from utils import db as postgres_db
+from utils import duckdb_db
+from utils.geo_index import GeoIndex
+
+QUERIES = (
+    [pytest.param(ex["sql"], id=f"example: {ex['query']}") for ex in examples]
+    + [pytest.param(sql, id=f"summary: {label}") for label, sql in SUMMARY_QUERIES.items()]
+    + [pytest.param(f"SELECT * FROM {view}", id=f"wide table: {view}")
+       for view in MATERIALIZED_VIEWS if view.endswith("_wide")]
+)
+QUESTIONS = [pytest.param(ex["query"], id=f"fast path: {ex['query']}") for ex in examples]
+
+
+@pytest.fixture(scope="module")
+def duckdb():
+    if not os.path.exists(duckdb_db.DUCKDB_PATH):
+        pytest.skip(f"no DuckDB database at {duckdb_db.DUCKDB_PATH}; build it with python db/build_duckdb.py")
+    return duckdb_db
+
+
+@pytest.fixture(scope="module")
+def postgres():
+    try:
+        if not postgres_db.table_exists("pmayg_rollup"):
+            pytest.skip("PostgreSQL database is not loaded; run python db/setup.py")
+    except postgres_db.Error as e:
+        pytest.skip(f"PostgreSQL unavailable: {e}".strip())
+    return postgres_db
+
+
+@pytest.fixture(scope="module")
+def geo_index(duckdb):
+    # Both builds assign the same geography ids, so the fast-path SQL is the same for either engine
+    with duckdb.connection() as conn:
+        return GeoIndex.from_db(conn.cursor())
+
+
+def run(backend, sql):
+    return backend.query_df(sql.strip().rstrip(";"))
+
+
+def fast_path_sql(question, geo_index):
+    matched = fast_path.match(question, resolve_places(question, geo_index), geo_index)
+    if not matched:
+        pytest.skip("no fast-path template for this question")
+    return matched[1]
+
+
+def normalized(df):
+    """Rows sorted on every column, numbers as float64, so engine-specific ordering and types do not count."""
+    df = df.copy()
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]) or df[col].map(lambda v: isinstance(v, (int, float))).all():
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+        else:
+            df[col] = df[col].astype(object).where(df[col].notna(), None)
+    return df.sort_values(list(df.columns), na_position="last", key=lambda s: s.astype(str)
+                          if s.dtype == object else s).reset_index(drop=True)
+
+
+def compare(expected, actual):
+    """None when the results match, else a description of the first difference."""
+    if list(expected.columns) != list(actual.columns):
+        return f"columns differ: {list(expected.columns)} vs {list(actual.columns)}"
+    if len(expected) != len(actual):
+        return f"row counts differ: {len(expected)} vs {len(actual)}"
+    expected, actual = normalized(expected), normalized(actual)
+    for col in expected.columns:
+        left, right = expected[col], actual[col]
+        if left.dtype == "float64" and right.dtype == "float64":
+            same = np.isclose(left, right, rtol=1e-9, atol=1e-9, equal_nan=True)
+        else:
+            same = (left == right) | (left.isna() & right.isna())
+        if not same.all():
+            row = int(np.argmin(same))
+            return f"column {col!r}, row {row}: {left.iloc[row]!r} vs {right.iloc[row]!r}"
+    return None
+
+
+# ---------------- DuckDB ----------------
+@pytest.mark.parametrize("sql", QUERIES)
+def test_runs_on_duckdb(duckdb, sql):
+    assert len(run(duckdb, sql).columns)
+
+
+@pytest.mark.parametrize("question", QUESTIONS)
+def test_fast_path_runs_on_duckdb(duckdb, geo_index, question):
+    assert len(run(duckdb, fast_path_sql(question, geo_index)).columns)
+
+
+# ---------------- PostgreSQL vs DuckDB ----------------
+@pytest.mark.parametrize("sql", QUERIES)
+def test_same_results(postgres, duckdb, sql):
+    problem = compare(run(postgres, sql), run(duckdb, sql))
+    assert problem is None, problem
+
+
+@pytest.mark.parametrize("question", QUESTIONS)
+def test_fast_path_same_results(postgres, duckdb, geo_index, question):
+    sql = fast_path_sql(question, geo_index)
+    problem = compare(run(postgres, sql), run(duckdb, sql))
+    assert problem is None, problem
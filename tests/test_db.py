@@ -0,0 +1,114 @@
+"""
+utils/db.py: the shared connection pool. Runs against the PostgreSQL server
+the app is configured for (PG* variables); skipped when it cannot be reached.
+"""
+import threading
+
+import psycopg2
+import pytest
+
+from utils import db
+
+
+@pytest.fixture
+def postgres():
+    try:
+        db.query_df("SELECT 1")
+    except db.Error as e:
+        pytest.skip(f"PostgreSQL unavailable: {e}".strip())
+    return db
+
+
+def scalar(conn, sql, params=None):
+    with conn.cursor() as cursor:
+        db.execute(cursor, sql, params)
+        return cursor.fetchone()[0]
+
+
+def test_read_only_by_default(postgres):
+    with pytest.raises(db.Error, match="read-only"):
+        with db.connection() as conn:
+            with conn.cursor() as cursor:
+                db.execute(cursor, "CREATE TABLE pmayg_should_not_exist (id INT)")
+    with db.connection(read_only=False) as conn:
+        assert scalar(conn, "SHOW transaction_read_only") == "off"
+
+
+def test_statement_timeout(postgres):
+    with pytest.raises(db.Error, match="statement timeout"):
+        with db.connection(timeout_ms=50) as conn:
+            scalar(conn, "SELECT pg_sleep(2)")
+    with db.connection() as conn:  # the override was for that transaction only
+        assert scalar(conn, "SHOW statement_timeout") == f"{db.STATEMENT_TIMEOUT_MS // 1000}s"
+
+
+def test_connection_usable_after_an_error(postgres):
+    with pytest.raises(db.Error):
+        with db.connection() as conn:
+            scalar(conn, "SELECT 1 / 0")
+    for _ in range(db.POOL_MAX + 1):
+        with db.connection() as conn:
+            assert scalar(conn, "SELECT 1") == 1
+
+
+def test_waits_for_a_free_connection(postgres, monkeypatch):
+    monkeypatch.setattr(db, "_slots", threading.BoundedSemaphore(1))
+    released = threading.Event()
+
+    def hold():
+        with db.connection():
+            released.wait(5)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    try:
+        monkeypatch.setattr(db, "POOL_TIMEOUT", 0.1)
+        timeouts = db.metrics()["pool_timeouts"]
+        with pytest.raises(db.PoolTimeout):
+            with db.connection():
+                pass
+        assert db.metrics()["pool_timeouts"] == timeouts + 1
+
+        monkeypatch.setattr(db, "POOL_TIMEOUT", 5)
+        threading.Timer(0.2, released.set).start()
+        before = db.metrics()["pool_wait_max"]
+        with db.connection() as conn:
+            assert scalar(conn, "SELECT 1") == 1
+        assert db.metrics()["pool_wait_max"] >= max(before, 0.15)
+    finally:
+        released.set()
+        holder.join()
+
+
+def test_dead_connection_is_replaced(postgres, monkeypatch):
+    with db.connection() as victim:
+        pid = scalar(victim, "SELECT pg_backend_pid()")
+    admin = psycopg2.connect(**db.DB_PARAMS)  # not from the pool, which now holds the victim
+    try:
+        with admin.cursor() as cursor:
+            cursor.execute("SELECT pg_terminate_backend(%s)", (pid,))
+    finally:
+        admin.close()
+    monkeypatch.setattr(db, "HEALTH_CHECK_AFTER", 0)
+    reconnects = db.metrics()["reconnects"]
+    pids = set()
+    for _ in range(2):
+        with db.connection() as conn:
+            pids.add(scalar(conn, "SELECT pg_backend_pid()"))
+    assert pid not in pids
+    assert db.metrics()["reconnects"] == reconnects + 1
+
+
+def test_query_metrics(postgres):
+    before = db.metrics()
+    df = db.query_df("SELECT %s::int AS n", (7,))
+    after = db.metrics()
+    assert df.to_dict("records") == [{"n": 7}]
+    assert after["checkouts"] == before["checkouts"] + 1
+    assert after["queries"] == before["queries"] + 1
+    assert after["query_seconds"] > before["query_seconds"]
+
+
+def test_numeric_as_float(postgres):
+    df = db.query_df("SELECT 1.25::numeric AS amount")
+    assert df["amount"].dtype == "float64"
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import excel_cache
+from utils.excel_cache import file_hash, load_sheet, load_sheets, read_cached
+
+pytest.importorskip("pyarrow")
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    path = tmp_path / "03_pune_blocks.xlsx"
+    pd.DataFrame({
+        "Block Name ": [" KHED", "HAVELI", "Total"],
+        "Allocated_Total": [10.5, 4.5, 15.0],
+        "Percentage Utilization": [80.5, "N.A.", 80.5],
+    }).to_excel(path, index=False)
+    return str(path)
+
+
+def test_clean_sheet(workbook, tmp_path):
+    df = load_sheet(workbook, cache_dir=str(tmp_path / "cache"))
+    assert list(df.columns) == ["Block Name", "Allocated_Total", "Percentage Utilization"]
+    assert list(df["Block Name"]) == ["KHED", "HAVELI"]
+    assert np.isnan(df["Percentage Utilization"].iloc[1])
+
+
+def test_raw_sheet_keeps_totals_and_values(workbook, tmp_path):
+    df = load_sheet(workbook, cache_dir=str(tmp_path / "cache"), clean=False)
+    assert list(df["Block Name "]) == [" KHED", "HAVELI", "Total"]
+    assert list(df["Percentage Utilization"]) == ["80.5", "N.A.", "80.5"]
+
+
+def test_cache_is_used_and_kept_per_kind(workbook, tmp_path, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    clean, raw = load_sheet(workbook, cache_dir=cache_dir), load_sheet(workbook, cache_dir=cache_dir, clean=False)
+    content_hash = file_hash(workbook)
+    assert read_cached(content_hash, cache_dir) is not None
+    assert read_cached(content_hash, cache_dir, clean=False) is not None
+
+    def parse_sheet(*args, **kwargs):
+        raise AssertionError("parsed again despite the cache")
+
+    monkeypatch.setattr(excel_cache, "parse_sheet", parse_sheet)
+    pd.testing.assert_frame_equal(load_sheet(workbook, cache_dir=cache_dir), clean)
+    pd.testing.assert_frame_equal(load_sheet(workbook, cache_dir=cache_dir, clean=False), raw)
+
+
+def test_changed_file_is_parsed_again(workbook, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    load_sheet(workbook, cache_dir=cache_dir)
+    pd.DataFrame({"Block Name": ["SHIRUR"], "Allocated_Total": [1.0]}).to_excel(workbook, index=False)
+    assert list(load_sheet(workbook, cache_dir=cache_dir)["Block Name"]) == ["SHIRUR"]
+
+
+def test_load_sheets_in_a_pool(workbook, tmp_path):
+    other = str(tmp_path / "04_khed_panchayats.xlsx")
+    pd.DataFrame({"Panchayat Name": ["BHOSE", "Grand Total"], "SC": [1, 1]}).to_excel(other, index=False)
+    frames = load_sheets([workbook, other], workers=2, cache_dir=str(tmp_path / "cache"))
+    assert sorted(frames) == ["03_pune_blocks.xlsx", "04_khed_panchayats.xlsx"]
+    assert list(frames["04_khed_panchayats.xlsx"]["Panchayat Name"]) == ["BHOSE"]
+    assert read_cached(file_hash(other), str(tmp_path / "cache")) is not None
@@ -0,0 +1,73 @@
+"""
+db/generate_data.py and the phase parsing of benchmarks/etl_scale.py. The
+workbooks are the session's generated hierarchy (2 x 2 x 2 x 3, see conftest.py).
+"""
+import pandas as pd
+import pytest
+
+from benchmarks import etl_scale
+from db import generate_data, setup
+
+
+def sheet(path):
+    """A workbook without its 'Total' rows, as db/setup.py reads it."""
+    df = pd.read_excel(path)
+    return df[df.iloc[:, 1] != "Total"].reset_index(drop=True)
+
+
+def test_one_workbook_per_parent(generated_workbooks):
+    excel_dir, counts = generated_workbooks
+    names = sorted(p.name for p in excel_dir.glob("*.xlsx"))
+    per_prefix = {prefix: sum(name.startswith(prefix) for name in names) for prefix, _ in setup.LEVEL_FILES}
+    assert per_prefix == {"01_": 1, "02_": 2, "03_": 4, "04_": 8}
+    assert counts["files"] == len(names) == 15
+    assert counts["places"] == 2 + 4 + 8 + 24
+    assert counts["facts"] == 2 * len(generate_data.FUND_FLOW_COLUMNS) + (4 + 8 + 24) * 5
+
+
+def test_columns_are_the_ones_setup_loads(generated_workbooks):
+    excel_dir, _ = generated_workbooks
+    indicators = {name for name, _ in setup.INDICATORS}
+    for prefix, level in setup.LEVEL_FILES:
+        for path in excel_dir.glob(f"{prefix}*.xlsx"):
+            columns = list(pd.read_excel(path).columns)
+            assert columns[:2] == ["#SNo", setup.LEVELS[level]["name_col"]]
+            assert set(columns[2:]) <= indicators, path.name
+
+
+def test_totals_and_parents_match_their_children(generated_workbooks):
+    excel_dir, _ = generated_workbooks
+    raw = pd.read_excel(next(excel_dir.glob("03_*.xlsx")))
+    assert raw.iloc[0, 1] == raw.iloc[-1, 1] == "Total"
+    blocks = sheet(next(excel_dir.glob("03_*.xlsx")))
+    assert raw.loc[0, "Total"] == pytest.approx(blocks["Total"].sum())
+    for _, block in blocks.iterrows():
+        panchayats = sheet(excel_dir / f"04_{block['Block Name'].lower()}_panchayats.xlsx")
+        for column in generate_data.CATEGORIES + ["Total"]:
+            assert block[column] == pytest.approx(panchayats[column].sum(), abs=0.01)
+
+
+def test_state_fund_flows_keep_their_identities(generated_workbooks):
+    states = sheet(generated_workbooks[0] / "01_states.xlsx")
+    assert (states["Allocated_Central"] + states["Allocated_State"]).to_numpy() == pytest.approx(
+        states["Allocated_Total"].to_numpy(), abs=1e-3)
+    assert (states["Opening Balance"] + states["Released_Total"]).to_numpy() == pytest.approx(
+        states["Total Available Funds"].to_numpy(), abs=1e-3)
+
+
+def test_same_seed_same_workbooks(tmp_path):
+    first, second, other = (tmp_path / name for name in ("a", "b", "c"))
+    generate_data.generate(str(first), 1, 2, 1, 3, seed=7)
+    generate_data.generate(str(second), 1, 2, 1, 3, seed=7)
+    generate_data.generate(str(other), 1, 2, 1, 3, seed=8)
+    names = sorted(p.name for p in first.glob("*.xlsx"))
+    assert names == sorted(p.name for p in second.glob("*.xlsx"))
+    for name in names:
+        pd.testing.assert_frame_equal(pd.read_excel(first / name), pd.read_excel(second / name))
+    assert names != sorted(p.name for p in other.glob("*.xlsx"))
+
+
+def test_benchmark_reads_the_load_phases(scratch_database, generated_workbooks, capsys):
+    setup.main(excel_dir=str(generated_workbooks[0]))
+    phases = etl_scale.phase_seconds(capsys.readouterr().out)
+    assert set(phases) == {"parse", "rollup"} and all(seconds >= 0 for seconds in phases.values())
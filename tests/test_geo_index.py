@@ -0,0 +1,147 @@
+import pytest
+
+from agents.text_to_sql import resolve_places
+from utils.geo_index import GeoIndex, _edit_distance, normalize
+
+
+@pytest.fixture
+def index():
+    index = GeoIndex()
+    index.add("state", 1, "MAHARASHTRA")
+    index.add("state", 2, "ODISHA")
+    index.add("district", 1, "PUNE", 1)
+    index.add("district", 2, "NASHIK", 1)
+    index.add("district", 3, "KHORDHA", 2)
+    index.add("block", 1, "KHED", 1)
+    index.add("block", 2, "KHED", 2)
+    index.add("block", 3, "HAVELI", 1)
+    index.add("panchayat", 1, "BHOSE", 1)
+    index.add("panchayat", 2, "PUNE", 3)
+    index.add("panchayat", 3, "KHEDE", 1)
+    return index
+
+
+@pytest.mark.parametrize("name, key", [
+    ("Pune District", "pune"),
+    ("  MAHARASHTRA ", "maharashtra"),
+    ("Bhose Gram Panchayat", "bhose"),
+    ("Orissa", "odisha"),
+    ("Jammu & Kashmir", "jammu and kashmir"),
+])
+def test_normalize(name, key):
+    assert normalize(name) == key
+
+
+def test_find_and_resolve(index):
+    assert {p.level for p in index.find("pune")} == {"district", "panchayat"}
+    assert index.resolve("Khed") is None  # two blocks
+    assert index.resolve("Khed", "block", 2).id == 2
+    assert index.resolve("Nashik district").id == 2
+
+
+@pytest.mark.parametrize("a, b, distance", [
+    ("pune", "pune", 0),
+    ("pnue", "pune", 1),
+    ("pun", "pune", 1),
+    ("punee", "pune", 1),
+    ("pane", "pune", 1),
+    ("pnu", "pune", None),
+    ("enup", "pune", None),
+    ("nashik", "nasik", 1),
+])
+def test_edit_distance(a, b, distance):
+    assert _edit_distance(a, b) == distance
+    assert _edit_distance(b, a) == distance
+
+
+@pytest.mark.parametrize("typo, name", [
+    ("Pnue", "PUNE"),         # swap
+    ("Nasik", "NASHIK"),      # deletion
+    ("Maharashtraa", "MAHARASHTRA"),  # insertion
+    ("Odisba", "ODISHA"),     # substitution
+])
+def test_fuzzy(index, typo, name):
+    assert index.fuzzy(typo)[0].name == name
+
+
+def test_fuzzy_orders_exact_then_higher_levels(index):
+    assert [(p.level, p.name) for p in index.fuzzy("Khed")] == [
+        ("block", "KHED"), ("block", "KHED"), ("panchayat", "KHEDE")]
+    assert [p.level for p in index.fuzzy("Pnue")] == ["district", "panchayat"]
+    assert index.fuzzy("Pnue", level="panchayat")[0].id == 2
+    assert index.fuzzy("Xyzzy") == []
+
+
+def test_fuzzy_index_follows_new_places(index):
+    assert index.fuzzy("Shirru") == []
+    index.add("block", 4, "SHIRUR", 1)
+    assert index.fuzzy("Shirru")[0].id == 4
+
+
+def test_mentions_exact(index):
+    mentions = index.mentions("Compare fund allocation across blocks in Pune district")
+    assert [(m["text"], [p.level for p in m["places"]]) for m in mentions] == [("pune", ["district"])]
+
+
+def test_mentions_fuzzy(index):
+    assert index.mentions("Total funds in Pnue district") == []
+    mentions = index.mentions("Total funds in Pnue district", fuzzy=True)
+    assert [(m["text"], [(p.level, p.name) for p in m["places"]]) for m in mentions] == [
+        ("pnue", [("district", "PUNE")])]
+
+
+@pytest.mark.parametrize("question", [
+    "Which block has the most funds",      # stopwords and level words are never corrected
+    "Show the top 5 blocks",
+    "Funds in Pun",                        # too short to correct
+])
+def test_mentions_fuzzy_leaves_common_words(index, question):
+    assert index.mentions(question, fuzzy=True) == []
+
+
+def test_resolve_places_falls_back_to_fuzzy(index):
+    places = resolve_places("Which beneficiary category received the most funds in Pnue district?", index)
+    assert [(p["mention"], p["level"], p["name"], p["within"]) for p in places] == [
+        ("pnue", "district", "PUNE", "MAHARASHTRA")]
+
+
+
+def test_prefix(index):
+    assert [(p.level, p.name) for p in index.prefix("Kh")] == [
+        ("block", "KHED"), ("block", "KHED"), ("panchayat", "KHEDE"), ("district", "KHORDHA")]
+    assert [p.id for p in index.prefix("kh", level="block")] == [1, 2]
+    assert len(index.prefix("kh", limit=2)) == 2
+    index.add("block", 4, "KHALAPUR", 1)
+    assert index.prefix("kha")[0].name == "KHALAPUR"
+
+
+@pytest.fixture
+def aurangabad():
+    index = GeoIndex()
+    index.add("state", 1, "MAHARASHTRA")
+    index.add("state", 2, "BIHAR")
+    index.add("district", 1, "CHATRAPATI SAMBHAJI NAGAR", 1)
+    index.add("district", 2, "AURANGABAD", 2)
+    index.add("block", 1, "AURANGABAD", 2)
+    return index
+
+
+def test_old_name_matches_renamed_place_only_in_its_state(aurangabad):
+    assert {(p.level, p.id) for p in aurangabad.find("Aurangabad")} == {
+        ("district", 1), ("district", 2), ("block", 1)}
+    assert aurangabad.resolve("Aurangabad", "district", 1).name == "CHATRAPATI SAMBHAJI NAGAR"
+    assert aurangabad.resolve("Aurangabad", "district", 2).name == "AURANGABAD"
+    assert aurangabad.find("Sambhajinagar") == [aurangabad.get("district", 1)]
+
+
+def test_old_name_not_applied_in_other_states():
+    index = GeoIndex()
+    index.add("state", 1, "KARNATAKA")
+    index.add("district", 1, "CHATRAPATI SAMBHAJI NAGAR", 1)
+    assert index.find("Aurangabad") == []
+    assert index.find("Aurangabad", "district", 1) == []
+
+
+def test_mentions_old_name(aurangabad):
+    mentions = aurangabad.mentions("Total funds in Aurangabad district")
+    assert sorted((p.level, p.id) for p in mentions[0]["places"]) == [("district", 1), ("district", 2)]
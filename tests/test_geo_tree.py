@@ -0,0 +1,109 @@
+from contextlib import contextmanager
+
+import duckdb
+import pytest
+
+from utils import geo_tree
+from utils.geo_index import GEO_TABLES, GeoIndex
+from utils.geo_tree import GeoTree
+
+INDICATORS = [("SC", "beneficiary"), ("Total", "beneficiary"), ("Released_Total", "fund_flow")]
+
+
+@pytest.fixture
+def tree():
+    index = GeoIndex()
+    index.add("state", 1, "MAHARASHTRA")
+    index.add("district", 1, "PUNE", 1)
+    index.add("district", 2, "AHMEDNAGAR", 1)
+    index.add("block", 1, "KHED", 1)
+    index.add("block", 2, "HAVELI", 1)
+    index.add("panchayat", 1, "BHOSE", 1)
+    values = {
+        ("state", 1): {"SC": 30.0, "Total": 90.0, "Released_Total": 42.5},
+        ("district", 1): {"SC": 20.0, "Total": 60.0},
+        ("district", 2): {"SC": 10.0, "Total": 30.0},
+        ("block", 1): {"SC": 12.0, "Total": 35.0},
+        ("block", 2): {"SC": 8.0, "Total": None},
+        ("panchayat", 1): {"SC": 12.0, "Total": 35.0},
+    }
+    return GeoTree(index, INDICATORS, values)
+
+
+def test_children_sorted_by_name(tree):
+    assert [p.name for p in tree.children()] == ["MAHARASHTRA"]
+    assert [p.name for p in tree.children(tree.get("state", 1))] == ["AHMEDNAGAR", "PUNE"]
+    assert tree.children(tree.get("panchayat", 1)) == []
+
+
+def test_path(tree):
+    assert [p.name for p in tree.path(tree.get("panchayat", 1))] == ["MAHARASHTRA", "PUNE", "KHED", "BHOSE"]
+    assert tree.path(None) == []
+
+
+def test_place_values(tree):
+    values = tree.place_values(tree.get("state", 1))
+    assert values.values.tolist() == [["SC", "beneficiary", 30.0], ["Total", "beneficiary", 90.0],
+                                      ["Released_Total", "fund_flow", 42.5]]
+    assert tree.place_values(tree.get("block", 2))["indicator"].tolist() == ["SC"]
+
+
+def test_breakdown(tree):
+    df = tree.breakdown(tree.get("district", 1))
+    assert list(df.columns) == ["block_name", "SC", "Total"]  # no block reports Released_Total
+    assert df.fillna(-1).values.tolist() == [["HAVELI", 8.0, -1], ["KHED", 12.0, 35.0]]
+    assert tree.breakdown()["state_name"].tolist() == ["MAHARASHTRA"]
+    assert tree.breakdown(tree.get("panchayat", 1)).empty
+
+
+def test_breakdown_built_once(tree):
+    place = tree.get("state", 1)
+    assert tree.breakdown(place) is tree.breakdown(place)
+
+
+# ---------------- Shared tree ----------------
+@pytest.fixture
+def database(monkeypatch):
+    """geo_tree's db on an in-memory DuckDB rollup, with a settable data version; yields the state."""
+    state = {"version": 1, "loads": 0}
+
+    @contextmanager
+    def connection():
+        state["loads"] += 1
+        conn = duckdb.connect(":memory:")
+        for table, column, parent in GEO_TABLES.values():
+            conn.execute(f"CREATE TABLE {table} ({column} INT, name TEXT{f', {parent} INT' if parent else ''})")
+        conn.execute("INSERT INTO pmayg_state VALUES (1, 'MAHARASHTRA')")
+        conn.execute("INSERT INTO pmayg_district VALUES (1, 'PUNE', 1)")
+        conn.execute("CREATE TABLE pmayg_indicator (indicator_id INT, name TEXT, type TEXT)")
+        conn.execute("INSERT INTO pmayg_indicator VALUES (1, 'SC', 'beneficiary')")
+        conn.execute("CREATE TABLE pmayg_report (report_id INT)")
+        conn.execute("INSERT INTO pmayg_report VALUES (1), (2)")
+        conn.execute("""CREATE TABLE pmayg_rollup (report_id INT, geo_level TEXT, geo_id INT, indicator TEXT,
+                        amount DOUBLE, children_amount DOUBLE)""")
+        conn.execute(f"""INSERT INTO pmayg_rollup VALUES (1, 'district', 1, 'SC', 1.0, NULL),
+                         (2, 'state', 1, 'SC', NULL, {10.0 * state['version']}),
+                         (2, 'district', 1, 'SC', {10.0 * state['version']}, NULL)""")
+        yield conn
+        conn.close()
+
+    monkeypatch.setattr(geo_tree.db, "data_version", lambda: state["version"])
+    monkeypatch.setattr(geo_tree.db, "connection", connection)
+    monkeypatch.setattr(geo_tree.db, "execute", lambda cursor, sql, params=None: cursor.execute(sql))
+    monkeypatch.setattr(geo_tree, "_tree", {"tree": None, "version": None})
+    return state
+
+
+def test_tree_from_the_latest_report(database):
+    tree = geo_tree.get_tree()
+    assert tree.breakdown()["SC"].tolist() == [10.0]  # the state's children sum stands in for its own amount
+    assert tree.breakdown(tree.get("state", 1))["SC"].tolist() == [10.0]
+
+
+def test_tree_loaded_once_per_data_version(database):
+    tree = geo_tree.get_tree()
+    assert geo_tree.get_tree() is tree and database["loads"] == 1
+    database["version"] = 2
+    rebuilt = geo_tree.get_tree()
+    assert rebuilt is not tree and database["loads"] == 2
+    assert rebuilt.breakdown()["SC"].tolist() == [20.0]
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents.insight_generator import insights_agent, insights_prompt
+from utils.result_summary import estimate_tokens, summarize_result
+
+
+@pytest.fixture
+def categories():
+    return pd.DataFrame({"category": ["SC", "ST", "Minority", "Others", "Total"],
+                         "total": [20.0, 10.0, 5.0, 15.0, 50.0]})
+
+
+@pytest.fixture
+def panchayats():
+    """A long result: one row per panchayat and category, 'Total' rows included."""
+    rng = np.random.default_rng(0)
+    rows = 5000
+    df = pd.DataFrame({"panchayat_name": [f"GP {i // 5}" for i in range(rows)],
+                       "category": np.tile(["SC", "ST", "Minority", "Others", "Total"], rows // 5),
+                       "amount": rng.uniform(1, 100, rows).round(2)})
+    totals = df["category"] == "Total"
+    df.loc[totals, "amount"] = df.loc[~totals].groupby(np.arange((~totals).sum()) // 4)["amount"].sum().to_numpy()
+    return df
+
+
+def test_small_result_is_csv(categories):
+    assert summarize_result(categories) == "category,total\nSC,20.00\nST,10.00\nMinority,5.00\nOthers,15.00\nTotal,50.00"
+
+
+def test_empty_result():
+    assert summarize_result(pd.DataFrame({"total": []})) == "No relevant data found."
+
+
+@pytest.mark.parametrize("budget", [300, 1500, 4000])
+def test_long_result_fits_budget(panchayats, budget):
+    text = summarize_result(panchayats, max_tokens=budget)
+    assert estimate_tokens(text) <= budget
+    assert text.startswith("5,000 rows x 3 columns")
+
+
+def test_long_result_sections(panchayats):
+    text = summarize_result(panchayats, max_tokens=1500, k=5)
+    assert "Numeric columns:" in text
+    assert "Share of Total by category: " in text
+    top = panchayats[panchayats["category"] != "Total"].nlargest(5, "amount")
+    assert "Top 5 rows by amount:" in text and top.iloc[0]["panchayat_name"] in text
+    assert "Bottom 5 rows by amount:" in text
+
+
+def test_top_rows_exclude_totals(panchayats):
+    text = summarize_result(panchayats, max_tokens=1500, k=5)
+    ranked = text.split("Top 5 rows by amount:\n", 1)[1]
+    assert ",Total," not in ranked
+
+
+def test_k_shrinks_to_fit(panchayats):
+    assert "Top 10 rows" in summarize_result(panchayats, max_tokens=4000, k=10)
+    assert "Top 10 rows" not in summarize_result(panchayats, max_tokens=200, k=10)
+
+
+def test_wide_result_fits_budget():
+    df = pd.DataFrame(np.ones((50, 400)), columns=[f"indicator_{i}" for i in range(400)])
+    text = summarize_result(df, max_tokens=1000)
+    assert estimate_tokens(text) <= 1000
+
+
+def test_truncated_result_is_noted(panchayats):
+    assert "cut at the row limit" in summarize_result(panchayats, truncated=True)
+
+
+def test_prompt_has_question_and_summary(panchayats):
+    state = {"messages": ["Which panchayat received the most funds?"], "query_result": panchayats}
+    prompt = insights_prompt(state)
+    assert "Which panchayat received the most funds?" in prompt
+    assert "5,000 rows x 3 columns" in prompt
+    assert estimate_tokens(prompt) < 2500
+
+
+def test_insights_agent():
+    state = {"messages": ["Which category received the most funds?"], "query_result": pd.DataFrame()}
+    assert insights_agent(state)["insights"]
@@ -0,0 +1,238 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from agents import llm_client
+from agents.llm_client import FakeChatModel, LLMGateway, LLMRateLimited, LLMUnavailable, TokenBucket
+
+PROMPT = "Summarize the fund release for Pune district."
+
+
+class Response:
+    def __init__(self, headers):
+        self.headers = headers
+
+
+class RateLimitedModel(FakeChatModel):
+    """FakeChatModel whose first `failures` calls are rejected with a 429 and a Retry-After header."""
+
+    def __init__(self, failures, retry_after="3"):
+        super().__init__(latency_ms=0)
+        self.failures = failures
+        self.retry_after = retry_after
+        self.calls = 0
+
+    def _fail(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            error = LLMRateLimited("rate limit")
+            error.response = Response({"retry-after": self.retry_after})
+            raise error
+        return False
+
+
+class SlowModel(FakeChatModel):
+    """FakeChatModel counting calls, each taking latency_ms."""
+
+    def __init__(self, latency_ms=200):
+        super().__init__(latency_ms=latency_ms)
+        self.calls = 0
+
+    def respond(self, prompt):
+        self.calls += 1
+        return super().respond(prompt)
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Pauses the gateway asked for, without sleeping."""
+    pauses = []
+    monkeypatch.setattr(llm_client.time, "sleep", pauses.append)
+    return pauses
+
+
+def gateway(backend, **kwargs):
+    kwargs = {"requests_per_minute": 0, "tokens_per_minute": 0, **kwargs}
+    return LLMGateway(backend, **kwargs)
+
+
+def slots_free(gw):
+    return gw._slots._value
+
+
+# ---------------- Token bucket ----------------
+def test_token_bucket_waits_once_capacity_is_used():
+    bucket = TokenBucket(rate=10, capacity=5)
+    assert [bucket.reserve() for _ in range(5)] == [0.0] * 5
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    assert bucket.reserve(2) == pytest.approx(0.3, abs=0.01)  # waiting callers queue up
+
+
+def test_token_bucket_refills():
+    bucket = TokenBucket(rate=100, capacity=1)
+    bucket.reserve()
+    time.sleep(0.02)
+    assert bucket.reserve() == 0.0
+
+
+def test_token_bucket_disabled():
+    bucket = TokenBucket(rate=0, capacity=1)
+    assert bucket.reserve(1000) == 0.0
+
+
+def test_admission_waits_for_tokens(sleeps):
+    gw = gateway(FakeChatModel(latency_ms=0), tokens_per_minute=600)  # 10 tokens a second, 100 at once
+    gw.invoke("x" * 400)
+    assert gw.metrics()["wait_seconds"] == 0.0
+    gw.invoke("y" * 400)
+    assert gw.metrics()["wait_seconds"] == pytest.approx(10.0, abs=0.1)
+
+
+# ---------------- Retries ----------------
+def test_retry_honours_retry_after(sleeps):
+    backend = RateLimitedModel(failures=2)
+    gw = gateway(backend)
+    assert gw.invoke(PROMPT).content
+    assert backend.calls == 3
+    assert [pause for pause in sleeps if pause] == [3.0, 3.0]
+    assert gw.metrics()["retries"] == 2
+
+
+def test_retries_exhausted(sleeps):
+    gw = gateway(RateLimitedModel(failures=10), max_retries=2)
+    with pytest.raises(LLMUnavailable):
+        gw.invoke(PROMPT)
+    assert gw.metrics()["errors"] == 1
+    assert slots_free(gw) == gw._slots._initial_value
+
+
+def test_stream_retried_before_first_chunk(sleeps):
+    gw = gateway(RateLimitedModel(failures=1))
+    assert "".join(chunk.content for chunk in gw.stream(PROMPT))
+    assert gw.metrics()["retries"] == 1
+
+
+def test_async_retry(monkeypatch):
+    pauses = []
+
+    async def sleep(seconds):
+        pauses.append(seconds)
+
+    monkeypatch.setattr(llm_client.asyncio, "sleep", sleep)
+    gw = gateway(RateLimitedModel(failures=1, retry_after="2"))
+    assert asyncio.run(gw.ainvoke(PROMPT)).content
+    assert 2.0 in pauses
+
+
+# ---------------- Request dedup ----------------
+def test_identical_concurrent_calls_share_one_request():
+    backend = SlowModel()
+    gw = gateway(backend)
+    results = [None] * 4
+
+    def call(i):
+        results[i] = gw.invoke(PROMPT).content
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert backend.calls == 1
+    assert len(set(results)) == 1
+    assert gw.metrics()["deduplicated"] == 3
+
+
+def test_async_identical_calls_share_one_request():
+    backend = SlowModel()
+    gw = gateway(backend)
+
+    async def main():
+        return await asyncio.gather(*(gw.ainvoke(PROMPT) for _ in range(3)), gw.ainvoke("Another prompt"))
+
+    responses = asyncio.run(main())
+    assert backend.calls == 2
+    assert responses[0] is responses[1] is responses[2]
+
+
+def test_failed_call_is_not_shared_afterwards(sleeps):
+    gw = gateway(RateLimitedModel(failures=1), max_retries=0)
+    with pytest.raises(LLMUnavailable):
+        gw.invoke(PROMPT)
+    assert gw.invoke(PROMPT).content
+
+
+# ---------------- Concurrency slots ----------------
+def test_stream_frees_its_slot_when_upstream_ends():
+    gw = gateway(FakeChatModel(latency_ms=0), max_concurrency=1)
+    words = len(FakeChatModel().respond(PROMPT).split())
+    stream = gw.stream(PROMPT)
+    for _ in range(words - 1):
+        next(stream)
+        assert slots_free(gw) == 0
+    next(stream)  # the last chunk; the consumer never asks past it
+    assert slots_free(gw) == 1
+    assert gw.metrics()["calls"] == 1
+
+
+def test_abandoned_stream_frees_its_slot():
+    gw = gateway(FakeChatModel(latency_ms=0), max_concurrency=1)
+    stream = gw.stream(PROMPT)
+    next(stream)
+    stream.close()
+    assert slots_free(gw) == 1
+
+
+def test_async_stream_frees_its_slot_when_upstream_ends():
+    gw = gateway(FakeChatModel(latency_ms=0), max_concurrency=1)
+    words = len(FakeChatModel().respond(PROMPT).split())
+
+    async def main():
+        stream = gw.astream(PROMPT)
+        for _ in range(words):
+            await anext(stream)
+        free = slots_free(gw)
+        await stream.aclose()
+        return free
+
+    assert asyncio.run(main()) == 1
+
+
+def test_async_calls_wait_for_a_slot():
+    gw = gateway(SlowModel(latency_ms=100), max_concurrency=1)
+
+    async def main():
+        started = time.perf_counter()
+        await asyncio.gather(gw.ainvoke("first"), gw.ainvoke("second"))
+        return time.perf_counter() - started
+
+    assert asyncio.run(main()) >= 0.2
+    assert slots_free(gw) == 1
+
+
+def test_async_slot_timeout():
+    gw = gateway(FakeChatModel(latency_ms=0), max_concurrency=1, timeout=0.05)
+    gw._slots.acquire()
+    with pytest.raises(TimeoutError):
+        asyncio.run(gw.ainvoke(PROMPT))
+    gw._slots.release()
+    assert slots_free(gw) == 1
+
+
+def test_cancelled_wait_gives_the_slot_back():
+    gw = gateway(FakeChatModel(latency_ms=0), max_concurrency=1, timeout=5)
+    gw._slots.acquire()
+
+    async def main():
+        task = asyncio.create_task(gw.ainvoke(PROMPT))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        gw._slots.release()  # the waiting thread now takes the slot, and hands it back
+        await asyncio.sleep(0.2)
+
+    asyncio.run(main())
+    assert slots_free(gw) == 1
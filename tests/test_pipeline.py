@@ -0,0 +1,158 @@
+"""
+agents/pipeline.py: the LangGraph pipeline with the database and the LLM
+replaced by stubs, so only the graph, the streaming and the async nodes run.
+"""
+import asyncio
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from agents import insight_generator, pipeline, query_executor
+from utils import event_loop
+
+PIECES = ["Pune ", "received ", "the most."]
+
+
+@pytest.fixture
+def stubbed_nodes(monkeypatch):
+    """
+    Stub SQL, query and chart nodes, and an LLM that writes PIECES. Each piece
+    waits until the previous one has been received (received.set()). Yields
+    the order of events.
+    """
+    events = []
+    received = threading.Event()
+    received.set()
+
+    def text_to_sql(state):
+        return {"sql_query": "SELECT 1"}
+
+    def query_executor(state):
+        return {"query_result": pd.DataFrame({"district_name": ["PUNE"], "total": [1.0]})}
+
+    def visualization(state):
+        return {"visualization": None}
+
+    def stream_text(prompt):
+        for text in PIECES:
+            events.append(("llm", text, received.wait(2)))
+            received.clear()
+            yield text
+
+    for nodes in (pipeline.SYNC_NODES, pipeline.ASYNC_NODES):
+        monkeypatch.setitem(nodes, "text_to_sql", text_to_sql)
+        monkeypatch.setitem(nodes, "query_executor", query_executor)
+        monkeypatch.setitem(nodes, "visualization", visualization)
+    monkeypatch.setattr(insight_generator, "stream_text", stream_text)
+    return events, received
+
+
+def test_insights_stream_as_they_are_written(stubbed_nodes):
+    events, received = stubbed_nodes
+    graph = pipeline.build_graph(use_async=False)
+    final = {}
+    for mode, chunk in graph.stream({"messages": ["Which district got the most?"]},
+                                    stream_mode=["updates", "custom"]):
+        if mode == "custom":
+            events.append(("custom", chunk["insights"]))
+            received.set()
+        else:
+            for node, update in chunk.items():
+                events.append(("update", node))
+                final.update(update or {})
+
+    assert final["insights"] == "".join(PIECES)
+    # Every piece was written only after the previous one reached the caller
+    assert [event[2] for event in events if event[0] == "llm"] == [True] * len(PIECES)
+    order = [event for event in events if event[0] != "llm"]
+    assert order[:2] == [("update", "text_to_sql"), ("update", "query_executor")]
+    assert [event[1] for event in order if event[0] == "custom"] == PIECES
+    assert order.index(("update", "insights")) > order.index(("custom", PIECES[-1]))
+
+
+def test_insights_agent_without_a_graph(monkeypatch):
+    monkeypatch.setattr(insight_generator, "stream_text", lambda prompt: iter(PIECES))
+    assert insight_generator.insights_agent({"messages": ["q"], "query_result": None}) == {
+        "insights": "".join(PIECES)}
+
+
+# ---------------- Async graph ----------------
+def test_chart_built_while_insights_stream(stubbed_nodes, monkeypatch):
+    """The visualization node finishes while the insights node is still waiting on the LLM."""
+    chart_done = asyncio.Event()
+    seen = []
+
+    async def visualization(state):
+        chart_done.set()
+        return {"visualization": None}
+
+    async def astream_text(prompt):
+        yield PIECES[0]
+        seen.append(await asyncio.wait_for(chart_done.wait(), 2))
+        for text in PIECES[1:]:
+            yield text
+
+    monkeypatch.setitem(pipeline.ASYNC_NODES, "visualization", visualization)
+    monkeypatch.setattr(insight_generator, "astream_text", astream_text)
+
+    async def run():
+        graph = pipeline.build_graph(use_async=True)
+        return await graph.ainvoke({"messages": ["Which district got the most?"]})
+
+    final = asyncio.run(run())
+    assert seen == [True]
+    assert final["insights"] == "".join(PIECES) and final["visualization"] is None
+
+
+def test_blocking_nodes_run_in_worker_threads(monkeypatch):
+    threads = []
+
+    def query_executor_agent(state):
+        threads.append(threading.current_thread())
+        return {"query_result": None}
+
+    monkeypatch.setattr(query_executor, "query_executor_agent", query_executor_agent)
+    assert asyncio.run(query_executor.aquery_executor_agent({})) == {"query_result": None}
+    assert threads and threads[0] is not threading.main_thread()
+
+
+# ---------------- Shared event loop ----------------
+def test_sessions_share_one_loop():
+    loops, threads = [], []
+
+    async def session():
+        loops.append(asyncio.get_running_loop())
+        await asyncio.sleep(0.3)
+        return threading.current_thread().name
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=lambda: threads.append(event_loop.run(session()))) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert time.perf_counter() - started < 1.0  # the four sleeps overlapped
+    assert len(loops) == 4 and all(loop is event_loop.get_loop() for loop in loops)
+    assert threads == ["async-pipeline"] * 4
+
+
+def test_iterate_yields_as_produced():
+    async def numbers():
+        for i in range(3):
+            await asyncio.sleep(0.01)
+            yield i
+
+    assert list(event_loop.iterate(numbers())) == [0, 1, 2]
+
+
+def test_iterate_raises_the_generator_error():
+    async def failing():
+        yield 1
+        raise ValueError("boom")
+
+    items = event_loop.iterate(failing())
+    assert next(items) == 1
+    with pytest.raises(ValueError, match="boom"):
+        next(items)
@@ -0,0 +1,134 @@
+from contextlib import contextmanager
+
+import pandas as pd
+
+import pytest
+
+from agents import query_executor
+from utils import db
+
+
+@pytest.fixture
+def broken_database(monkeypatch):
+    """db.connection failing with a pool timeout; yields the list of attempts."""
+    attempts = []
+
+    @contextmanager
+    def connection(*args, **kwargs):
+        attempts.append(1)
+        raise db.PoolTimeout("no connection")
+        yield
+
+    monkeypatch.setattr(db, "connection", connection)
+    monkeypatch.setattr(db, "_data_version", {"value": None, "checked_at": None, "error": None})
+    monkeypatch.setattr(query_executor, "db", db)
+    return attempts
+
+
+def test_data_version_failure_is_cached(broken_database, monkeypatch, capsys):
+    monkeypatch.setattr(db, "DATA_VERSION_TTL", 60)
+    for _ in range(5):
+        assert query_executor.data_version() is None
+    assert len(broken_database) == 1
+    assert capsys.readouterr().out.count("[WARN]") == 1
+
+
+def test_data_version_retried_after_ttl(broken_database, monkeypatch):
+    monkeypatch.setattr(db, "DATA_VERSION_TTL", 0)
+    for _ in range(3):
+        with pytest.raises(db.PoolTimeout):
+            db.data_version()
+    assert len(broken_database) == 3
+
+
+def test_no_sql_query():
+    assert query_executor.query_executor_agent({}) == {"query_result": "No SQL query provided."}
+
+
+def test_rejected_sql_is_not_run():
+    update = query_executor.query_executor_agent({"sql_query": "DELETE FROM pmayg_state"})
+    assert "Only SELECT" in update["query_result"]["error"]
+    assert update["result_key"] is None
+
+
+# ---------------- Columnar results ----------------
+class BatchCursor:
+    """A DB-API cursor over rows, recording the size of each fetchmany() call."""
+
+    def __init__(self, rows, columns=("n", "name")):
+        self.rows = list(rows)
+        self.description = [(c,) for c in columns]
+        self.requests = []
+
+    def fetchmany(self, size):
+        self.requests.append(size)
+        batch, self.rows = self.rows[:size], self.rows[size:]
+        return batch
+
+
+def test_fetch_frame_in_batches():
+    cursor = BatchCursor([(i, f"p{i}") for i in range(25)])
+    df, truncated = db.fetch_frame(cursor, batch_size=10)
+    assert not truncated
+    assert list(df.columns) == ["n", "name"] and list(df["n"]) == list(range(25))
+    assert cursor.requests == [10, 10, 10, 10]
+
+
+def test_fetch_frame_stops_past_the_cap():
+    cursor = BatchCursor([(i, f"p{i}") for i in range(100)])
+    df, truncated = db.fetch_frame(cursor, max_rows=15, batch_size=10)
+    assert truncated and len(df) == 15 and df["n"].iloc[-1] == 14
+    assert cursor.requests == [10, 6]  # one row past the cap, nothing more
+
+
+def test_fetch_frame_at_the_cap_is_not_truncated():
+    df, truncated = db.fetch_frame(BatchCursor([(i, "p") for i in range(15)]), max_rows=15, batch_size=10)
+    assert not truncated and len(df) == 15
+
+
+def test_fetch_frame_empty_result_keeps_columns():
+    df, truncated = db.fetch_frame(BatchCursor([]), max_rows=15)
+    assert df.empty and list(df.columns) == ["n", "name"] and not truncated
+
+
+@pytest.fixture
+def postgres(monkeypatch):
+    try:
+        db.query_df("SELECT 1")
+    except db.Error as e:
+        pytest.skip(f"PostgreSQL unavailable: {e}".strip())
+    monkeypatch.setattr(query_executor, "db", db)
+    monkeypatch.setattr(query_executor, "CACHE_ENABLED", False)
+    monkeypatch.setattr(query_executor, "remember_sql", lambda state: None)
+
+
+def test_executor_returns_a_dataframe(postgres):
+    update = query_executor.query_executor_agent(
+        {"sql_query": "SELECT g AS n, 'p' || g AS name FROM generate_series(1, 20) g"})
+    result = update["query_result"]
+    assert isinstance(result, pd.DataFrame)
+    assert list(result.columns) == ["n", "name"] and len(result) == 20
+    assert update["query_truncated"] is False and update["result_source"] == "db"
+
+
+def test_executor_truncates_at_the_row_cap(postgres, monkeypatch):
+    monkeypatch.setattr(query_executor, "MAX_RESULT_ROWS", 5)
+    update = query_executor.query_executor_agent({"sql_query": "SELECT g AS n FROM generate_series(1, 20) g"})
+    assert list(update["query_result"]["n"]) == [1, 2, 3, 4, 5]
+    assert update["query_truncated"] is True
+
+
+def test_stages_share_the_result(monkeypatch):
+    from agents import insight_generator, visualization_agent
+
+    df = pd.DataFrame({"state_name": ["A", "B"], "total": [1.0, 2.0]})
+    snapshot = df.copy()
+    seen = []
+    monkeypatch.setattr(insight_generator, "summarize_result", lambda result, **kwargs: seen.append(result) or "")
+    monkeypatch.setattr(visualization_agent, "build_figure", lambda result: seen.append(result))
+    monkeypatch.setattr(visualization_agent, "CACHE_ENABLED", False)
+    state = {"messages": ["q"], "query_result": df}
+    insight_generator.insights_prompt(state)
+    visualization_agent.visualization_agent(state)
+    assert len(seen) == 2 and all(result is df for result in seen)
+    pd.testing.assert_frame_equal(df, snapshot)
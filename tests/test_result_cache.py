@@ -0,0 +1,156 @@
+from contextlib import nullcontext
+
+import pandas as pd
+import pytest
+
+from agents import query_executor
+from utils.result_cache import ResultCache, canonical_sql, frame_size, sql_fingerprint
+
+
+def frame(n, value=0.0):
+    return pd.DataFrame({"n": range(n), "amount": [value] * n})
+
+
+def test_canonical_sql():
+    assert canonical_sql("SELECT  x\nFROM t -- note\n;") == canonical_sql("select x /* why */ from t")
+    assert sql_fingerprint("SELECT 1 FROM t WHERE s = 'PUNE'") != sql_fingerprint("SELECT 1 FROM t WHERE s = 'pune'")
+
+
+def test_hit_and_miss():
+    cache = ResultCache()
+    df = frame(3)
+    assert cache.get("SELECT n FROM t", "v1") is None
+    cache.put("SELECT n FROM t", "v1", df, truncated=True)
+    result, truncated = cache.get("select n from t;", "v1")
+    assert result is df and truncated
+    assert cache.stats["memory_hits"] == 1 and cache.stats["misses"] == 1
+    assert cache.hit_rate() == 0.5
+
+
+def test_new_version_drops_old_results():
+    cache = ResultCache()
+    cache.put("SELECT n FROM t", "v1", frame(3))
+    assert cache.get("SELECT n FROM t", "v2") is None
+    assert cache.get("SELECT n FROM t", "v1") is None  # gone, not kept alongside
+    assert cache.bytes == 0
+
+
+def test_lru_eviction_by_size():
+    size = frame_size(frame(100))
+    cache = ResultCache(max_bytes=size * 2, spill=False)
+    for sql in ("SELECT 1", "SELECT 2"):
+        cache.put(sql, "v1", frame(100))
+    cache.get("SELECT 1", "v1")  # now the most recently used
+    cache.put("SELECT 3", "v1", frame(100))
+    assert cache.get("SELECT 2", "v1") is None
+    assert cache.get("SELECT 1", "v1") is not None and cache.get("SELECT 3", "v1") is not None
+    assert cache.stats["evictions"] == 1 and cache.bytes <= cache.max_bytes
+
+
+def test_too_large_for_memory_is_not_kept():
+    cache = ResultCache(max_bytes=frame_size(frame(10)), spill=False)
+    cache.put("SELECT big", "v1", frame(1000))
+    assert cache.get("SELECT big", "v1") is None and cache.bytes == 0
+
+
+def test_evicted_results_spill_to_disk(tmp_path):
+    size = frame_size(frame(100))
+    cache = ResultCache(max_bytes=size, spill=True, spill_dir=str(tmp_path))
+    cache.put("SELECT 1", "v1", frame(100, 1.0))
+    cache.put("SELECT 2", "v1", frame(100, 2.0))
+    cache.put("SELECT big", "v1", frame(1000, 3.0))
+    assert cache.stats["spills"] == 2
+    df, _ = cache.get("SELECT 1", "v1")
+    assert cache.stats["disk_hits"] == 1 and df["amount"].iloc[0] == 1.0
+    df, _ = cache.get("SELECT big", "v1")
+    assert len(df) == 1000
+
+
+def test_spilled_results_survive_a_restart_of_the_same_version(tmp_path):
+    size = frame_size(frame(100))
+    cache = ResultCache(max_bytes=size, spill=True, spill_dir=str(tmp_path))
+    cache.put("SELECT 1", "v1", frame(100, 1.0))
+    cache.put("SELECT 2", "v1", frame(100, 2.0))
+
+    restarted = ResultCache(max_bytes=size, spill=True, spill_dir=str(tmp_path))
+    assert restarted.get("SELECT 1", "v1")[0]["amount"].iloc[0] == 1.0
+    restarted.get("SELECT 1", "v2")
+    assert ResultCache(spill=True, spill_dir=str(tmp_path)).get("SELECT 1", "v1") is None
+
+
+def test_spill_directory_is_bounded(tmp_path):
+    size = frame_size(frame(100))
+    cache = ResultCache(max_bytes=1, spill=True, spill_dir=str(tmp_path), spill_bytes=size * 2)
+    for i in range(5):
+        cache.put(f"SELECT {i}", "v1", frame(100))
+    assert len(list(tmp_path.rglob("*.pkl"))) < 5
+    assert cache.get("SELECT 0", "v1") is None and cache.get("SELECT 4", "v1") is not None
+
+
+def test_invalidate(tmp_path):
+    cache = ResultCache(max_bytes=1, spill=True, spill_dir=str(tmp_path))
+    cache.put("SELECT 1", "v1", frame(10))
+    cache.invalidate()
+    assert cache.get("SELECT 1", "v1") is None
+    assert not list(tmp_path.rglob("*.pkl"))
+
+
+# ---------------- In front of the executor ----------------
+@pytest.fixture
+def database(monkeypatch):
+    """The executor on a fake database at version 'v1'; yields the state and the SQL it runs."""
+    state = {"version": "v1", "queries": []}
+
+    class Cursor:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+    class Connection:
+        def cursor(self, name=None):
+            return Cursor()
+
+    class FakeDB:
+        Error = RuntimeError
+
+        @staticmethod
+        def data_version():
+            return state["version"]
+
+        @staticmethod
+        def connection():
+            return nullcontext(Connection())
+
+        @staticmethod
+        def execute(cursor, sql, params=None):
+            state["queries"].append(sql)
+
+        @staticmethod
+        def fetch_frame(cursor, max_rows=None):
+            return frame(3, float(len(state["queries"]))), False
+
+    monkeypatch.setattr(query_executor, "db", FakeDB)
+    monkeypatch.setattr(query_executor, "CACHE_ENABLED", True)
+    monkeypatch.setattr(query_executor, "COST_GUARD", False)
+    monkeypatch.setattr(query_executor, "result_cache", ResultCache(spill=False))
+    monkeypatch.setattr(query_executor, "remember_sql", lambda state: None)
+    return state
+
+
+def test_repeated_query_skips_the_database(database):
+    first = query_executor.query_executor_agent({"sql_query": "SELECT n FROM pmayg_state"})
+    second = query_executor.query_executor_agent({"sql_query": "select n  from pmayg_state"})
+    assert len(database["queries"]) == 1
+    assert first["result_source"] == "db" and second["result_source"] == "cache"
+    assert second["query_result"] is first["query_result"]
+    assert second["result_key"] == first["result_key"] and first["result_key"].startswith("v1:")
+
+
+def test_new_data_version_queries_again(database):
+    query_executor.query_executor_agent({"sql_query": "SELECT n FROM pmayg_state"})
+    database["version"] = "v2"
+    update = query_executor.query_executor_agent({"sql_query": "SELECT n FROM pmayg_state"})
+    assert update["result_source"] == "db" and len(database["queries"]) == 2
+    assert update["result_key"].startswith("v2:")
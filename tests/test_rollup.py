@@ -0,0 +1,145 @@
+"""
+pmayg_rollup and the wide tables, as db/setup.py refreshes them. Runs against
+a scratch database loaded from generated workbooks (see conftest.py), in
+which every parent row is the sum of its children; skipped without PostgreSQL.
+"""
+import json
+
+import pandas as pd
+import pytest
+
+from agents import text_to_sql
+from db import setup
+from few_shot_examples.examples import examples
+from tests.test_setup import change_sheet
+
+
+@pytest.fixture
+def loaded(scratch_database, workbooks):
+    setup.main(excel_dir=str(workbooks))
+    return scratch_database()
+
+
+def frame(conn, sql, params=None):
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        return pd.DataFrame(cursor.fetchall(), columns=[c.name for c in cursor.description])
+
+
+def test_parent_rows_sum_their_children(loaded):
+    rollup = frame(loaded, """SELECT geo_level, amount::float, children_amount::float FROM pmayg_rollup
+                              WHERE indicator_type = 'beneficiary' AND geo_level IN ('district', 'block')""")
+    assert len(rollup) == (4 + 8) * 5
+    assert rollup["children_amount"].to_numpy() == pytest.approx(rollup["amount"].to_numpy())
+
+
+def test_state_beneficiaries_come_from_districts(loaded):
+    state = frame(loaded, """SELECT geo_name, indicator, amount, children_amount::float FROM pmayg_rollup
+                             WHERE geo_level = 'state' AND indicator_type = 'beneficiary'""")
+    assert state["amount"].isna().all()  # the state workbook only reports fund flows
+    districts = frame(loaded, """SELECT state_name AS geo_name, indicator, SUM(amount)::float AS total
+                                 FROM pmayg_rollup WHERE geo_level = 'district'
+                                 GROUP BY state_name, indicator""")
+    merged = state.merge(districts, on=["geo_name", "indicator"])
+    assert len(merged) == 2 * 5
+    assert merged["children_amount"].to_numpy() == pytest.approx(merged["total"].to_numpy())
+
+
+def test_panchayat_rows_match_the_facts(loaded):
+    with loaded.cursor() as cursor:
+        cursor.execute("SELECT count(*), sum(amount) FROM pmayg_fund_fact WHERE panchayat_id IS NOT NULL")
+        facts = cursor.fetchone()
+        cursor.execute("""SELECT count(*), sum(amount) FROM pmayg_rollup
+                          WHERE geo_level = 'panchayat' AND children_amount IS NULL""")
+        assert cursor.fetchone() == facts
+
+
+def test_rows_carry_their_ancestors(loaded):
+    blocks = frame(loaded, """SELECT DISTINCT r.geo_name, r.district_name, r.state_name, d.name AS district,
+                                     s.name AS state
+                              FROM pmayg_rollup r
+                              JOIN pmayg_block b ON b.block_id = r.geo_id
+                              JOIN pmayg_district d ON d.district_id = b.district_id
+                              JOIN pmayg_state s ON s.state_id = d.state_id
+                              WHERE r.geo_level = 'block'""")
+    assert len(blocks) == 8
+    assert (blocks["district_name"] == blocks["district"]).all() and (blocks["state_name"] == blocks["state"]).all()
+
+
+def test_wide_tables_pivot_the_rollup(loaded):
+    wide = frame(loaded, "SELECT state_name, total::float, released_total FROM pmayg_state_wide")
+    districts = frame(loaded, "SELECT state_name, SUM(total)::float AS districts FROM pmayg_district_wide "
+                              "GROUP BY state_name")
+    merged = wide.merge(districts, on="state_name")
+    assert len(merged) == 2 and merged["released_total"].notna().all()
+    assert merged["total"].to_numpy() == pytest.approx(merged["districts"].to_numpy())
+
+
+def test_refreshed_after_an_incremental_load(loaded, workbooks):
+    path = sorted(workbooks.glob("04_*.xlsx"))[0]
+    panchayat = pd.read_excel(path).loc[1, "Panchayat Name"]
+    change_sheet(path, SC=1000.0)
+    setup.main(incremental=True, excel_dir=str(workbooks))
+    with loaded.cursor() as cursor:
+        cursor.execute("""SELECT amount FROM pmayg_panchayat_wide w
+                          JOIN pmayg_rollup r ON r.geo_level = 'panchayat' AND r.geo_id = w.panchayat_id
+                          WHERE w.panchayat_name = %s AND r.indicator = 'SC'""", (panchayat,))
+        assert cursor.fetchone()[0] == 1000
+        cursor.execute("SELECT sc FROM pmayg_panchayat_wide WHERE panchayat_name = %s", (panchayat,))
+        assert cursor.fetchone()[0] == 1000
+        cursor.execute("SELECT refreshed_at IS NOT NULL FROM pmayg_report")
+        assert cursor.fetchone()[0]
+
+
+def test_examples_read_the_rollup():
+    for ex in examples:
+        assert "pmayg_fund_fact" not in ex["sql"], ex["query"]
+        assert "pmayg_rollup" in ex["sql"] or "_wide" in ex["sql"], ex["query"]
+
+
+# ---------------- Wide tables ----------------
+WIDE_COLUMNS = {"sc": "SC", "st": "ST", "minority": "Minority", "others": "Others", "total": "Total"}
+LEVELS = ["state", "district", "block", "panchayat"]
+
+
+@pytest.mark.parametrize("level, places", [("state", 2), ("district", 4), ("block", 8), ("panchayat", 24)])
+def test_one_wide_row_per_place(loaded, level, places):
+    wide = frame(loaded, f"SELECT * FROM pmayg_{level}_wide")
+    assert len(wide) == places and wide[f"{level}_id"].is_unique
+    names = [f"{ancestor}_name" for ancestor in LEVELS[:LEVELS.index(level) + 1]]
+    assert wide[names].notna().all().all()
+
+
+def test_wide_columns_are_the_rollup_amounts(loaded):
+    wide = frame(loaded, "SELECT * FROM pmayg_panchayat_wide")
+    rollup = frame(loaded, """SELECT geo_id AS panchayat_id, indicator, amount::float FROM pmayg_rollup
+                              WHERE geo_level = 'panchayat'""")
+    rollup = rollup.pivot(index="panchayat_id", columns="indicator", values="amount")
+    wide = wide.set_index("panchayat_id").loc[rollup.index]
+    for column, indicator in WIDE_COLUMNS.items():
+        assert wide[column].astype(float).to_numpy() == pytest.approx(rollup[indicator].to_numpy()), column
+
+
+def test_wide_lookups_use_an_index(loaded):
+    with loaded.cursor() as cursor:
+        cursor.execute("SET enable_seqscan = off")
+        for sql in ("SELECT total FROM pmayg_block_wide WHERE district_name = 'X'",
+                    "SELECT sc FROM pmayg_panchayat_wide WHERE block_name = 'X'",
+                    "SELECT released_total FROM pmayg_state_wide WHERE state_name = 'X'"):
+            cursor.execute("EXPLAIN (FORMAT JSON) " + sql)
+            plan = json.dumps(cursor.fetchone()[0])
+            assert "Seq Scan" not in plan and "idx_" in plan, sql
+
+
+def test_schema_describes_the_wide_tables():
+    for level in LEVELS:
+        described = text_to_sql.SCHEMA_TABLES[f"pmayg_{level}_wide"]
+        assert f"{level}_name TEXT" in described
+        assert all(f"{column} NUMERIC" in described for column in WIDE_COLUMNS)
+
+
+def test_wide_examples_need_no_joins():
+    wide = [ex for ex in examples if "_wide" in ex["sql"]]
+    assert len(wide) >= 4
+    for ex in wide:
+        assert " join " not in ex["sql"].lower() and "pmayg_indicator" not in ex["sql"], ex["query"]
@@ -0,0 +1,58 @@
+"""
+db/schema.sql: the derived geography level of pmayg_fund_fact and the indexes
+the example queries are planned with. Runs against a scratch database loaded
+from the bundled workbooks (see conftest.py); skipped without PostgreSQL.
+"""
+import pytest
+
+from db import check_indexes, setup
+from few_shot_examples.examples import examples
+
+
+@pytest.fixture
+def loaded(scratch_database):
+    setup.main()
+    return scratch_database()
+
+
+def test_geo_level_is_derived(loaded):
+    with loaded.cursor() as cursor:
+        cursor.execute("""SELECT geo_level, count(*) FILTER (WHERE state_id IS NOT NULL),
+                                 count(*) FILTER (WHERE district_id IS NOT NULL),
+                                 count(*) FILTER (WHERE block_id IS NOT NULL),
+                                 count(*) FILTER (WHERE panchayat_id IS NOT NULL), count(*)
+                          FROM pmayg_fund_fact GROUP BY geo_level ORDER BY geo_level""")
+        rows = {level: counts for level, *counts in cursor.fetchall()}
+    assert sorted(rows) == ["block", "district", "panchayat", "state"]
+    for position, level in enumerate(("state", "district", "block", "panchayat")):
+        total = rows[level][-1]
+        assert total and rows[level][position] == total
+
+
+def test_example_queries_use_indexes(loaded):
+    with loaded.cursor() as cursor:
+        cursor.execute("SET enable_seqscan = off")
+        failures = []
+        for ex in examples:
+            cursor.execute("EXPLAIN (FORMAT JSON) " + ex["sql"])
+            scans = check_indexes.fact_scans(cursor.fetchone()[0][0]["Plan"])
+            if not check_indexes.uses_indexes(scans):
+                failures.append((ex["query"], scans))
+    assert failures == []
+
+
+@pytest.mark.parametrize("level", ["state", "district", "block", "panchayat"])
+def test_fact_lookup_by_place_uses_its_level_index(loaded, level):
+    with loaded.cursor() as cursor:
+        cursor.execute("SET enable_seqscan = off")
+        cursor.execute(f"EXPLAIN (FORMAT JSON) SELECT amount FROM pmayg_fund_fact "
+                       f"WHERE {level}_id = 1 AND indicator_id = 1")
+        scans = check_indexes.fact_scans(cursor.fetchone()[0][0]["Plan"])
+    assert [indexes for _, _, indexes, _ in scans] == [[f"idx_fund_fact_{level}"]]
+
+
+def test_whole_wide_table_read_is_accepted():
+    assert check_indexes.uses_indexes([("pmayg_block_wide", "Seq Scan", [], False)])
+    assert not check_indexes.uses_indexes([("pmayg_block_wide", "Seq Scan", [], True)])
+    assert not check_indexes.uses_indexes([("pmayg_fund_fact", "Seq Scan", [], False)])
+    assert not check_indexes.uses_indexes([])
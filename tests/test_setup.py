@@ -0,0 +1,196 @@
+"""
+db/setup.py: the bulk fact loader. The load tests run db/setup.py against a
+scratch database (see conftest.py) and are skipped without PostgreSQL.
+"""
+import pandas as pd
+import pytest
+
+from db import setup
+
+
+class CopyCursor:
+    """Records what copy_expert() was given."""
+
+    def __init__(self):
+        self.copies = []
+
+    def copy_expert(self, sql, buf):
+        self.copies.append((sql, buf.read()))
+
+
+def count(conn, sql, params=None):
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchone()[0]
+
+
+def change_sheet(path, **values):
+    """Rewrite a workbook with columns of its first place (the row after 'Total') set to values."""
+    df = pd.read_excel(path)
+    for column, value in values.items():
+        df.loc[1, column] = value
+    df.to_excel(path, index=False)
+
+
+def test_to_long_facts():
+    sheet = pd.DataFrame({"Block Name": ["KHED", "HAVELI"], "SC": [1.5, None], "Total": [3.0, 4.0],
+                          "Remarks": ["x", "y"]})
+    facts = setup.to_long_facts(sheet, "Block Name", {"KHED": 7, "HAVELI": 8}, {"SC": 1, "Total": 5})
+    assert list(facts.columns) == ["geo_id", "indicator_id", "amount"]
+    assert facts.fillna(-1).values.tolist() == [[7, 1, 1.5], [8, 1, -1], [7, 5, 3.0], [8, 5, 4.0]]
+
+
+def test_copy_facts_streams_csv():
+    cursor = CopyCursor()
+    facts = pd.DataFrame({"geo_id": [7, 8], "indicator_id": [1, 1], "amount": [1.5, None]})
+    assert setup.copy_facts(cursor, 3, "block_id", facts) == 2
+    sql, data = cursor.copies[0]
+    assert sql.startswith("COPY pmayg_fund_fact (report_id, block_id, indicator_id, amount) FROM STDIN")
+    assert data.splitlines() == ["3,7,1,1.5", "3,8,1,"]
+
+
+def test_copy_facts_skips_empty_sheets():
+    cursor = CopyCursor()
+    assert setup.copy_facts(cursor, 3, "block_id", pd.DataFrame(columns=["geo_id", "indicator_id", "amount"])) == 0
+    assert cursor.copies == []
+
+
+def test_full_load(scratch_database, generated_workbooks, capsys):
+    excel_dir, counts = generated_workbooks
+    setup.main(excel_dir=str(excel_dir))
+    conn = scratch_database()
+    assert count(conn, "SELECT count(*) FROM pmayg_fund_fact") == counts["facts"]
+    assert count(conn, "SELECT count(*) FROM pmayg_panchayat") == 2 * 2 * 2 * 3
+    assert count(conn, "SELECT count(DISTINCT report_id) FROM pmayg_fund_fact") == 1
+    out = capsys.readouterr().out
+    for level in ("States", "Districts", "Blocks", "Panchayats"):
+        assert f"[INFO] {level}: " in out and "rows/sec" in out
+
+
+def test_fact_amounts_match_the_sheet(scratch_database, generated_workbooks):
+    excel_dir, _ = generated_workbooks
+    setup.main(excel_dir=str(excel_dir))
+    sheet = pd.read_excel(excel_dir / "01_states.xlsx")
+    sheet = sheet[sheet["State Name"] != "Total"]
+    conn = scratch_database()
+    with conn.cursor() as cursor:
+        cursor.execute("""SELECT s.name, f.amount FROM pmayg_fund_fact f
+                          JOIN pmayg_state s USING (state_id)
+                          JOIN pmayg_indicator i USING (indicator_id)
+                          WHERE i.name = 'Released_Total'""")
+        loaded = dict(cursor.fetchall())
+    assert {name: float(amount) for name, amount in loaded.items()} == pytest.approx(
+        dict(zip(sheet["State Name"], sheet["Released_Total"])))
+
+
+def test_failed_level_is_rolled_back(scratch_database, workbooks, monkeypatch):
+    setup.main(excel_dir=str(workbooks))
+    conn = scratch_database()
+    before = count(conn, "SELECT count(*) FROM pmayg_fund_fact")
+
+    def copy_facts(cursor, report_id, geo_col, facts):
+        if geo_col == "block_id":
+            raise RuntimeError("COPY failed")
+        return original(cursor, report_id, geo_col, facts)
+
+    original = setup.copy_facts
+    monkeypatch.setattr(setup, "copy_facts", copy_facts)
+    for path in workbooks.glob("0[34]_*.xlsx"):
+        df = pd.read_excel(path)
+        change_sheet(path, SC=99.0)
+    with pytest.raises(RuntimeError):
+        setup.main(incremental=True, excel_dir=str(workbooks))
+    assert count(conn, "SELECT count(*) FROM pmayg_fund_fact") == before
+    assert count(conn, "SELECT count(*) FROM pmayg_fund_fact WHERE block_id IS NOT NULL") > 0
+
+
+# ---------------- Incremental loads ----------------
+def facts_by_id(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT fact_id, amount FROM pmayg_fund_fact")
+        return dict(cursor.fetchall())
+
+
+def loaded_files(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT file_name, loaded_at FROM pmayg_source_file")
+        return dict(cursor.fetchall())
+
+
+def test_check_file(workbooks, monkeypatch):
+    monkeypatch.setattr(setup, "EXCEL_FOLDER", str(workbooks))
+    path = workbooks / "01_states.xlsx"
+    changed, content_hash, mtime = setup.check_file({}, "01_states.xlsx")
+    assert changed
+    fingerprints = {"01_states.xlsx": (content_hash, mtime)}
+    assert setup.check_file(fingerprints, "01_states.xlsx") == (False, content_hash, mtime)
+
+    path.touch()  # same content, new mtime
+    changed, same_hash, _ = setup.check_file(fingerprints, "01_states.xlsx")
+    assert not changed and same_hash == content_hash
+
+    change_sheet(path, Released_Total=1.0)
+    assert setup.check_file(fingerprints, "01_states.xlsx")[0]
+
+
+def test_unchanged_files_are_skipped(scratch_database, workbooks, capsys):
+    setup.main(excel_dir=str(workbooks))
+    conn = scratch_database()
+    before = facts_by_id(conn)
+    capsys.readouterr()
+
+    setup.main(incremental=True, excel_dir=str(workbooks))
+    out = capsys.readouterr().out
+    assert "Parsed 0 changed workbook(s)" in out
+    assert "8 unchanged file(s) skipped" in out  # the panchayat workbooks
+    assert "Rollup refreshed" not in out
+    assert facts_by_id(conn) == before
+    assert count(conn, "SELECT count(*) FROM pmayg_report") == 1
+
+
+def test_only_changed_files_are_reloaded(scratch_database, workbooks):
+    setup.main(excel_dir=str(workbooks))
+    conn = scratch_database()
+    before, files = facts_by_id(conn), loaded_files(conn)
+    changed = sorted(workbooks.glob("04_*.xlsx"))[0]
+    block = changed.name.split("_")[1].upper()
+    change_sheet(changed, SC=12345.0)
+
+    setup.main(incremental=True, excel_dir=str(workbooks))
+    after = facts_by_id(conn)
+    with conn.cursor() as cursor:
+        cursor.execute("""SELECT f.fact_id FROM pmayg_fund_fact f
+                          JOIN pmayg_panchayat p ON p.panchayat_id = f.panchayat_id
+                          JOIN pmayg_block b ON b.block_id = p.block_id
+                          WHERE b.name = %s""", (block,))
+        reloaded = {fact_id for fact_id, in cursor.fetchall()}
+    assert len(reloaded) == 15 and not reloaded & set(before)  # the changed sheet's facts were replaced
+    untouched = {k: v for k, v in after.items() if k not in reloaded}
+    assert untouched == {k: v for k, v in before.items() if k in untouched}
+    assert len(after) == len(before)
+    assert count(conn, "SELECT count(*) FROM pmayg_fund_fact WHERE amount = 12345") == 1
+    assert {f for f, loaded_at in loaded_files(conn).items() if loaded_at != files[f]} == {changed.name}
+
+
+def test_new_places_are_upserted(scratch_database, workbooks):
+    setup.main(excel_dir=str(workbooks))
+    conn = scratch_database()
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT panchayat_id, name FROM pmayg_panchayat")
+        ids = dict(cursor.fetchall())
+    path = sorted(workbooks.glob("04_*.xlsx"))[0]
+    df = pd.read_excel(path)
+    pd.concat([df, df.iloc[1:2].assign(**{"Panchayat Name": "NEWGAON"})]).to_excel(path, index=False)
+
+    setup.main(incremental=True, excel_dir=str(workbooks))
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT panchayat_id, name FROM pmayg_panchayat")
+        after = dict(cursor.fetchall())
+    assert {k: v for k, v in after.items() if k in ids} == ids
+    assert set(after.values()) - set(ids.values()) == {"NEWGAON"}
+
+
+def test_incremental_on_an_empty_database(scratch_database, generated_workbooks):
+    excel_dir, counts = generated_workbooks
+    setup.main(incremental=True, excel_dir=str(excel_dir))
+    assert count(scratch_database(), "SELECT count(*) FROM pmayg_fund_fact") == counts["facts"]
@@ -0,0 +1,88 @@
+import pytest
+
+from utils.sql_cache import SQLCache
+from utils.tfidf import TfidfIndex
+
+SQL = "SELECT geo_name, amount FROM pmayg_rollup WHERE geo_level = 'district' AND geo_id = 1;"
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "sql_cache.sqlite")
+
+
+def test_exact_hit_from_memory_then_disk(path):
+    cache = SQLCache("v1", path)
+    assert cache.get("Total funds released in Pune district") == (None, None)
+    cache.put("Total funds released in Pune district", SQL)
+    assert cache.get("total funds released in pune district?") == (SQL, "memory")
+    assert SQLCache("v1", path).get("Total funds released in Pune district") == (SQL, "disk")
+
+
+def test_context_is_part_of_the_key(path):
+    cache = SQLCache("v1", path)
+    cache.put("Total funds released", SQL, context="district:1")
+    assert cache.get("Total funds released", context="district:1") == (SQL, "memory")
+    assert cache.get("Total funds released", context="district:2") == (None, None)
+
+
+def test_near_duplicate_hit(path):
+    cache = SQLCache("v1", path)
+    cache.put("Show the total funds released in Pune district", SQL)
+    assert cache.get("Show me the total funds released in Pune district") == (SQL, "similar")
+    assert cache.stats["similar_hits"] == 1
+
+
+@pytest.mark.parametrize("question", [
+    "Which blocks have funds released under 100 lakhs",    # a comparison word
+    "What blocks have funds released 100 lakhs",           # a different question word
+    "Which blocks have amount released 100 lakhs",         # amount is not the same as funds
+])
+def test_different_meaning_is_not_a_near_duplicate(path, question):
+    cache = SQLCache("v1", path, similarity=0.0)
+    cache.put("Which blocks have funds released 100 lakhs", SQL)
+    assert cache.get(question) == (None, None)
+
+
+def test_similarity_index_follows_puts(path):
+    cache = SQLCache("v1", path)
+    assert cache.get("Show total funds released in Pune") == (None, None)  # reads the (empty) index from disk
+    cache.put("Show total funds released in Pune", SQL)
+    cache._db().execute("DELETE FROM sql_cache")  # later lookups must not need the disk
+    assert cache.get("Please show total funds released in Pune") == (SQL, "similar")
+
+
+def test_similarity_index_is_read_from_disk(path):
+    SQLCache("v1", path).put("Show total funds released in Pune", SQL)
+    assert SQLCache("v1", path).get("Please show total funds released in Pune") == (SQL, "similar")
+
+
+def test_new_prompt_version_drops_entries(path):
+    SQLCache("v1", path).put("Total funds released in Pune district", SQL)
+    cache = SQLCache("v2", path)
+    assert cache.get("Total funds released in Pune district") == (None, None)
+    assert cache._db().execute("SELECT COUNT(*) FROM sql_cache").fetchone() == (0,)
+    assert SQLCache("v1", path).get("Total funds released in Pune district") == (None, None)
+
+
+def test_expired_entries_are_not_used(path):
+    cache = SQLCache("v1", path, ttl=-1)
+    cache.put("Total funds released in Pune district", SQL)
+    assert cache.get("Total funds released in Pune district") == (None, None)
+
+
+def test_invalidate(path):
+    cache = SQLCache("v1", path)
+    cache.put("Total funds released in Pune district", SQL)
+    cache.invalidate()
+    assert cache.get("Total funds released in Pune district") == (None, None)
+    assert cache.get("Please show total funds released in Pune district") == (None, None)
+
+
+def test_tfidf_add_matches_batch_build():
+    documents = ["total funds in pune", "blocks in pune district", "sc share of funds"]
+    built, added = TfidfIndex(documents), TfidfIndex(documents[:1])
+    added.search("pune")
+    for doc in documents[1:]:
+        added.add(doc)
+    assert added.search("funds in pune district") == built.search("funds in pune district")
@@ -0,0 +1,86 @@
+import pytest
+
+from utils.sql_validator import add_limit, has_limit, tokenize, validate_sql
+
+
+@pytest.mark.parametrize("sql", [
+    # Identifiers that contain a forbidden keyword
+    "SELECT state_name, updated_total FROM pmayg_state_wide",
+    "SELECT SUM(amount) AS updated_total FROM pmayg_fund_fact",
+    'SELECT "delete" FROM pmayg_state',
+    # Keywords inside strings and comments
+    "SELECT name FROM pmayg_state WHERE name = 'DROP TABLE pmayg_state'",
+    "SELECT name -- update later\nFROM pmayg_state",
+    "SELECT /* insert into */ name FROM pmayg_state",
+    "SELECT $$; DELETE FROM pmayg_state$$ AS note",
+    "SELECT $body$pg_sleep(10)$body$ AS note",
+    # Backslash escapes in E-strings
+    "SELECT name FROM pmayg_state WHERE name <> E'it\\'s'",
+    # CTEs and SUBSTRING ... FOR, which is not a locking clause
+    "WITH t AS (SELECT * FROM pmayg_state) SELECT * FROM t",
+    "SELECT substring(name FROM 1 FOR 3) FROM pmayg_state",
+])
+def test_accepts(sql):
+    assert validate_sql(sql) == sql
+
+
+@pytest.mark.parametrize("sql, message", [
+    ("SELECT 1; DROP TABLE pmayg_state", "Multiple statements"),
+    ("SELECT 1; SELECT 2;", "Multiple statements"),
+    ("SELECT pg_sleep(10)", "pg_sleep"),
+    ("SELECT * FROM pmayg_state WHERE pg_sleep ( 1 ) IS NULL", "pg_sleep"),
+    ("SELECT * INTO backup FROM pmayg_state", "INTO"),
+    ("SELECT * FROM pmayg_state FOR UPDATE", "UPDATE"),
+    ("SELECT * FROM pmayg_state FOR SHARE", "locking clause"),
+    ("SELECT * FROM pmayg_state FOR NO KEY UPDATE", "locking clause"),
+    ("DELETE FROM pmayg_state", "Only SELECT"),
+    ("WITH d AS (DELETE FROM pmayg_state RETURNING *) SELECT * FROM d", "DELETE"),
+    ("SELECT 'unterminated", "Unterminated"),
+    ("SELECT $$unterminated", "Unterminated"),
+    ("SELECT 1 /* unterminated", "Unterminated"),
+    ("SELECT (1", "Unbalanced"),
+    ("-- only a comment", "Empty"),
+])
+def test_rejects(sql, message):
+    with pytest.raises(ValueError, match=message):
+        validate_sql(sql)
+
+
+@pytest.mark.parametrize("sql, cleaned", [
+    ("SELECT 1;", "SELECT 1"),
+    ("SELECT 1 ;; \n", "SELECT 1"),
+    ("```sql\nSELECT 1;\n```", "SELECT 1"),
+    ("SELECT * FROM pmayg_fund_fact; -- all facts;", "SELECT * FROM pmayg_fund_fact"),
+    ("SELECT 1 /* one */ ; /* trailing */", "SELECT 1"),
+    ("SELECT 1 -- one\nFROM pmayg_state -- done", "SELECT 1 -- one\nFROM pmayg_state"),
+])
+def test_strips_trailing_semicolons_and_comments(sql, cleaned):
+    assert validate_sql(sql) == cleaned
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM pmayg_state LIMIT 5", True),
+    ("SELECT * FROM pmayg_state FETCH FIRST 5 ROWS ONLY", True),
+    ("SELECT * FROM (SELECT * FROM pmayg_state LIMIT 5) t", False),
+    ("SELECT 'limit 5' FROM pmayg_state", False),
+    ("SELECT * FROM pmayg_state -- limit 5", False),
+])
+def test_has_limit(sql, expected):
+    assert has_limit(sql) == expected
+
+
+def test_add_limit():
+    assert add_limit("SELECT * FROM pmayg_state", 10) == "SELECT * FROM pmayg_state\nLIMIT 10"
+    assert add_limit("SELECT * FROM pmayg_state LIMIT 5", 10) == "SELECT * FROM pmayg_state LIMIT 5"
+
+
+def test_add_limit_after_trailing_comment_is_one_statement():
+    sql = add_limit(validate_sql("SELECT * FROM pmayg_fund_fact; -- all facts;"), 10)
+    assert sql == "SELECT * FROM pmayg_fund_fact\nLIMIT 10"
+    assert validate_sql(sql) == sql
+    assert add_limit("SELECT * FROM pmayg_state -- all", 10) == "SELECT * FROM pmayg_state\nLIMIT 10"
+
+
+def test_tokenize_tracks_depth():
+    tokens = [t for t in tokenize("SELECT (a + (b)) FROM t") if t.kind != "ws"]
+    assert [(t.value, t.depth) for t in tokens if t.kind == "word"] == [("SELECT", 0), ("a", 1), ("b", 2), ("FROM", 0), ("t", 0)]
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from agents import summary_agent
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """summary_agent on a database with no pmayg_summary table; yields the state and the LLM prompts."""
+    state = {"version": "v1", "prompts": []}
+
+    def stream_text(prompt):
+        state["prompts"].append(prompt)
+        yield f"Summary of {state['version']}"
+
+    monkeypatch.setattr(summary_agent.db, "data_version", lambda: state["version"])
+    monkeypatch.setattr(summary_agent, "summary_table_exists", lambda: False)
+    monkeypatch.setattr(summary_agent, "query_db", lambda query, params=None: pd.DataFrame())
+    monkeypatch.setattr(summary_agent, "stream_text", stream_text)
+    monkeypatch.setattr(summary_agent, "_summaries", {})
+    return state
+
+
+def test_summary_generated_once_per_data_version(database):
+    assert summary_agent.stored_summary() is None
+    assert "".join(summary_agent.company_summary_stream()) == "Summary of v1"
+    assert summary_agent.stored_summary() == "Summary of v1"
+    assert "".join(summary_agent.company_summary_stream()) == "Summary of v1"
+    assert len(database["prompts"]) == 1
+
+
+def test_only_the_current_version_is_kept(database):
+    "".join(summary_agent.company_summary_stream())
+    database["version"] = "v2"
+    assert summary_agent.stored_summary() is None
+    assert "".join(summary_agent.company_summary_stream()) == "Summary of v2"
+    assert summary_agent._summaries == {"v2": "Summary of v2"}
+
+
+def test_summary_streamed_as_it_is_generated(database, monkeypatch):
+    written = []
+
+    def stream_text(prompt):
+        for text in ("Funds ", "were ", "released."):
+            written.append(text)
+            yield text
+
+    monkeypatch.setattr(summary_agent, "stream_text", stream_text)
+    stream = summary_agent.company_summary_stream()
+    assert next(stream) == "Funds " and written == ["Funds "]
+    assert list(stream) == ["were ", "released."]
+    assert summary_agent.stored_summary() == "Funds were released."
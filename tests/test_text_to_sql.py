@@ -0,0 +1,165 @@
+from contextlib import contextmanager
+
+import duckdb
+import pytest
+
+from agents import fast_path, text_to_sql
+from agents.text_to_sql import resolve_places
+from few_shot_examples.examples import examples
+from utils.geo_index import GEO_TABLES, GeoIndex
+
+CATEGORIES = ("SC", "ST", "Minority", "Others", "Total")
+
+
+@pytest.fixture
+def index():
+    index = GeoIndex()
+    index.add("state", 1, "MAHARASHTRA")
+    index.add("district", 1, "PUNE", 1)
+    index.add("block", 1, "KHED", 1)
+    index.add("panchayat", 1, "BHOSE", 1)
+    return index
+
+
+@pytest.fixture
+def rollup():
+    """An in-memory pmayg_rollup where, as in the loaded data, the state has only its children's sums."""
+    conn = duckdb.connect(":memory:")
+    conn.execute("""CREATE TABLE pmayg_rollup (geo_level TEXT, geo_id INT, geo_name TEXT, indicator TEXT,
+                    indicator_type TEXT, amount DOUBLE, children_amount DOUBLE)""")
+    rows = []
+    for i, indicator in enumerate(CATEGORIES):
+        rows.append(("state", 1, "MAHARASHTRA", indicator, "beneficiary", None, 100.0 * (i + 1)))
+        rows.append(("block", 1, "KHED", indicator, "beneficiary", 10.0 * (i + 1), 10.0 * (i + 1)))
+    rows.append(("state", 1, "MAHARASHTRA", "Released_Total", "fund_flow", 42.5, None))
+    conn.executemany("INSERT INTO pmayg_rollup VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+    yield conn
+    conn.close()
+
+
+def answer(question, index):
+    return fast_path.match(question, resolve_places(question, index), index)
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("How much fund has been released in Maharashtra?", "fund_flow"),
+    ("Which beneficiary category received the most funds in Pune district?", "top_category"),
+    ("Which beneficiary category received the least funds in Pune district?", "bottom_category"),
+    ("Compare fund allocation across beneficiary categories in Khed block", "categories"),
+    ("Compare fund allocation across blocks in Pune district", "children"),
+    ("Do the panchayat allocations in Khed block add up to the block total?", "reconcile"),
+])
+def test_template_questions(index, question, intent):
+    assert answer(question, index)[0] == intent
+
+
+@pytest.mark.parametrize("question", [
+    "Which district in Maharashtra has the most ST beneficiaries?",   # "st" is not template vocabulary
+    "Compare Pune and Khed",                                           # two places
+    "Which category received the most and the least funds in Khed block?",
+    "Which beneficiary category is most underrepresented and largest in Khed block?",
+])
+def test_other_questions_go_to_the_llm(index, question):
+    assert answer(question, index) is None
+
+
+def test_state_categories_use_children_sums(index, rollup):
+    intent, sql = answer("Which beneficiary category received the most funds in Maharashtra?", index)
+    assert intent == "top_category"
+    rows = rollup.execute(sql.rstrip(";")).fetchall()
+    assert rows[0] == ("Total", 500.0)
+    assert all(total > 0 for _, total in rows)
+
+
+def test_fund_flow_keeps_own_amount(index, rollup):
+    _, sql = answer("How much fund has been released in Maharashtra?", index)
+    assert rollup.execute(sql.rstrip(";")).fetchall() == [("Released_Total", 42.5)]
+
+
+@pytest.mark.parametrize("question, smallest_first", [
+    ("Which beneficiary category is most underrepresented in Khed block?", True),
+    ("Which beneficiary category is underrepresented in Khed block?", True),
+    ("Which beneficiary category is least underrepresented in Khed block?", False),
+])
+def test_underrepresented_order(index, rollup, question, smallest_first):
+    intent, sql = answer(question, index)
+    assert intent == ("bottom_category" if smallest_first else "top_category")
+    first = rollup.execute(sql.rstrip(";")).fetchone()
+    assert first == (("SC", 10.0) if smallest_first else ("Total", 50.0))
+
+
+@pytest.fixture
+def database(monkeypatch):
+    """text_to_sql's db with a settable data version and a geography of one state named after it."""
+    state = {"version": 1, "up": True, "loads": 0}
+
+    def data_version():
+        if not state["up"]:
+            raise text_to_sql.db.Error("database down")
+        return state["version"]
+
+    @contextmanager
+    def connection():
+        state["loads"] += 1
+        conn = duckdb.connect(":memory:")
+        for table, column, parent in GEO_TABLES.values():
+            conn.execute(f"CREATE TABLE {table} ({column} INT, name TEXT{f', {parent} INT' if parent else ''})")
+        conn.execute(f"INSERT INTO pmayg_state VALUES (1, 'STATE {state['version']}')")
+        yield conn
+        conn.close()
+
+    monkeypatch.setattr(text_to_sql.db, "data_version", data_version)
+    monkeypatch.setattr(text_to_sql.db, "connection", connection)
+    monkeypatch.setattr(text_to_sql, "_geo_index", {"index": None, "version": None})
+    return state
+
+
+def test_geo_index_follows_data_version(database):
+    first = text_to_sql.get_geo_index()
+    assert text_to_sql.get_geo_index() is first
+    assert database["loads"] == 1
+    database["version"] = 2
+    second = text_to_sql.get_geo_index()
+    assert database["loads"] == 2
+    assert second.get("state", 1).name == "STATE 2"
+
+
+def test_geo_index_kept_while_database_down(database):
+    database["up"] = False
+    assert text_to_sql.get_geo_index() is None
+    database["up"] = True
+    index = text_to_sql.get_geo_index()
+    database["up"], database["version"] = False, 2
+    assert text_to_sql.get_geo_index() is index
+
+
+# ---------------- Prompt ----------------
+def test_examples_retrieved_by_similarity():
+    for ex in examples[:5]:
+        selected = text_to_sql.select_examples(ex["query"], k=3)
+        assert len(selected) == 3 and selected[0] is ex
+
+
+def test_detect_levels(index):
+    assert text_to_sql.detect_levels("Compare blocks in Pune district", resolve_places(
+        "Compare blocks in Pune district", index)) == {"block", "district"}
+    assert text_to_sql.detect_levels("Which category got the most funds?", []) == set()
+
+
+def test_schema_pruned_to_the_levels_asked_about():
+    schema = text_to_sql.prune_schema({"district"})
+    tables = {line.split("(")[0].split()[-1] for line in schema.splitlines() if line.startswith("Table ")}
+    assert tables == {"pmayg_rollup", "pmayg_indicator", "pmayg_fund_fact", "pmayg_district_wide",
+                      "pmayg_state", "pmayg_district"}
+    assert text_to_sql.prune_schema(set()) == text_to_sql.SCHEMA
+
+
+def test_prompt_is_smaller_than_sending_everything(index):
+    question = "Compare fund allocation across blocks in Pune district"
+    places = resolve_places(question, index)
+    pruned = text_to_sql.build_prompt(question, places, k=3)
+    full = text_to_sql.build_prompt(question, places, k=len(examples), prune=False)
+    assert text_to_sql.SCHEMA in full and text_to_sql.SCHEMA not in pruned
+    assert pruned.count("\nQ: ") == 3 + 1 and len(pruned) < len(full)  # the examples and the question
+    schema = pruned.split("Database schema:")[1].split("Few-shot examples:")[0]
+    assert "pmayg_block_wide" in schema and "pmayg_panchayat_wide" not in schema
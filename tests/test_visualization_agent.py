@@ -0,0 +1,120 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from agents import visualization_agent
+from agents.visualization_agent import CHART_MAX_TRACES, CHART_TOP_N, build_figure, top_n_with_others
+from utils.figure_cache import FigureCache, result_fingerprint
+
+
+def panchayats(rows, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"panchayat_name": [f"GP {i}" for i in range(rows)],
+                         "total": rng.uniform(1, 100, rows).round(2)})
+
+
+# ---------------- Top N ----------------
+def test_small_results_are_kept_whole():
+    df = panchayats(CHART_TOP_N + 1)
+    assert top_n_with_others(df, "panchayat_name", ["total"]) is df
+
+
+def test_largest_rows_kept_and_the_rest_folded():
+    df = panchayats(100)
+    data = top_n_with_others(df, "panchayat_name", ["total"], n=10)
+    kept = df.nlargest(10, "total")
+    assert len(data) == 11 and data["panchayat_name"].iloc[-1] == "Others (90)"
+    assert set(data["panchayat_name"].iloc[:10]) == set(kept["panchayat_name"])
+    assert data["total"].sum() == pytest.approx(df["total"].sum())
+
+
+def test_sorted_result_keeps_its_first_rows():
+    df = panchayats(100).sort_values("total").reset_index(drop=True)
+    data = top_n_with_others(df, "panchayat_name", ["total"], n=10)
+    assert data["panchayat_name"].iloc[:10].tolist() == df["panchayat_name"].iloc[:10].tolist()
+
+
+def test_percentages_are_averaged():
+    df = panchayats(20).assign(percentage_utilization=50.0)
+    data = top_n_with_others(df, "panchayat_name", ["total", "percentage_utilization"], n=5)
+    assert data["percentage_utilization"].iloc[-1] == 50.0
+
+
+# ---------------- Figures ----------------
+def test_few_categories_get_a_trace_each():
+    fig = build_figure(pd.DataFrame({"category": ["SC", "ST", "Others"], "amount": [1.0, 2.0, 3.0]}))
+    assert len(fig.data) == 3
+
+
+@pytest.mark.parametrize("rows", [CHART_MAX_TRACES + 1, 5000])
+def test_many_categories_share_one_trace(rows):
+    fig = build_figure(panchayats(rows))
+    assert len(fig.data) == 1 and fig.data[0].type == "bar"
+    assert len(fig.data[0].x) == min(rows, CHART_TOP_N + 1)
+
+
+def test_figure_size_does_not_grow_with_rows():
+    small, large = (len(build_figure(panchayats(rows)).to_json()) for rows in (200, 20000))
+    assert large < small * 1.5
+
+
+def test_grouped_bars_are_cut_too():
+    df = panchayats(500).assign(sc=1.0)
+    fig = build_figure(df)
+    assert len(fig.data) == 2 and all(len(trace.x) == CHART_TOP_N + 1 for trace in fig.data)
+
+
+def test_large_scatter_uses_webgl():
+    small = build_figure(pd.DataFrame({"x": [1.0, 2.0], "y": [3.0, 4.0]}))
+    rows = visualization_agent.CHART_WEBGL_POINTS + 1
+    large = build_figure(pd.DataFrame({"x": np.arange(rows, dtype=float), "y": np.arange(rows, dtype=float)}))
+    assert small.data[0].type == "scatter" and large.data[0].type == "scattergl"
+
+
+# ---------------- Figure cache ----------------
+def test_figure_cache_lru():
+    cache = FigureCache(max_bytes=10)
+    cache.put("a", "xxxx")
+    cache.put("b", "xxxx")
+    assert cache.get("a") == "xxxx"  # b is now the least recently used
+    cache.put("c", "xxxx")
+    assert cache.get("b") is None and cache.get("c") == "xxxx"
+    assert cache.bytes == 8 and cache.stats["evictions"] == 1
+    cache.put("big", "x" * 11)
+    assert cache.get("big") is None
+
+
+def test_result_fingerprint():
+    df = panchayats(10)
+    assert result_fingerprint(df) == result_fingerprint(df.copy())
+    assert result_fingerprint(df) != result_fingerprint(df.assign(total=df["total"] + 1))
+    assert result_fingerprint(df) != result_fingerprint(df, "top_n=5")
+
+
+@pytest.fixture
+def cached_agent(monkeypatch):
+    """visualization_agent with an empty figure cache that stores every figure; yields the build count."""
+    builds = []
+    original = visualization_agent.build_figure
+    monkeypatch.setattr(visualization_agent, "build_figure", lambda df: builds.append(1) or original(df))
+    monkeypatch.setattr(visualization_agent, "figure_cache", FigureCache())
+    monkeypatch.setattr(visualization_agent, "CACHE_ENABLED", True)
+    monkeypatch.setattr(visualization_agent, "MIN_BUILD_MS", 0)
+    return builds
+
+
+def test_repeated_result_reuses_the_figure(cached_agent):
+    df = panchayats(50)
+    first = visualization_agent.visualization_agent({"query_result": df, "result_key": "v1:abc"})
+    second = visualization_agent.visualization_agent({"query_result": df, "result_key": "v1:abc"})
+    assert len(cached_agent) == 1
+    assert json.loads(second["visualization"].to_json()) == json.loads(first["visualization"].to_json())
+
+
+def test_result_without_a_key_is_cached_by_its_rows(cached_agent):
+    visualization_agent.visualization_agent({"query_result": panchayats(50)})
+    visualization_agent.visualization_agent({"query_result": panchayats(50)})
+    visualization_agent.visualization_agent({"query_result": panchayats(50, seed=1)})
+    assert len(cached_agent) == 2
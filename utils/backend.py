@@ -0,0 +1,20 @@
+# utils/backend.py
+"""
+The database module selected by DB_BACKEND:
+
+    postgres  utils/db.py, a pooled PostgreSQL connection (default)
+    duckdb    utils/duckdb_db.py, an embedded DuckDB file built by db/build_duckdb.py
+
+Both offer connection, execute, explain, fetch_frame, query_df, data_version,
+table_exists, metrics and Error. Use `from utils.backend import db`.
+"""
+import os
+
+DB_BACKEND = os.getenv("DB_BACKEND", "postgres").lower()
+
+if DB_BACKEND == "duckdb":
+    from utils import duckdb_db as db
+elif DB_BACKEND in ("postgres", "postgresql"):
+    from utils import db
+else:
+    raise ValueError(f"Unknown DB_BACKEND {DB_BACKEND!r}; use 'postgres' or 'duckdb'.")
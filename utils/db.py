@@ -0,0 +1,269 @@
+# utils/db.py
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import psycopg2
+from psycopg2 import extensions
+from psycopg2 import pool as pg_pool
+from dotenv import load_dotenv
+
+from utils import tracing
+
+load_dotenv()  # Load DB credentials
+
+DB_PARAMS = {
+    "host": os.getenv("PGHOST"),
+    "port": os.getenv("PGPORT"),
+    "dbname": os.getenv("PGDATABASE"),
+    "user": os.getenv("PGUSER"),
+    "password": os.getenv("PGPASSWORD")
+}
+
+POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))            # seconds to wait for a free connection
+STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "15000"))
+HEALTH_CHECK_AFTER = float(os.getenv("DB_HEALTH_CHECK_AFTER", "30"))  # idle seconds before a connection is pinged
+FETCH_BATCH_SIZE = int(os.getenv("DB_FETCH_BATCH_SIZE", "2000"))
+DATA_VERSION_TTL = float(os.getenv("DB_DATA_VERSION_TTL", "10"))    # seconds between data version checks
+
+
+Error = psycopg2.Error  # base class of the errors this backend raises (see utils/backend.py)
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No pooled connection became free within DB_POOL_TIMEOUT seconds."""
+
+
+_pool = None
+_pool_lock = threading.Lock()
+# ThreadedConnectionPool raises instead of waiting when it is exhausted; the
+# semaphore makes callers queue for a free slot instead.
+_slots = threading.BoundedSemaphore(POOL_MAX)
+_returned_at = {}  # id(connection) -> time it was last checked in
+
+_metrics_lock = threading.Lock()
+_metrics = {
+    "checkouts": 0,
+    "pool_wait_seconds": 0.0,
+    "pool_wait_max": 0.0,
+    "pool_timeouts": 0,
+    "queries": 0,
+    "query_seconds": 0.0,
+    "query_max": 0.0,
+    "query_errors": 0,
+    "reconnects": 0,
+}
+
+
+def _record(**values):
+    with _metrics_lock:
+        for key, value in values.items():
+            if key.endswith("_max"):
+                _metrics[key] = max(_metrics[key], value)
+            else:
+                _metrics[key] += value
+
+
+def metrics():
+    """Snapshot of pool and query counters, with averages derived from the totals."""
+    with _metrics_lock:
+        snapshot = dict(_metrics)
+    snapshot["pool_wait_avg"] = snapshot["pool_wait_seconds"] / snapshot["checkouts"] if snapshot["checkouts"] else 0.0
+    snapshot["query_avg"] = snapshot["query_seconds"] / snapshot["queries"] if snapshot["queries"] else 0.0
+    snapshot["pool_max"] = POOL_MAX
+    return snapshot
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = pg_pool.ThreadedConnectionPool(
+                POOL_MIN, POOL_MAX, **DB_PARAMS,
+                # Session default, so queries do not pay an extra round trip for it
+                options=f"-c statement_timeout={STATEMENT_TIMEOUT_MS}",
+            )
+    return _pool
+
+
+# NUMERIC as float, so results land in float64 columns instead of Decimal objects
+DEC2FLOAT = extensions.new_type(
+    extensions.DECIMAL.values, "DEC2FLOAT", lambda value, cursor: float(value) if value is not None else None
+)
+
+
+def _healthy(conn):
+    if conn.closed:
+        return False
+    if time.monotonic() - _returned_at.get(id(conn), 0) < HEALTH_CHECK_AFTER:
+        return True
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _checkout():
+    pool = get_pool()
+    conn = pool.getconn()
+    while not _healthy(conn):
+        pool.putconn(conn, close=True)
+        _record(reconnects=1)
+        conn = pool.getconn()
+    extensions.register_type(DEC2FLOAT, conn)
+    return conn
+
+
+@contextmanager
+def connection(read_only=True, timeout_ms=None):
+    """
+    Borrow a pooled connection for one transaction.
+
+    The transaction is read-only unless read_only=False, commits on success and
+    rolls back on error. timeout_ms overrides the statement timeout for this
+    transaction only.
+    """
+    started = time.perf_counter()
+    if not _slots.acquire(timeout=POOL_TIMEOUT):
+        _record(pool_timeouts=1)
+        raise PoolTimeout(f"No database connection free after {POOL_TIMEOUT}s (pool size {POOL_MAX}).")
+    try:
+        conn = _checkout()
+    except Exception:
+        _slots.release()
+        raise
+    waited = time.perf_counter() - started
+    _record(checkouts=1, pool_wait_seconds=waited, pool_wait_max=waited)
+
+    broken = False
+    try:
+        conn.readonly = read_only
+        if timeout_ms is not None:
+            with conn.cursor() as cursor:
+                cursor.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+        yield conn
+        conn.commit()
+    except Exception:
+        try:
+            conn.rollback()
+        except psycopg2.Error:
+            broken = True
+        raise
+    finally:
+        broken = broken or bool(conn.closed)
+        _returned_at[id(conn)] = time.monotonic()
+        get_pool().putconn(conn, close=broken)
+        _slots.release()
+
+
+def execute(cursor, sql, params=None):
+    """cursor.execute with query-time accounting and a 'db.query' trace span."""
+    started = time.perf_counter()
+    try:
+        with tracing.span("db.query"):
+            cursor.execute(sql, params)
+    except psycopg2.Error:
+        _record(query_errors=1)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        _record(queries=1, query_seconds=elapsed, query_max=elapsed)
+
+
+def explain(cursor, sql):
+    """The root node of the query's EXPLAIN (FORMAT JSON) plan; the query itself is not run."""
+    execute(cursor, f"EXPLAIN (FORMAT JSON) {sql}")
+    return cursor.fetchone()[0][0]["Plan"]
+
+
+def fetch_frame(cursor, max_rows=None, batch_size=FETCH_BATCH_SIZE):
+    """
+    Drain a cursor in batches into one DataFrame, built column by column.
+
+    At most max_rows rows are kept; returns (DataFrame, truncated).
+    """
+    started = time.perf_counter()
+    columns = None
+    fetched = 0
+    truncated = False
+    while True:
+        # Ask for one row past the cap so truncation can be detected
+        size = batch_size if max_rows is None else min(batch_size, max_rows + 1 - fetched)
+        batch = cursor.fetchmany(size)
+        if columns is None:
+            columns = [[] for _ in cursor.description or ()]
+        if not batch:
+            break
+        for values, column in zip(columns, zip(*batch)):
+            values.extend(column)
+        fetched += len(batch)
+        if max_rows is not None and fetched > max_rows:
+            truncated = True
+            break
+    if truncated:
+        columns = [values[:max_rows] for values in columns]
+    elapsed = time.perf_counter() - started
+    _record(query_seconds=elapsed)
+    tracing.record("db.fetch", elapsed, rows=min(fetched, max_rows) if max_rows is not None else fetched)
+
+    names = [desc[0] for desc in cursor.description or ()]
+    df = pd.DataFrame({i: values for i, values in enumerate(columns)}, columns=range(len(names)))
+    df.columns = names
+    return df, truncated
+
+
+_data_version = {"value": None, "checked_at": None, "error": None}
+_data_version_lock = threading.Lock()
+
+
+def data_version(max_age=DATA_VERSION_TTL):
+    """
+    Identifier of the loaded data: the latest report and when its rollup was refreshed.
+
+    db/setup.py stamps pmayg_report.refreshed_at in the transaction that refreshes
+    the rollup, so the value changes whenever new data becomes visible. The
+    database is asked at most once every max_age seconds. A failed check is
+    remembered for DB_DATA_VERSION_TTL seconds, during which the same error is
+    raised again without a query.
+    """
+    with _data_version_lock:
+        checked_at, error = _data_version["checked_at"], _data_version["error"]
+        if checked_at is not None and time.monotonic() - checked_at < (DATA_VERSION_TTL if error else max_age):
+            if error is not None:
+                raise error.with_traceback(None)
+            return _data_version["value"]
+    # Queried without the lock held, so a slow pool checkout does not hold up callers with a fresh value
+    try:
+        with connection() as conn:
+            with conn.cursor() as cursor:
+                execute(cursor, "SELECT max(report_id), max(refreshed_at) FROM pmayg_report")
+                report_id, refreshed_at = cursor.fetchone()
+    except Error as e:
+        with _data_version_lock:
+            _data_version.update(error=e, checked_at=time.monotonic())
+        raise
+    value = f"{report_id}:{refreshed_at.isoformat() if refreshed_at else ''}"
+    with _data_version_lock:
+        _data_version.update(value=value, error=None, checked_at=time.monotonic())
+    return value
+
+
+def query_df(sql, params=None, timeout_ms=None):
+    """Run a read-only query and return the result as a DataFrame."""
+    with connection(timeout_ms=timeout_ms) as conn:
+        with conn.cursor() as cursor:
+            execute(cursor, sql, params)
+            df, _ = fetch_frame(cursor)
+    return df
+
+
+def table_exists(name):
+    df = query_df("SELECT to_regclass(%s) IS NOT NULL", (name,))
+    return bool(df.iloc[0, 0])
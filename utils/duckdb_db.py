@@ -0,0 +1,231 @@
+# utils/duckdb_db.py
+"""
+Embedded DuckDB backend (DB_BACKEND=duckdb), with the same functions as utils/db.py.
+
+The database is a single file built by db/build_duckdb.py and opened read-only,
+so the app never writes to it. Queries run in this process on DuckDB's
+vectorized engine; each connection() is a transaction on its own cursor of one
+process-wide instance, which is reopened when the builder replaces the file.
+"""
+import json
+import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import duckdb
+import pandas as pd
+
+from utils import tracing
+from utils.db import FETCH_BATCH_SIZE, DATA_VERSION_TTL, STATEMENT_TIMEOUT_MS, _record, metrics  # noqa: F401 (metrics is shared)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DUCKDB_PATH = os.getenv("DUCKDB_PATH", os.path.join(PROJECT_ROOT, "db", "pmayg.duckdb"))
+DUCKDB_THREADS = int(os.getenv("DUCKDB_THREADS", "0"))  # 0: DuckDB's default, one per core
+
+Error = duckdb.Error
+
+_instance = {"conn": None, "inode": None}
+_instance_lock = threading.Lock()
+
+
+def _database():
+    """The shared DuckDB connection, reopened when db/build_duckdb.py has moved a new file into place."""
+    try:
+        inode = os.stat(DUCKDB_PATH).st_ino
+    except FileNotFoundError:
+        raise duckdb.IOException(f"DuckDB database {DUCKDB_PATH} not found; build it with python db/build_duckdb.py")
+    with _instance_lock:
+        if _instance["conn"] is None or _instance["inode"] != inode:
+            # The file is attached read-only to a private in-memory instance: several
+            # processes can then read it at once, and connecting to the path directly
+            # would return DuckDB's cached instance of the replaced file. The previous
+            # instance is not closed, as other threads may still be reading from it;
+            # it is released with its last cursor.
+            config = {"threads": DUCKDB_THREADS} if DUCKDB_THREADS else {}
+            conn = duckdb.connect(":memory:", config=config)
+            conn.execute(f"ATTACH {_quote(DUCKDB_PATH)} AS pmayg (READ_ONLY)")
+            _instance.update(conn=conn, inode=inode)
+            _data_version.update(value=None, checked_at=None, error=None)
+            _record(reconnects=1)
+        return _instance["conn"]
+
+
+def _quote(text):
+    return "'" + text.replace("'", "''") + "'"
+
+
+def pyformat_to_qmark(sql):
+    """psycopg2-style %s placeholders (and %% escapes) as DuckDB's ? placeholders."""
+    return re.sub(r"%(%|s)", lambda m: "%" if m.group(1) == "%" else "?", sql)
+
+
+class _Cursor:
+    """A DuckDB cursor that takes psycopg2-style SQL; `with` blocks leave the transaction to connection()."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def execute(self, sql, params=None):
+        if params is None:
+            return self._cursor.execute(sql)
+        return self._cursor.execute(pyformat_to_qmark(sql), list(params))
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class _Connection:
+    def __init__(self, cursor):
+        self._cursor = _Cursor(cursor)
+
+    def cursor(self, name=None):
+        # name selects a server-side cursor in psycopg2; DuckDB results are streamed in chunks anyway
+        return self._cursor
+
+
+@contextmanager
+def connection(read_only=True, timeout_ms=None):
+    """
+    One transaction on a new cursor of the shared instance. The file is
+    attached read-only, so writes fail whatever read_only says. Queries still
+    running after timeout_ms (default DB_STATEMENT_TIMEOUT_MS) are interrupted.
+    """
+    cursor = _database().cursor()
+    _record(checkouts=1)
+    timeout_ms = STATEMENT_TIMEOUT_MS if timeout_ms is None else timeout_ms
+    timer = threading.Timer(timeout_ms / 1000, cursor.interrupt) if timeout_ms else None
+    try:
+        cursor.execute("USE pmayg")  # each cursor starts in the in-memory catalog
+        cursor.execute("BEGIN TRANSACTION READ ONLY" if read_only else "BEGIN TRANSACTION")
+        if timer:
+            timer.start()
+        yield _Connection(cursor)
+        cursor.execute("COMMIT")
+    except Exception:
+        try:
+            cursor.execute("ROLLBACK")
+        except duckdb.Error:
+            pass
+        raise
+    finally:
+        if timer:
+            timer.cancel()
+        cursor.close()
+
+
+def execute(cursor, sql, params=None):
+    """cursor.execute with query-time accounting and a 'db.query' trace span."""
+    started = time.perf_counter()
+    try:
+        with tracing.span("db.query"):
+            cursor.execute(sql, params)
+    except duckdb.Error:
+        _record(query_errors=1)
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        _record(queries=1, query_seconds=elapsed, query_max=elapsed)
+
+
+def _plan_node(node):
+    children = [_plan_node(child) for child in node.get("children", ())]
+    estimate = node.get("extra_info", {}).get("Estimated Cardinality")
+    rows = float(str(estimate).lstrip("~")) if estimate is not None else max(
+        (child["Plan Rows"] for child in children), default=0)
+    return {"Node Type": node["name"], "Total Cost": None, "Plan Rows": rows, "Plans": children}
+
+
+def explain(cursor, sql):
+    """
+    The query's plan in the shape of a PostgreSQL EXPLAIN (FORMAT JSON) node:
+    DuckDB estimates row counts per operator but has no cost, so "Total Cost" is None.
+    """
+    execute(cursor, f"EXPLAIN (FORMAT JSON) {sql}")
+    for kind, plan in cursor.fetchall():
+        if kind == "physical_plan":
+            return _plan_node(json.loads(plan)[0])
+    raise duckdb.Error("EXPLAIN returned no physical plan")
+
+
+def fetch_frame(cursor, max_rows=None, batch_size=FETCH_BATCH_SIZE):
+    """
+    The query result as one DataFrame, fetched in vectorized chunks.
+
+    At most max_rows rows are kept; returns (DataFrame, truncated).
+    """
+    started = time.perf_counter()
+    truncated = False
+    if max_rows is None:
+        df = cursor.fetch_df()
+    else:
+        vectors = max(1, batch_size // 2048)  # DuckDB vectors hold 2048 rows
+        chunks = []
+        fetched = 0
+        while fetched <= max_rows:
+            chunk = cursor.fetch_df_chunk(vectors)
+            if chunk.empty:
+                if not chunks:
+                    chunks.append(chunk)  # keeps the column names of an empty result
+                break
+            chunks.append(chunk)
+            fetched += len(chunk)
+        df = pd.concat(chunks, ignore_index=True) if len(chunks) > 1 else chunks[0]
+        if len(df) > max_rows:
+            df, truncated = df.iloc[:max_rows], True
+    elapsed = time.perf_counter() - started
+    _record(query_seconds=elapsed)
+    tracing.record("db.fetch", elapsed, rows=len(df))
+    return df, truncated
+
+
+_data_version = {"value": None, "checked_at": None, "error": None}
+_data_version_lock = threading.Lock()
+
+
+def data_version(max_age=DATA_VERSION_TTL):
+    """
+    Identifier of the loaded data: the report and when db/build_duckdb.py built
+    its rollup. Checked at most once every max_age seconds; a failure (such as
+    a missing file) is remembered for DB_DATA_VERSION_TTL seconds.
+    """
+    with _data_version_lock:
+        checked_at, error = _data_version["checked_at"], _data_version["error"]
+        if checked_at is not None and time.monotonic() - checked_at < (DATA_VERSION_TTL if error else max_age):
+            if error is not None:
+                raise error.with_traceback(None)
+            return _data_version["value"]
+    try:
+        with connection() as conn:
+            with conn.cursor() as cursor:
+                execute(cursor, "SELECT max(report_id), max(refreshed_at) FROM pmayg_report")
+                report_id, refreshed_at = cursor.fetchone()
+    except Error as e:
+        with _data_version_lock:
+            _data_version.update(error=e, checked_at=time.monotonic())
+        raise
+    value = f"{report_id}:{refreshed_at.isoformat() if refreshed_at else ''}"
+    with _data_version_lock:
+        _data_version.update(value=value, error=None, checked_at=time.monotonic())
+    return value
+
+
+def query_df(sql, params=None, timeout_ms=None):
+    """Run a read-only query and return the result as a DataFrame."""
+    with connection(timeout_ms=timeout_ms) as conn:
+        with conn.cursor() as cursor:
+            execute(cursor, sql, params)
+            df, _ = fetch_frame(cursor)
+    return df
+
+
+def table_exists(name):
+    df = query_df("SELECT count(*) FROM information_schema.tables WHERE table_name = %s", (name,))
+    return bool(df.iloc[0, 0])
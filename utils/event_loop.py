@@ -0,0 +1,55 @@
+# utils/event_loop.py
+import asyncio
+import queue
+import threading
+
+# One event loop, on a daemon thread, shared by every Streamlit session in the
+# process. Script threads hand coroutines to it and block only on their own result.
+_loop = None
+_loop_lock = threading.Lock()
+
+_DONE = object()
+
+
+def get_loop():
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name="async-pipeline", daemon=True).start()
+    return _loop
+
+
+def run(coro, timeout=None):
+    """Run a coroutine on the shared loop and wait for its result."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop()).result(timeout)
+
+
+def iterate(agen):
+    """
+    Consume an async generator on the shared loop from synchronous code,
+    yielding its items as they are produced (e.g. graph.astream chunks).
+    """
+    items = queue.Queue()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put(item)
+        except BaseException as e:
+            items.put(e)
+        finally:
+            items.put(_DONE)
+
+    future = asyncio.run_coroutine_threadsafe(pump(), get_loop())
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # The consumer stopped early (e.g. the Streamlit script was rerun)
+        future.cancel()
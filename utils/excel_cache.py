@@ -0,0 +1,145 @@
+# utils/excel_cache.py
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # the cache is optional; sheets are parsed from XLSX every time without it
+    pa = None
+    feather = None
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.getenv("EXCEL_CACHE_DIR", os.path.join(PROJECT_ROOT, "db", ".cache", "sheets"))
+
+# Bump when the cleanup below changes so stale cache entries are ignored
+CACHE_VERSION = "1"
+
+# List of values representing missing data
+NA_VALUES = ["N.A.", "NA", "na", "-", "--", "", " "]
+
+# Column holding the geography name, by workbook prefix
+NAME_COLUMNS = {
+    "01_": "State Name",
+    "02_": "District Name",
+    "03_": "Block Name",
+    "04_": "Panchayat Name",
+}
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def name_column(path):
+    return NAME_COLUMNS.get(os.path.basename(path)[:3])
+
+
+def parse_sheet(path, name_col=None, clean=True):
+    """Read a workbook, normalise missing values and drop the total rows; clean=False reads it as it is."""
+    df = pd.read_excel(path)
+    if not clean:
+        # Columns mixing numbers with text such as "N.A." are kept as text: Arrow
+        # (the cache, and st.dataframe) needs one type per column
+        for col in df.columns[df.dtypes == object]:
+            if df[col].dropna().map(type).nunique() > 1:
+                df[col] = df[col].map(lambda v: v if pd.isna(v) else str(v))
+        return df
+    name_col = name_col or name_column(path)
+    df.columns = [str(c).strip() for c in df.columns]
+    df.replace(NA_VALUES, np.nan, inplace=True)
+    if name_col in df.columns:
+        df = df[df[name_col].notna()]
+        df = df[~df[name_col].astype(str).str.strip().str.lower().isin(["total", "grand total"])]
+        df[name_col] = df[name_col].astype(str).str.strip()
+    # Columns that held "N.A." are numeric once it is replaced, as they are when read back from the cache
+    return df.infer_objects().reset_index(drop=True)
+
+
+def cache_path(content_hash, cache_dir=None, clean=True):
+    kind = "" if clean else "-raw"
+    return os.path.join(cache_dir or CACHE_DIR, f"{content_hash}{kind}-v{CACHE_VERSION}.arrow")
+
+
+def read_cached(content_hash, cache_dir=None, clean=True):
+    """Memory-map a cached sheet; returns None on a cache miss."""
+    path = cache_path(content_hash, cache_dir, clean)
+    if feather is None or not os.path.exists(path):
+        return None
+    return feather.read_table(path, memory_map=True).to_pandas()
+
+
+def write_cached(df, content_hash, cache_dir=None, clean=True):
+    if feather is None:
+        return
+    path = cache_path(content_hash, cache_dir, clean)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        # Uncompressed so later reads can memory-map the file
+        feather.write_feather(df, tmp, compression="uncompressed")
+        os.replace(tmp, path)
+    except (pa.ArrowException, TypeError, ValueError) as e:
+        print(f"[WARN] Could not cache {content_hash[:12]}: {e}")
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_sheet(path, content_hash=None, use_cache=True, cache_dir=None, clean=True):
+    """
+    Cleaned sheet for `path`, served from the Arrow cache when the file is
+    unchanged. clean=False gives the sheet as it is in the workbook, total rows
+    and original values included (for display); it is cached separately.
+    """
+    if not use_cache:
+        return parse_sheet(path, clean=clean)
+    content_hash = content_hash or file_hash(path)
+    df = read_cached(content_hash, cache_dir, clean)
+    if df is None:
+        df = parse_sheet(path, clean=clean)
+        write_cached(df, content_hash, cache_dir, clean)
+    return df
+
+
+def _load_sheet_worker(args):
+    path, content_hash, use_cache, cache_dir = args
+    return load_sheet(path, content_hash, use_cache, cache_dir)
+
+
+def load_sheets(paths, hashes=None, workers=None, use_cache=True, cache_dir=None):
+    """
+    Load several workbooks and return {file name: DataFrame}.
+
+    Cache hits are memory-mapped in this process; the remaining workbooks are
+    parsed and cleaned in a process pool, which also writes their cache entries.
+    """
+    hashes = list(hashes) if hashes is not None else [None] * len(paths)
+    frames = {}
+    pending = []
+    for path, content_hash in zip(paths, hashes):
+        if use_cache:
+            content_hash = content_hash or file_hash(path)
+            df = read_cached(content_hash, cache_dir)
+            if df is not None:
+                frames[os.path.basename(path)] = df
+                continue
+        pending.append((path, content_hash, use_cache, cache_dir))
+
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_load_sheet_worker, pending))
+    else:
+        results = [_load_sheet_worker(args) for args in pending]
+
+    for (path, *_), df in zip(pending, results):
+        frames[os.path.basename(path)] = df
+    return frames
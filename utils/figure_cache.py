@@ -0,0 +1,75 @@
+# utils/figure_cache.py
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+CACHE_ENABLED = os.getenv("CHART_CACHE_ENABLED", "1") != "0"
+MEMORY_BYTES = int(float(os.getenv("CHART_CACHE_MEMORY_MB", "64")) * 1024 * 1024)
+# Figures built faster than this are not stored: reading one back costs about as much
+MIN_BUILD_MS = float(os.getenv("CHART_CACHE_MIN_BUILD_MS", "20"))
+
+
+def result_fingerprint(df, settings=""):
+    """
+    Hash of a result's columns, dtypes and values (plus the chart settings), for
+    results that come without a result_key from the query executor.
+    """
+    digest = hashlib.sha256(settings.encode())
+    digest.update(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+class FigureCache:
+    """
+    LRU cache of serialized Plotly figures (JSON strings), bounded by their size.
+
+    Keyed on the result fingerprint rather than the data version: a result
+    that is unchanged after a reload still has the same chart.
+    """
+
+    def __init__(self, max_bytes=MEMORY_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()  # fingerprint -> figure JSON
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def get(self, key):
+        """The figure JSON cached under key, or None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry
+
+    def put(self, key, figure_json):
+        size = len(figure_json)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self._entries[key] = figure_json
+            self.bytes += size
+            self.stats["stores"] += 1
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.stats["evictions"] += 1
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def hit_rate(self):
+        total = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / total if total else 0.0
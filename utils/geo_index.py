@@ -0,0 +1,289 @@
+# utils/geo_index.py
+import bisect
+import re
+import unicodedata
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+LEVELS = ("state", "district", "block", "panchayat")
+
+GEO_TABLES = {
+    "state": ("pmayg_state", "state_id", None),
+    "district": ("pmayg_district", "district_id", "state_id"),
+    "block": ("pmayg_block", "block_id", "district_id"),
+    "panchayat": ("pmayg_panchayat", "panchayat_id", "block_id"),
+}
+
+# Words users put next to a place name to say which level they mean
+LEVEL_WORDS = {
+    "state": "state",
+    "district": "district",
+    "dist": "district",
+    "block": "block",
+    "taluka": "block",
+    "tehsil": "block",
+    "panchayat": "panchayat",
+    "gp": "panchayat",
+    "village": "panchayat",
+}
+
+# Old or alternative spellings -> the normalized name used in the source data
+ALIASES = {
+    "orissa": "odisha",
+    "jammu kashmir": "jammu and kashmir",
+    "chhatrapati sambhaji nagar": "chatrapati sambhaji nagar",
+    "sambhajinagar": "chatrapati sambhaji nagar",
+    "osmanabad": "dharashiv",
+    "ahilyanagar": "ahmednagar",
+    "poona": "pune",
+}
+
+# Old names that are still another place's name elsewhere: "aurangabad" is a
+# district of Bihar, and the old name of Maharashtra's Chatrapati Sambhaji Nagar.
+# Such a name also matches the renamed place, but only inside the given state.
+STATE_ALIASES = {
+    "aurangabad": ("maharashtra", "chatrapati sambhaji nagar"),
+}
+
+# Words that never start a place mention in a question, and are never spelling-corrected into one
+STOPWORDS = {
+    "a", "above", "across", "add", "all", "allocated", "allocation", "among", "amount", "and", "average",
+    "below", "beneficiaries", "beneficiary", "been", "between", "both", "by", "categories", "category",
+    "compare", "count", "data", "does", "each", "every", "for", "from", "fund", "funds", "give", "half",
+    "have", "highest", "how", "in", "into", "is", "least", "less", "list", "lowest", "many", "mean", "more",
+    "most", "much", "number", "of", "only", "over", "percentage", "rank", "ratio", "received", "released",
+    "report", "same", "share", "show", "than", "that", "the", "their", "there", "these", "this", "those",
+    "to", "top", "total", "under", "what", "when", "where", "which", "with",
+}
+
+MAX_MENTION_WORDS = 4
+# Words shorter than this are never spelling-corrected: too many names are one edit away
+FUZZY_MIN_LENGTH = 4
+
+
+class Place(NamedTuple):
+    level: str
+    id: int
+    name: str
+    parent_id: Optional[int] = None
+
+
+def tokenize(text):
+    text = unicodedata.normalize("NFKD", str(text)).encode("ascii", "ignore").decode()
+    text = text.casefold().replace("&", " and ")
+    return re.sub(r"[^a-z0-9]+", " ", text).split()
+
+
+def normalize(name):
+    """Case-folded, accent- and punctuation-free key with trailing level words removed."""
+    words = tokenize(name)
+    if len(words) > 2 and words[-2:] == ["gram", "panchayat"]:
+        words = words[:-2]
+    while len(words) > 1 and words[-1] in LEVEL_WORDS:
+        words.pop()
+    key = " ".join(words)
+    return ALIASES.get(key, key)
+
+
+def _deletions(key):
+    """The key and every string made by deleting one of its characters."""
+    return [key] + [key[:i] + key[i + 1:] for i in range(len(key))]
+
+
+def _edit_distance(a, b):
+    """0 or 1 when a and b are at most one insertion, deletion, substitution or adjacent swap apart, else None."""
+    if a == b:
+        return 0
+    if abs(len(a) - len(b)) > 1:
+        return None
+    i = 0
+    while a[i:i + 1] == b[i:i + 1]:
+        i += 1
+    if len(a) == len(b):
+        if a[i + 1:] == b[i + 1:] or (a[i + 2:] == b[i + 2:] and a[i:i + 2] == b[i:i + 2][::-1]):
+            return 1
+        return None
+    longer, shorter = (a, b) if len(a) > len(b) else (b, a)
+    return 1 if longer[i + 1:] == shorter[i:] else None
+
+
+class GeoIndex:
+    """
+    In-memory index of the geography hierarchy.
+
+    Exact and parent-scoped lookups are dict hits; prefix search uses a sorted
+    key list. Fuzzy search finds names one
+    typo away with symmetric deletion: every key and its one-character
+    deletions are hashed into a sorted array, so a lookup is a binary search
+    per deletion of the query rather than a scan of the names.
+    """
+
+    def __init__(self):
+        self._places = {}          # (level, id) -> Place
+        self._by_key = {}          # key -> [Place]
+        self._by_parent = {}       # (level, parent_id, key) -> Place
+        self._sorted_keys = None   # built lazily for prefix search
+        self._deletions = None     # (sorted deletion hashes, key of each, keys), built lazily for fuzzy search
+
+    def __len__(self):
+        return len(self._places)
+
+    # ---------------- Building ----------------
+    def add(self, level, place_id, name, parent_id=None):
+        place = Place(level, place_id, name, parent_id)
+        previous = self._places.get((level, place_id))
+        if previous is not None:
+            old_key = normalize(previous.name)
+            self._by_key[old_key].remove(previous)
+            self._by_parent.pop((level, previous.parent_id, old_key), None)
+        key = normalize(name)
+        self._places[(level, place_id)] = place
+        self._by_key.setdefault(key, []).append(place)
+        self._by_parent[(level, parent_id, key)] = place
+        self._sorted_keys = None
+        self._deletions = None
+        return place
+
+    @classmethod
+    def from_db(cls, cursor):
+        index = cls()
+        for level in LEVELS:
+            table, id_col, parent_col = GEO_TABLES[level]
+            cursor.execute(f"SELECT {id_col}, name, {parent_col or 'NULL'} FROM {table}")
+            for place_id, name, parent_id in cursor.fetchall():
+                index.add(level, place_id, name, parent_id)
+        return index
+
+    # ---------------- Lookups ----------------
+    def get(self, level, place_id):
+        return self._places.get((level, place_id))
+
+    def places(self, level=None):
+        """Every place, or every place of one level."""
+        return [p for p in self._places.values() if level is None or p.level == level]
+
+    def _state_name(self, place):
+        return normalize(self.path(place)[-1].name)
+
+    def _lookup(self, key):
+        """Places with this normalized key, plus the renamed places a STATE_ALIASES entry points to."""
+        places = self._by_key.get(key, [])
+        if key in STATE_ALIASES:
+            state, renamed = STATE_ALIASES[key]
+            places = places + [p for p in self._by_key.get(renamed, ()) if self._state_name(p) == state]
+        return places
+
+    def find(self, name, level=None, parent_id=None):
+        """All places whose normalized name matches, optionally restricted to a level/parent."""
+        key = normalize(name)
+        if level is not None and parent_id is not None:
+            place = self._by_parent.get((level, parent_id, key))
+            if place is None and key in STATE_ALIASES:
+                state, renamed = STATE_ALIASES[key]
+                place = self._by_parent.get((level, parent_id, renamed))
+                if place is not None and self._state_name(place) != state:
+                    place = None
+            return [place] if place else []
+        return [p for p in self._lookup(key) if level is None or p.level == level]
+
+    def resolve(self, name, level=None, parent_id=None):
+        """The single matching place, or None when it is missing or ambiguous."""
+        matches = self.find(name, level, parent_id)
+        return matches[0] if len(matches) == 1 else None
+
+    def prefix(self, text, level=None, limit=10):
+        """Places whose normalized name starts with text's, in name order (e.g. for type-ahead)."""
+        if self._sorted_keys is None:
+            self._sorted_keys = sorted(self._by_key)
+        key = normalize(text)
+        results = []
+        i = bisect.bisect_left(self._sorted_keys, key)
+        while i < len(self._sorted_keys) and self._sorted_keys[i].startswith(key) and len(results) < limit:
+            results.extend(p for p in self._by_key[self._sorted_keys[i]] if level is None or p.level == level)
+            i += 1
+        return results[:limit]
+
+    def build_fuzzy_index(self):
+        """Build the deletion index now rather than on the first fuzzy lookup (about 1.5s per 250k names)."""
+        if self._deletions is None:
+            keys = list(self._by_key)
+            counts = np.fromiter((len(key) + 1 for key in keys), dtype=np.int64, count=len(keys))
+            hashes = np.fromiter((hash(v) for key in keys for v in _deletions(key)), dtype=np.int64,
+                                 count=int(counts.sum()))
+            owners = np.repeat(np.arange(len(keys), dtype=np.int32), counts)
+            order = np.argsort(hashes, kind="stable")
+            self._deletions = (hashes[order], owners[order], keys)
+
+    def fuzzy(self, text, level=None, limit=5):
+        """
+        Places whose name is one typo (insertion, deletion, substitution or
+        adjacent swap) from text, exact matches first, then higher levels first.
+        """
+        key = normalize(text)
+        self.build_fuzzy_index()
+        hashes, owners, keys = self._deletions
+        variants = np.array([hash(v) for v in _deletions(key)], dtype=np.int64)
+        starts = np.searchsorted(hashes, variants, side="left")
+        ends = np.searchsorted(hashes, variants, side="right")
+        scored = []
+        for candidate in {keys[owners[i]] for start, end in zip(starts, ends) for i in range(start, end)}:
+            distance = _edit_distance(key, candidate)
+            if distance is None:
+                continue  # one deletion on each side can also mean two edits, or a hash collision
+            scored.extend((distance, LEVELS.index(p.level), p.name, p) for p in self._by_key[candidate]
+                          if level is None or p.level == level)
+        scored.sort(key=lambda item: item[:3])
+        return [item[3] for item in scored[:limit]]
+
+    def path(self, place):
+        """The place followed by its ancestors, e.g. [KHED block, PUNE district, MAHARASHTRA state]."""
+        chain = [place]
+        while place.parent_id is not None:
+            parent_level = LEVELS[LEVELS.index(place.level) - 1]
+            place = self._places.get((parent_level, place.parent_id))
+            if place is None:
+                break
+            chain.append(place)
+        return chain
+
+    @staticmethod
+    def _correctable(word):
+        return (len(word) >= FUZZY_MIN_LENGTH and not word.isdigit() and word not in STOPWORDS
+                and word not in LEVEL_WORDS and word.rstrip("s") not in LEVEL_WORDS)
+
+    def mentions(self, text, fuzzy=False):
+        """
+        Places named in free text, longest match first.
+
+        A level word next to the name ("Pune district", "block Khed") narrows
+        the candidates to that level. With fuzzy, a word that names no place is
+        read as the closest name one typo away ("Pnue" as PUNE), unless it is
+        a stopword, a level word or shorter than FUZZY_MIN_LENGTH.
+        """
+        words = tokenize(text)
+        found = []
+        i = 0
+        while i < len(words):
+            match = None
+            for n in range(min(MAX_MENTION_WORDS, len(words) - i), 0, -1):
+                span = words[i:i + n]
+                if n == 1 and span[0] in STOPWORDS:
+                    break
+                places = self._lookup(ALIASES.get(" ".join(span), " ".join(span)))
+                if places:
+                    match = (n, places)
+                    break
+            if match is None and fuzzy and self._correctable(words[i]):
+                closest = self.fuzzy(words[i], limit=1)
+                if closest:
+                    match = (1, self._by_key[normalize(closest[0].name)])
+            if match is None:
+                i += 1
+                continue
+            n, places = match
+            hints = {LEVEL_WORDS.get(w) for w in (words[i - 1] if i else None, words[i + n] if i + n < len(words) else None)}
+            narrowed = [p for p in places if p.level in hints]
+            found.append({"text": " ".join(words[i:i + n]), "places": narrowed or list(places)})
+            i += n
+        return found
@@ -0,0 +1,128 @@
+# utils/geo_tree.py
+"""
+In-memory geography tree with the indicator values of every place, for the drill-down explorer.
+
+The hierarchy and the latest report's rollup are read in one transaction, once
+per data version (see db.data_version), and shared by every session of the
+process. Drilling into a place is then dictionary lookups and a memoized
+DataFrame: no SQL per click and no LLM.
+"""
+import threading
+import time
+
+import pandas as pd
+
+from utils import tracing
+from utils.backend import db
+from utils.geo_index import LEVELS, GeoIndex
+
+# States carry no beneficiary figures of their own; their children's sum stands in, as in pmayg_state_wide
+TREE_QUERY = """
+SELECT geo_level, geo_id, indicator, COALESCE(amount, children_amount) AS amount
+FROM pmayg_rollup
+WHERE report_id = (SELECT max(report_id) FROM pmayg_report)
+"""
+
+
+class GeoTree:
+    """
+    The state > district > block > panchayat hierarchy with each place's
+    indicator values. The root (place None) has the states as children.
+    """
+
+    def __init__(self, geo_index, indicators, values):
+        self.index = geo_index
+        self.indicators = indicators  # [(name, type)] in pmayg_indicator order
+        self.values = values          # (level, id) -> {indicator: amount}
+        self._children = {}           # (level, id), or None for the root -> [Place] sorted by name
+        for place in geo_index.places():
+            parent = None
+            if place.level != LEVELS[0]:
+                parent = (LEVELS[LEVELS.index(place.level) - 1], place.parent_id)
+            self._children.setdefault(parent, []).append(place)
+        for places in self._children.values():
+            places.sort(key=lambda p: p.name)
+        self._breakdowns = {}
+        self._breakdowns_lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.index)
+
+    @classmethod
+    def from_db(cls, cursor):
+        geo_index = GeoIndex.from_db(cursor)
+        db.execute(cursor, "SELECT name, type FROM pmayg_indicator ORDER BY indicator_id")
+        indicators = [tuple(row) for row in cursor.fetchall()]
+        db.execute(cursor, TREE_QUERY)
+        values = {}
+        for level, geo_id, indicator, amount in cursor.fetchall():
+            values.setdefault((level, geo_id), {})[indicator] = None if amount is None else float(amount)
+        return cls(geo_index, indicators, values)
+
+    # ---------------- Navigation ----------------
+    def get(self, level, place_id):
+        return self.index.get(level, place_id)
+
+    def children(self, place=None):
+        """The places one level below place (the states for None), sorted by name."""
+        return self._children.get(None if place is None else (place.level, place.id), [])
+
+    def path(self, place):
+        """Root-first chain of places ending with place, e.g. [MAHARASHTRA, PUNE, KHED]."""
+        return [] if place is None else list(reversed(self.index.path(place)))
+
+    # ---------------- Figures ----------------
+    def place_values(self, place):
+        """One row per indicator reported for the place: indicator, type, amount."""
+        values = self.values.get((place.level, place.id), {})
+        rows = [(name, type_, values[name]) for name, type_ in self.indicators if values.get(name) is not None]
+        return pd.DataFrame(rows, columns=["indicator", "indicator_type", "amount"])
+
+    def breakdown(self, place=None):
+        """
+        One row per child of place with a column per indicator; indicators no
+        child reports are left out, and a panchayat's breakdown is empty. Built
+        once per place and shared, so callers must not modify it.
+        """
+        if place is not None and place.level == LEVELS[-1]:
+            return pd.DataFrame()
+        key = None if place is None else (place.level, place.id)
+        with self._breakdowns_lock:
+            df = self._breakdowns.get(key)
+        if df is not None:
+            return df
+
+        children = self.children(place)
+        child_level = LEVELS[0] if place is None else LEVELS[LEVELS.index(place.level) + 1]
+        names = [name for name, _ in self.indicators]
+        rows = [[child.name] + [self.values.get((child.level, child.id), {}).get(name) for name in names]
+                for child in children]
+        df = pd.DataFrame(rows, columns=[f"{child_level}_name"] + names)
+        df = df.dropna(axis=1, how="all")
+        with self._breakdowns_lock:
+            self._breakdowns[key] = df
+        return df
+
+
+# ---------------- Shared tree ----------------
+_tree = {"tree": None, "version": None}
+_tree_lock = threading.Lock()
+
+
+def get_tree():
+    """
+    The tree for the loaded data, built on first use and again only when the
+    data version changes; sessions asking during a rebuild wait for it.
+    """
+    version = db.data_version()
+    with _tree_lock:
+        if _tree["tree"] is None or _tree["version"] != version:
+            started = time.perf_counter()
+            with db.connection() as conn:
+                with conn.cursor() as cursor:
+                    tree = GeoTree.from_db(cursor)
+            elapsed = time.perf_counter() - started
+            tracing.record("geo_tree.load", elapsed, places=len(tree))
+            print(f"[INFO] Geography tree loaded: {len(tree)} places in {elapsed:.2f}s")
+            _tree.update(tree=tree, version=version)
+        return _tree["tree"]
@@ -0,0 +1,186 @@
+# utils/result_cache.py
+import hashlib
+import os
+import pickle
+import re
+import shutil
+import threading
+from collections import OrderedDict
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "1") != "0"
+MEMORY_BYTES = int(float(os.getenv("RESULT_CACHE_MEMORY_MB", "256")) * 1024 * 1024)
+SPILL_ENABLED = os.getenv("RESULT_CACHE_SPILL", "0") == "1"
+SPILL_DIR = os.getenv("RESULT_CACHE_DIR", os.path.join(PROJECT_ROOT, ".cache", "results"))
+SPILL_BYTES = int(float(os.getenv("RESULT_CACHE_DISK_MB", "1024")) * 1024 * 1024)
+
+# String literals and quoted identifiers are kept verbatim, comments are dropped,
+# everything else is split into words and single punctuation characters.
+SQL_TOKEN_RE = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/|\w+|[^\w\s]", re.DOTALL)
+
+
+def canonical_sql(sql):
+    """
+    SQL with comments, case and spacing normalized, e.g.
+    "SELECT  x FROM t -- note\\n;" and "select x from t" give the same string.
+    Literals keep their case, so WHERE geo_name='PUNE' and ='pune' stay distinct.
+    """
+    tokens = []
+    for token in SQL_TOKEN_RE.findall(sql):
+        if token.startswith(("--", "/*")):
+            continue
+        tokens.append(token if token[0] in "'\"" else token.lower())
+    while tokens and tokens[-1] == ";":
+        tokens.pop()
+    return " ".join(tokens)
+
+
+def sql_fingerprint(sql):
+    return hashlib.sha256(canonical_sql(sql).encode()).hexdigest()
+
+
+def frame_size(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class ResultCache:
+    """
+    LRU cache of query results, bounded by their in-memory size.
+
+    Entries are keyed on the SQL fingerprint and belong to one data version; the
+    first lookup under a new version drops everything cached for the old one.
+    With spilling enabled, results evicted from memory (or too large for it) are
+    pickled under spill_dir and read back on the next hit.
+    """
+
+    def __init__(self, max_bytes=MEMORY_BYTES, spill=SPILL_ENABLED, spill_dir=SPILL_DIR, spill_bytes=SPILL_BYTES):
+        self.max_bytes = max_bytes
+        self.spill = spill
+        self.spill_dir = spill_dir
+        self.spill_bytes = spill_bytes
+        self.version = None
+        self.bytes = 0
+        self._memory = OrderedDict()   # fingerprint -> (df, truncated, size)
+        self._spilled = OrderedDict()  # fingerprint -> file size, oldest first
+        self._lock = threading.Lock()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0, "spills": 0}
+
+    # ---------------- Versioning ----------------
+    def _version_dir(self, version=None):
+        version = self.version if version is None else version
+        return os.path.join(self.spill_dir, hashlib.sha256(str(version).encode()).hexdigest()[:16])
+
+    def _use_version(self, version):
+        if version == self.version:
+            return
+        self._clear()
+        self.version = version
+        # Spilled results of older data versions are stale
+        if self.spill and os.path.isdir(self.spill_dir):
+            current = os.path.basename(self._version_dir())
+            for name in os.listdir(self.spill_dir):
+                if name != current:
+                    shutil.rmtree(os.path.join(self.spill_dir, name), ignore_errors=True)
+            # Results spilled for this version by an earlier run are still valid
+            current_dir = self._version_dir()
+            if os.path.isdir(current_dir):
+                files = [entry for entry in os.scandir(current_dir) if entry.name.endswith(".pkl")]
+                for entry in sorted(files, key=lambda e: e.stat().st_mtime):
+                    self._spilled[entry.name[:-len(".pkl")]] = entry.stat().st_size
+
+    def _clear(self):
+        self._memory.clear()
+        self._spilled.clear()
+        self.bytes = 0
+
+    # ---------------- Disk tier ----------------
+    def _spill_path(self, key):
+        return os.path.join(self._version_dir(), f"{key}.pkl")
+
+    def _write_spill(self, key, df, truncated):
+        if key in self._spilled:
+            return
+        path = self._spill_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump((df, truncated), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        self._spilled[key] = os.path.getsize(path)
+        self.stats["spills"] += 1
+        while sum(self._spilled.values()) > self.spill_bytes and self._spilled:
+            oldest, _ = self._spilled.popitem(last=False)
+            try:
+                os.remove(self._spill_path(oldest))
+            except OSError:
+                pass
+
+    def _read_spill(self, key):
+        path = self._spill_path(key)
+        if not os.path.exists(path):
+            self._spilled.pop(key, None)
+            return None
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self._spilled.pop(key, None)
+            return None
+
+    # ---------------- Memory tier ----------------
+    def _remember(self, key, df, truncated):
+        size = frame_size(df)
+        if size > self.max_bytes:
+            if self.spill:
+                self._write_spill(key, df, truncated)
+            return
+        old = self._memory.pop(key, None)
+        if old:
+            self.bytes -= old[2]
+        self._memory[key] = (df, truncated, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            evicted, (evicted_df, evicted_truncated, evicted_size) = self._memory.popitem(last=False)
+            self.bytes -= evicted_size
+            self.stats["evictions"] += 1
+            if self.spill:
+                self._write_spill(evicted, evicted_df, evicted_truncated)
+
+    # ---------------- Public API ----------------
+    def get(self, sql, version):
+        """(DataFrame, truncated) cached for the SQL under this data version, or None."""
+        key = sql_fingerprint(sql)
+        with self._lock:
+            self._use_version(version)
+            entry = self._memory.get(key)
+            if entry:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0], entry[1]
+            if self.spill and key in self._spilled:
+                entry = self._read_spill(key)
+                if entry:
+                    self._remember(key, *entry)
+                    self.stats["disk_hits"] += 1
+                    return entry
+            self.stats["misses"] += 1
+            return None
+
+    def put(self, sql, version, df, truncated=False):
+        key = sql_fingerprint(sql)
+        with self._lock:
+            self._use_version(version)
+            self._remember(key, df, truncated)
+            self.stats["stores"] += 1
+
+    def invalidate(self):
+        """Drop every cached result, in memory and spilled."""
+        with self._lock:
+            self._clear()
+            if os.path.isdir(self.spill_dir):
+                shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
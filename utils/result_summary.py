@@ -0,0 +1,135 @@
+# utils/result_summary.py
+import os
+
+import numpy as np
+
+TOKEN_BUDGET = int(os.getenv("INSIGHTS_TOKEN_BUDGET", "1500"))  # tokens of query result put in the insights prompt
+TOP_K = int(os.getenv("INSIGHTS_TOP_K", "10"))
+CHARS_PER_TOKEN = 4
+FLOAT_FORMAT = "%.2f"
+
+# Preferred measure columns when ranking rows, in order
+VALUE_COLUMNS = ("total", "amount", "value")
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def to_csv(df):
+    return df.to_csv(index=False, float_format=FLOAT_FORMAT).strip()
+
+
+def value_column(df):
+    """The numeric column rows are ranked by: a conventionally named measure, else the last numeric column."""
+    numeric = df.select_dtypes(include="number").columns
+    if not len(numeric):
+        return None
+    for name in VALUE_COLUMNS:
+        for col in numeric:
+            if str(col).lower() == name or str(col).lower().endswith(f"_{name}"):
+                return col
+    return numeric[-1]
+
+
+def text_columns(df):
+    return list(df.select_dtypes(include=["object", "string"]).columns)
+
+
+def total_labels(series):
+    """Distinct values of a text column that read 'Total'; matched on the uniques, not every row."""
+    return [v for v in series.dropna().unique() if str(v).strip().casefold() == "total"]
+
+
+def total_mask(df):
+    """Rows labelled 'Total' in any text column (the sum over beneficiary categories, not a category)."""
+    mask = np.zeros(len(df), dtype=bool)
+    for col in text_columns(df):
+        labels = total_labels(df[col])
+        if labels:
+            mask |= df[col].isin(labels).to_numpy()
+    return mask
+
+
+# ---------------- Sections ----------------
+def column_stats(df):
+    lines = []
+    numeric = df.select_dtypes(include="number")
+    if not numeric.empty:
+        stats = numeric.agg(["count", "sum", "mean", "min", "max"]).T
+        stats["count"] = stats["count"].astype(int)
+        stats.insert(0, "column", stats.index)
+        lines.append("Numeric columns:\n" + to_csv(stats))
+    for col in df.columns.difference(numeric.columns, sort=False):
+        counts = df[col].value_counts()
+        top = ", ".join(f"{value} ({count})" for value, count in counts.head(3).items())
+        lines.append(f"{col}: {df[col].nunique()} distinct values, most frequent: {top}")
+    return "\n".join(lines)
+
+
+def total_shares(df, value, mask):
+    """Share of the 'Total' rows (or 'Total' column) taken by each category, over the whole result."""
+    if mask.any() and value is not None:
+        grand = df.loc[mask, value].sum()
+        label_cols = [c for c in text_columns(df) if df.loc[mask, c].isin(total_labels(df[c])).all()]
+        if grand and label_cols:
+            sums = df.loc[~mask].groupby(label_cols[0], sort=False)[value].sum()
+            shares = (sums / grand * 100).round(1).sort_values(ascending=False)
+            return "Share of Total by " + str(label_cols[0]) + ": " + ", ".join(f"{k} {v}%" for k, v in shares.items())
+
+    numeric = df.select_dtypes(include="number")
+    total_cols = [c for c in numeric.columns if str(c).lower() == "total"]
+    if total_cols:
+        grand = numeric[total_cols[0]].sum()
+        if grand:
+            shares = (numeric.drop(columns=total_cols).sum() / grand * 100).round(1)
+            return "Share of Total column: " + ", ".join(f"{k} {v}%" for k, v in shares.items())
+    return None
+
+
+def ranked_rows(df, value, k, mask):
+    rows = df.loc[~mask]
+    if value is None or len(rows) <= 2 * k:
+        return [f"First {min(k, len(rows))} rows:\n" + to_csv(rows.head(k))]
+    return [
+        f"Top {k} rows by {value}:\n" + to_csv(rows.nlargest(k, value)),
+        f"Bottom {k} rows by {value}:\n" + to_csv(rows.nsmallest(k, value)),
+    ]
+
+
+# ---------------- Public API ----------------
+def summarize_result(df, max_tokens=TOKEN_BUDGET, k=TOP_K, truncated=False):
+    """
+    Compact text form of a query result that fits in max_tokens.
+
+    Small results are returned as CSV. Larger ones become column statistics,
+    shares of the 'Total' rows and the top/bottom k rows, with k reduced until
+    the text fits the budget.
+    """
+    if df.empty:
+        return "No relevant data found."
+    note = "The result was cut at the row limit; statistics cover the rows returned.\n" if truncated else ""
+
+    # Extrapolate the CSV size from a sample before rendering the whole frame
+    sample = min(len(df), 100)
+    if estimate_tokens(to_csv(df.head(sample))) * len(df) / sample <= max_tokens * 1.5:
+        csv = note + to_csv(df)
+        if estimate_tokens(csv) <= max_tokens:
+            return csv
+
+    value = value_column(df)
+    mask = total_mask(df)
+    header = [f"{note}{len(df):,} rows x {len(df.columns)} columns; summarized, not every row is shown.",
+              column_stats(df)]
+    shares = total_shares(df, value, mask)
+    if shares:
+        header.append(shares)
+
+    text = "\n\n".join(header)
+    while k >= 1:
+        text = "\n\n".join(header + ranked_rows(df, value, k, mask))
+        if estimate_tokens(text) <= max_tokens:
+            return text
+        k //= 2
+    # Very wide results: the statistics alone exceed the budget
+    return text[:max_tokens * CHARS_PER_TOKEN]
@@ -0,0 +1,200 @@
+# utils/sql_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from utils.tfidf import TfidfIndex, tokenize
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.getenv("SQL_CACHE_PATH", os.path.join(PROJECT_ROOT, ".cache", "text_to_sql.sqlite"))
+CACHE_ENABLED = os.getenv("SQL_CACHE_ENABLED", "1") != "0"
+MEMORY_ENTRIES = int(os.getenv("SQL_CACHE_MEMORY_ENTRIES", "256"))
+DISK_ENTRIES = int(os.getenv("SQL_CACHE_DISK_ENTRIES", "5000"))
+TTL_SECONDS = float(os.getenv("SQL_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+SIMILARITY_THRESHOLD = float(os.getenv("SQL_CACHE_SIMILARITY", "0.75"))
+SIMILARITY_CANDIDATES = 500
+
+# Words that can differ between two questions without changing the SQL they
+# need. A near-duplicate is only reused when every differing word is one of these.
+FILLER_WORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "has", "have", "had", "do", "does", "did",
+    "please", "can", "could", "would", "you", "me", "us", "i", "we", "tell", "show",
+    "give", "list", "display", "find", "get", "got", "gets", "received", "receive", "receives", "given",
+    "of", "in", "for", "to", "at", "on", "from", "within", "inside", "there", "that", "this",
+    "fund", "funds", "funding", "money",
+}
+
+
+def normalize_question(question):
+    return " ".join(tokenize(question))
+
+
+class SQLCache:
+    """
+    Two-tier cache of generated SQL: an in-process LRU in front of a SQLite file.
+
+    Entries are keyed on the normalized question, the prompt version (a hash of
+    the schema and few-shot examples) and a context string such as the resolved
+    place ids. Entries written under any other prompt version are dropped when the
+    cache is opened. On an exact miss, a cached question with the same version and
+    context is reused if its TF-IDF cosine similarity is above the threshold and
+    the two questions only differ by filler words. The TF-IDF index of each
+    context is read from disk once and then kept up to date by put().
+    """
+
+    def __init__(self, version, path=CACHE_PATH, memory_entries=MEMORY_ENTRIES, disk_entries=DISK_ENTRIES,
+                 ttl=TTL_SECONDS, similarity=SIMILARITY_THRESHOLD):
+        self.version = version
+        self.path = path
+        self.memory_entries = memory_entries
+        self.disk_entries = disk_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self._memory = OrderedDict()  # key -> (sql, stored_at)
+        self._candidates = {}         # context -> (TfidfIndex, [[question, sql, stored_at]], {question: i})
+        self._lock = threading.Lock()
+        self._conn = None
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "similar_hits": 0, "misses": 0, "stores": 0}
+
+    # ---------------- Storage ----------------
+    def _db(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS sql_cache (
+                    key TEXT PRIMARY KEY,
+                    version TEXT NOT NULL,
+                    context TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    sql TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_sql_cache_scope ON sql_cache (version, context)")
+            # The schema or few-shot examples changed: SQL generated for the old prompt is stale
+            self._conn.execute("DELETE FROM sql_cache WHERE version != ?", (self.version,))
+            self._conn.commit()
+        return self._conn
+
+    def _key(self, question, context):
+        raw = f"{self.version}\x00{context}\x00{normalize_question(question)}"
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def _remember(self, key, sql, stored_at):
+        self._memory[key] = (sql, stored_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    # ---------------- Public API ----------------
+    def get(self, question, context=""):
+        """Cached SQL for the question and how it was found ('memory', 'disk', 'similar'), or (None, None)."""
+        key = self._key(question, context)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and now - entry[1] < self.ttl:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return entry[0], "memory"
+
+            db = self._db()
+            row = db.execute("SELECT sql, created_at FROM sql_cache WHERE key = ? AND created_at > ?",
+                             (key, now - self.ttl)).fetchone()
+            if row:
+                db.execute("UPDATE sql_cache SET last_used = ? WHERE key = ?", (now, key))
+                db.commit()
+                self._remember(key, row[0], row[1])
+                self.stats["disk_hits"] += 1
+                return row[0], "disk"
+
+            sql = self._similar(db, question, context, now)
+            if sql is not None:
+                self._remember(key, sql, now)
+                self.stats["similar_hits"] += 1
+                return sql, "similar"
+
+            self.stats["misses"] += 1
+            return None, None
+
+    def _context_candidates(self, db, context, now):
+        """The similarity index of a context, read from disk on first use."""
+        if context not in self._candidates:
+            rows = db.execute(
+                """SELECT question, sql, created_at FROM sql_cache
+                   WHERE version = ? AND context = ? AND created_at > ?
+                   ORDER BY last_used DESC LIMIT ?""",
+                (self.version, context, now - self.ttl, SIMILARITY_CANDIDATES),
+            ).fetchall()
+            self._set_candidates(context, [list(row) for row in reversed(rows)])
+        return self._candidates[context]
+
+    def _set_candidates(self, context, entries):
+        index = TfidfIndex([question for question, _, _ in entries])
+        self._candidates[context] = (index, entries, {question: i for i, (question, _, _) in enumerate(entries)})
+
+    def _add_candidate(self, context, question, sql, now):
+        if context not in self._candidates:
+            return  # read from disk, this entry included, on the context's first similarity lookup
+        index, entries, positions = self._candidates[context]
+        if question in positions:
+            entries[positions[question]][1:] = [sql, now]
+            return
+        positions[question] = len(entries)
+        entries.append([question, sql, now])
+        index.add(question)
+        if len(entries) > SIMILARITY_CANDIDATES:
+            self._set_candidates(context, entries[-SIMILARITY_CANDIDATES:])
+
+    def _similar(self, db, question, context, now):
+        index, entries, _ = self._context_candidates(db, context, now)
+        if not entries:
+            return None
+        words = set(tokenize(question))
+        for i, score in index.search(question, k=3):
+            if score < self.similarity:
+                break
+            cached_question, sql, stored_at = entries[i]
+            if now - stored_at < self.ttl and (words ^ set(tokenize(cached_question))) <= FILLER_WORDS:
+                return sql
+        return None
+
+    def put(self, question, sql, context=""):
+        key = self._key(question, context)
+        now = time.time()
+        with self._lock:
+            self._remember(key, sql, now)
+            db = self._db()
+            db.execute(
+                """INSERT OR REPLACE INTO sql_cache (key, version, context, question, sql, created_at, last_used)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                (key, self.version, context, normalize_question(question), sql, now, now),
+            )
+            self._add_candidate(context, normalize_question(question), sql, now)
+            # Evict expired entries, then the least recently used beyond the size cap
+            db.execute("DELETE FROM sql_cache WHERE created_at <= ?", (now - self.ttl,))
+            db.execute(
+                """DELETE FROM sql_cache WHERE key IN (
+                       SELECT key FROM sql_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)""",
+                (self.disk_entries,),
+            )
+            db.commit()
+            self.stats["stores"] += 1
+
+    def invalidate(self):
+        """Drop every cached entry, in memory and on disk."""
+        with self._lock:
+            self._memory.clear()
+            self._candidates.clear()
+            db = self._db()
+            db.execute("DELETE FROM sql_cache")
+            db.commit()
+
+    def hit_rate(self):
+        hits = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["similar_hits"]
+        total = hits + self.stats["misses"]
+        return hits / total if total else 0.0
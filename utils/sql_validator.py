@@ -1,36 +1,172 @@
 # utils/sql_validator.py
 import re
+from collections import namedtuple
+
+Token = namedtuple("Token", "kind value depth")
+
+# Statement keywords that change data, schema, permissions or session state
+FORBIDDEN_KEYWORDS = {
+    "insert", "update", "delete", "merge", "truncate", "drop", "alter", "create", "grant", "revoke", "copy",
+    "call", "execute", "prepare", "deallocate", "vacuum", "reindex", "cluster", "refresh", "lock", "listen",
+    "notify", "unlisten", "discard", "reset", "import", "into",
+}
+
+# Words after FOR that make it a row-locking clause (FOR UPDATE, FOR NO KEY UPDATE, FOR SHARE, FOR KEY SHARE)
+LOCKING_WORDS = {"update", "no", "share", "key"}
+
+# Functions that sleep, touch the server's files, signal backends or change settings
+FORBIDDEN_FUNCTIONS = {
+    "pg_sleep", "pg_sleep_for", "pg_sleep_until", "pg_read_file", "pg_read_binary_file", "pg_ls_dir",
+    "pg_stat_file", "pg_terminate_backend", "pg_cancel_backend", "pg_reload_conf", "pg_rotate_logfile",
+    "set_config", "dblink", "dblink_exec", "lo_import", "lo_export", "lo_unlink", "pg_notify",
+    "pg_advisory_lock", "pg_advisory_xact_lock", "pg_try_advisory_lock", "pg_try_advisory_xact_lock",
+}
+
+TOKEN_PATTERNS = [
+    ("ws", r"\s+"),
+    ("comment", r"--[^\n]*|/\*.*?\*/"),
+    ("string", r"[eE]'(?:[^'\\]|\\.|'')*'|'(?:[^']|'')*'"),  # E'...' strings also take backslash escapes
+    ("dollar", r"\$\$.*?\$\$|\$(?P<tag>[A-Za-z_]\w*)\$.*?\$(?P=tag)\$"),
+    ("ident", r'"(?:[^"]|"")+"'),
+    ("number", r"\d+(?:\.\d*)?(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?"),
+    ("param", r"\$\d+"),
+    ("word", r"[^\W\d][\w$]*"),
+    ("unterminated", r"/\*|['\"]|\$(?:[A-Za-z_]\w*)?\$"),
+    ("op", r"::|<=|>=|<>|!=|\|\||->>|->|#>>|#>|[-+*/%^<>=~!@#&|.,;()\[\]:]"),
+]
+TOKEN_RE = re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in TOKEN_PATTERNS), re.DOTALL)
+
+
+class QueryRejected(ValueError):
+    """The planner's estimate for a query is over the configured cost or row limits."""
+
+
+def tokenize(sql):
+    """
+    Split SQL into tokens with their parenthesis depth.
+
+    Strings, quoted identifiers, dollar-quoted bodies and comments are single
+    tokens, so keywords inside them are never mistaken for SQL.
+    """
+    tokens = []
+    depth = 0
+    pos = 0
+    while pos < len(sql):
+        match = TOKEN_RE.match(sql, pos)
+        if match is None:
+            raise ValueError(f"Could not parse the SQL near: {sql[pos:pos + 20]!r}")
+        kind, value = match.lastgroup, match.group()
+        if kind == "unterminated":
+            raise ValueError(f"Unterminated comment or quoted text in the SQL near: {sql[pos:pos + 20]!r}")
+        if value == ")":
+            depth -= 1
+            if depth < 0:
+                raise ValueError("Unbalanced parentheses in the SQL.")
+        tokens.append(Token(kind, value, depth))
+        if value == "(":
+            depth += 1
+        pos = match.end()
+    if depth:
+        raise ValueError("Unbalanced parentheses in the SQL.")
+    return tokens
+
+
+def code_tokens(sql):
+    return [t for t in tokenize(sql) if t.kind not in ("ws", "comment")]
+
+
+def strip_trailing(sql):
+    """The SQL cut after its last token that is not a semicolon, comment or whitespace."""
+    tokens = tokenize(sql)
+    end = max((i for i, t in enumerate(tokens) if t.kind not in ("ws", "comment") and t.value != ";"), default=-1)
+    return "".join(t.value for t in tokens[:end + 1])
+
 
 def validate_sql(sql: str) -> str:
     """
-    Basic SQL validation for PostgreSQL PMAY-G pipeline.
+    SQL validation for PostgreSQL PMAY-G pipeline.
 
     Rules:
-    - Only allow SELECT queries or CTEs (WITH ... SELECT ...)
-    - Block dangerous operations
+    - Only a single SELECT query or CTE (WITH ... SELECT ...)
+    - No data-changing statements, SELECT INTO or locking clauses
+    - No server-side functions that sleep, read files or signal other sessions
     - Strip extra backticks or triple quotes
+
+    Keywords are matched on whole tokens, so identifiers such as
+    updated_total, strings and comments are not rejected.
     """
+    # Remove extra backticks or triple quotes
+    sql = re.sub(r"```(?:sql)?", "", sql)
+    sql = re.sub(r'"""', "", sql)
     sql = sql.strip()
 
-    # Accept queries starting with SELECT or WITH
-    if not (sql.lower().startswith("select") or sql.lower().startswith("with")):
+    tokens = code_tokens(sql)
+    if not tokens:
+        raise ValueError("Empty SQL query.")
+
+    # A trailing semicolon is allowed; anything after one is another statement
+    while tokens and tokens[-1].value == ";":
+        tokens.pop()
+    if any(t.value == ";" for t in tokens):
+        raise ValueError("Multiple statements detected; only single SELECT allowed.")
+
+    first = next((t for t in tokens if t.value != "("), None)
+    if first is None or first.value.lower() not in ("select", "with"):
         raise ValueError("Only SELECT queries or CTE-based SELECT queries are allowed.")
 
-    # Forbidden keywords
-    forbidden = [
-        "delete", "drop", "update", "insert", "truncate", "alter", "grant", "revoke"
-    ]
-    if any(word in sql.lower() for word in forbidden):
-        raise ValueError("Query contains forbidden operations.")
+    for i, token in enumerate(tokens):
+        if token.kind != "word":
+            continue
+        word = token.value.lower()
+        if word in FORBIDDEN_KEYWORDS:
+            raise ValueError(f"Query contains forbidden operations ({word.upper()}).")
+        if word == "for" and i + 1 < len(tokens) and tokens[i + 1].value.lower() in LOCKING_WORDS:
+            raise ValueError("Query contains a locking clause (FOR UPDATE/SHARE).")
+        if word in FORBIDDEN_FUNCTIONS and i + 1 < len(tokens) and tokens[i + 1].value == "(":
+            raise ValueError(f"Query calls a function that is not allowed ({word}).")
 
-    # Remove extra backticks or triple quotes
-    sql = re.sub(r"```", "", sql)
-    sql = re.sub(r'"""', "", sql)
+    # Return cleaned SQL, without the trailing semicolon or any comment after it
+    return strip_trailing(sql)
 
-    # Optional: ensure no semicolons mid-query except at end
-    sql_parts = sql.split(";")
-    if len(sql_parts) > 2:
-        raise ValueError("Multiple statements detected; only single SELECT allowed.")
 
-    # Return cleaned SQL
-    return sql.strip()
\ No newline at end of file
+# ---------------- Row limits ----------------
+def has_limit(sql):
+    """Whether the outer query already has a LIMIT or FETCH clause."""
+    return any(t.kind == "word" and t.depth == 0 and t.value.lower() in ("limit", "fetch") for t in code_tokens(sql))
+
+
+def add_limit(sql, rows):
+    """Cap the outer query at `rows` rows; trailing semicolons and comments are dropped first."""
+    if has_limit(sql):
+        return sql
+    return f"{strip_trailing(sql)}\nLIMIT {int(rows)}"
+
+
+# ---------------- EXPLAIN plans ----------------
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get("Plans", ()):
+        yield from plan_nodes(child)
+
+
+def plan_estimates(plan):
+    """(total cost, result rows, largest row estimate of any plan node) from an EXPLAIN (FORMAT JSON) plan."""
+    return plan["Total Cost"], plan["Plan Rows"], max(node["Plan Rows"] for node in plan_nodes(plan))
+
+
+def check_plan(plan, max_cost, max_node_rows):
+    """
+    Raise QueryRejected when the planner expects the query to be too expensive
+    to run. A cost of None (engines that only estimate rows) skips the cost check.
+    """
+    cost, _, node_rows = plan_estimates(plan)
+    if cost is not None and cost > max_cost:
+        raise QueryRejected(
+            f"Query rejected: estimated cost {cost:,.0f} is over the limit of {max_cost:,.0f}. "
+            "Filter on a place or indicator, or aggregate, to narrow it down."
+        )
+    if node_rows > max_node_rows:
+        raise QueryRejected(
+            f"Query rejected: a step of the plan is expected to produce {node_rows:,.0f} rows "
+            f"(limit {max_node_rows:,.0f}), usually a join without a join condition."
+        )
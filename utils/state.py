@@ -2,6 +2,13 @@ from typing import TypedDict, List, Any
 
 class State(TypedDict):
     messages: List[str]     # Conversation history
+    trace_id: str           # Groups the trace spans of one question
+    places: List[dict]      # Geography rows matched in the question
     sql_query: str          # Generated SQL
-    query_result: Any       # Result after execution
-    insights: str           # Insights based on result
\ No newline at end of file
+    sql_source: str         # Where the SQL came from: 'template', 'cache' or 'llm'
+    result_source: str      # Where the result came from: 'db' or 'cache'
+    result_key: str         # Data version and SQL fingerprint of the result, None when unknown
+    query_result: Any       # Result after execution (a DataFrame, or an error dict)
+    query_truncated: bool   # True when the result was cut at MAX_RESULT_ROWS
+    insights: str           # Insights based on result
+    visualization: Any      # Plotly figure for the result, or None
\ No newline at end of file
@@ -0,0 +1,65 @@
+# utils/tfidf.py
+import math
+import re
+from collections import Counter
+
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(str(text).casefold())
+
+
+class TfidfIndex:
+    """
+    Small in-memory TF-IDF index with cosine-similarity search. Documents can be
+    added after construction; the weights are recomputed on the next search.
+    """
+
+    def __init__(self, documents=()):
+        self._counts = []
+        self._doc_freq = Counter()
+        self._vectors = None
+        for doc in documents:
+            self.add(doc)
+
+    def add(self, document):
+        counts = Counter(tokenize(document))
+        self._counts.append(counts)
+        self._doc_freq.update(counts.keys())
+        self._vectors = None
+
+    def _refresh(self):
+        """Recompute the idf and document vectors if documents were added since the last search."""
+        if self._vectors is None:
+            n = len(self._counts)
+            self._unseen_idf = math.log(1 + n) + 1
+            self.idf = {term: math.log((1 + n) / (1 + df)) + 1 for term, df in self._doc_freq.items()}
+            self._vectors = [self._weigh(c) for c in self._counts]
+
+    @property
+    def vectors(self):
+        self._refresh()
+        return self._vectors
+
+    def __len__(self):
+        return len(self._counts)
+
+    def _weigh(self, counts):
+        vec = {term: tf * self.idf.get(term, self._unseen_idf) for term, tf in counts.items()}
+        norm = math.sqrt(sum(w * w for w in vec.values())) or 1.0
+        return {term: w / norm for term, w in vec.items()}
+
+    def vector(self, text):
+        self._refresh()
+        return self._weigh(Counter(tokenize(text)))
+
+    def search(self, text, k=5):
+        """[(document index, cosine similarity)] for the k most similar documents."""
+        query = self.vector(text)
+        scores = [
+            (i, sum(w * doc.get(term, 0.0) for term, w in query.items()))
+            for i, doc in enumerate(self._vectors)
+        ]
+        scores.sort(key=lambda item: item[1], reverse=True)
+        return scores[:k]
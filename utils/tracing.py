@@ -0,0 +1,274 @@
+# utils/tracing.py
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") != "0"
+BUFFER_SIZE = int(os.getenv("TRACE_BUFFER_SIZE", "20000"))          # spans kept in memory for percentiles
+JSONL_PATH = os.getenv("TRACE_JSONL_PATH", os.path.join(PROJECT_ROOT, ".cache", "traces.jsonl"))
+PROMETHEUS_PATH = os.getenv("TRACE_PROMETHEUS_PATH", os.path.join(PROJECT_ROOT, ".cache", "metrics.prom"))
+PROMETHEUS_INTERVAL = float(os.getenv("TRACE_PROMETHEUS_INTERVAL", "15"))  # seconds between metric file writes
+FLUSH_INTERVAL = float(os.getenv("TRACE_FLUSH_INTERVAL", "1"))      # seconds between background JSONL writes
+JSONL_MAX_BYTES = int(float(os.getenv("TRACE_JSONL_MAX_MB", "50")) * 1024 * 1024)  # then rotated to <path>.1
+
+# Histogram bucket bounds in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Numeric span attributes summed into Prometheus counters
+COUNTED = ("rows", "prompt_tokens", "completion_tokens")
+
+_trace_id = contextvars.ContextVar("trace_id", default=None)
+_span_id = contextvars.ContextVar("span_id", default=None)
+
+_spans = deque(maxlen=BUFFER_SIZE)
+_lock = threading.Lock()
+_histograms = {}  # span name -> {"buckets": [...], "sum": float, "count": int, counters...}
+_last_export = [0.0]
+# Spans waiting for the background writer; the oldest are dropped if it falls this far behind
+_pending = deque(maxlen=BUFFER_SIZE)
+FLUSH_BATCH = 1000  # pending spans that wake the writer before FLUSH_INTERVAL is up
+
+
+def new_trace_id():
+    return uuid.uuid4().hex[:16]
+
+
+# ---------------- Recording ----------------
+def _store(span):
+    with _lock:
+        _spans.append(span)
+        hist = _histograms.setdefault(span["name"], {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0,
+                                                     **{key: 0 for key in COUNTED}, "cache_hits": 0})
+        seconds = span["duration_ms"] / 1000
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                hist["buckets"][i] += 1
+        hist["sum"] += seconds
+        hist["count"] += 1
+        attrs = span["attrs"]
+        for key in COUNTED:
+            value = attrs.get(key)
+            if isinstance(value, (int, float)):
+                hist[key] += value
+        hist["cache_hits"] += attrs.get("source") == "cache"
+    if JSONL_PATH or PROMETHEUS_PATH:
+        if JSONL_PATH:
+            _pending.append(span)
+        if not _writer:
+            _start_writer()
+        if len(_pending) >= FLUSH_BATCH:
+            _wake.set()
+
+
+# ---------------- Export ----------------
+# Files are written by one background thread, so recording a span (possibly on
+# the event loop) never waits for the disk.
+_file_lock = threading.Lock()
+_writer = []  # the writer thread, started with the first span
+_writer_lock = threading.Lock()
+_wake = threading.Event()
+
+
+def _start_writer():
+    with _writer_lock:
+        if not _writer:
+            thread = threading.Thread(target=_write_loop, name="trace-writer", daemon=True)
+            thread.start()
+            _writer.append(thread)
+
+
+def _write_loop():
+    while True:
+        _wake.wait(FLUSH_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+        except OSError as e:
+            print(f"[WARN] Could not write traces: {e}")
+
+
+def flush():
+    """
+    Append the pending spans to TRACE_JSONL_PATH and, when due, rewrite the
+    Prometheus file. The JSONL file is renamed to <path>.1 (replacing the
+    previous one) before it would grow past TRACE_JSONL_MAX_MB.
+    """
+    with _file_lock:
+        spans = []
+        while _pending:
+            spans.append(_pending.popleft())
+        if spans and JSONL_PATH:
+            data = to_jsonl(spans)
+            os.makedirs(os.path.dirname(JSONL_PATH), exist_ok=True)
+            try:
+                size = os.path.getsize(JSONL_PATH)
+            except FileNotFoundError:
+                size = 0
+            if size and size + len(data) > JSONL_MAX_BYTES:
+                os.replace(JSONL_PATH, f"{JSONL_PATH}.1")
+            with open(JSONL_PATH, "a") as f:
+                f.write(data)
+        if PROMETHEUS_PATH and time.monotonic() - _last_export[0] > PROMETHEUS_INTERVAL:
+            _last_export[0] = time.monotonic()
+            write_prometheus(PROMETHEUS_PATH)
+
+
+atexit.register(flush)  # spans recorded since the last background write
+
+
+def record(name, seconds, trace_id=None, **attrs):
+    """Record an operation that was already timed, as a child of the current span."""
+    if not TRACING_ENABLED:
+        return
+    _store({
+        "trace_id": trace_id or _trace_id.get(),
+        "span_id": uuid.uuid4().hex[:16],
+        "parent_id": _span_id.get(),
+        "name": name,
+        "start": time.time() - seconds,
+        "duration_ms": seconds * 1000,
+        "attrs": attrs,
+    })
+
+
+@contextmanager
+def span(name, trace_id=None, **attrs):
+    """
+    Time the block as a span; spans opened inside it (DB queries, LLM calls,
+    worker threads started with asyncio.to_thread) become its children. Yields
+    the attribute dict, so the block can add results such as row counts.
+    """
+    if not TRACING_ENABLED:
+        yield attrs
+        return
+    span_id = uuid.uuid4().hex[:16]
+    parent_id = _span_id.get()
+    trace_token = _trace_id.set(trace_id or _trace_id.get() or new_trace_id())
+    span_token = _span_id.set(span_id)
+    started = time.time()
+    perf_started = time.perf_counter()
+    try:
+        yield attrs
+    except Exception as e:
+        attrs["error"] = type(e).__name__
+        raise
+    finally:
+        _store({
+            "trace_id": _trace_id.get(),
+            "span_id": span_id,
+            "parent_id": parent_id,
+            "name": name,
+            "start": started,
+            "duration_ms": (time.perf_counter() - perf_started) * 1000,
+            "attrs": attrs,
+        })
+        _span_id.reset(span_token)
+        _trace_id.reset(trace_token)
+
+
+# ---------------- LangGraph nodes ----------------
+def update_attrs(update):
+    """Span attributes taken from a node's state update."""
+    attrs = {}
+    if not isinstance(update, dict):
+        return attrs
+    result = update.get("query_result")
+    if hasattr(result, "shape"):
+        attrs["rows"] = int(result.shape[0])
+    elif isinstance(result, dict) and "error" in result:
+        attrs["error"] = "query"
+    for key in ("sql_source", "result_source"):
+        if key in update:
+            attrs["source"] = update[key]
+    return attrs
+
+
+def traced_node(name, fn):
+    """Wrap a (sync or async) LangGraph node in a 'node.<name>' span, joined to the state's trace_id."""
+    if inspect.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        async def wrapper(state):
+            with span(f"node.{name}", trace_id=state.get("trace_id")) as attrs:
+                update = await fn(state)
+                attrs.update(update_attrs(update))
+                return update
+    else:
+        @functools.wraps(fn)
+        def wrapper(state):
+            with span(f"node.{name}", trace_id=state.get("trace_id")) as attrs:
+                update = fn(state)
+                attrs.update(update_attrs(update))
+                return update
+    return wrapper
+
+
+# ---------------- Reporting ----------------
+def recent_spans(window_seconds=None):
+    with _lock:
+        spans = list(_spans)
+    if window_seconds is None:
+        return spans
+    cutoff = time.time() - window_seconds
+    return [s for s in spans if s["start"] >= cutoff]
+
+
+def to_jsonl(spans):
+    return "".join(json.dumps(s, default=str) + "\n" for s in spans)
+
+
+def stage_percentiles(window_seconds=None):
+    """{span name: {count, p50, p95, p99, max}} in milliseconds over the recent window."""
+    durations = {}
+    for s in recent_spans(window_seconds):
+        durations.setdefault(s["name"], []).append(s["duration_ms"])
+    stats = {}
+    for name, values in sorted(durations.items()):
+        values = np.asarray(values)
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        stats[name] = {"count": len(values), "p50": p50, "p95": p95, "p99": p99, "max": values.max()}
+    return stats
+
+
+def prometheus_text():
+    """All spans since start-up in the Prometheus text exposition format."""
+    lines = [
+        "# HELP pmayg_span_duration_seconds Duration of pipeline stages, DB queries and LLM calls.",
+        "# TYPE pmayg_span_duration_seconds histogram",
+    ]
+    with _lock:
+        histograms = {name: dict(hist, buckets=list(hist["buckets"])) for name, hist in _histograms.items()}
+    for name, hist in sorted(histograms.items()):
+        for bound, count in zip(BUCKETS, hist["buckets"]):
+            lines.append(f'pmayg_span_duration_seconds_bucket{{span="{name}",le="{bound}"}} {count}')
+        lines.append(f'pmayg_span_duration_seconds_bucket{{span="{name}",le="+Inf"}} {hist["count"]}')
+        lines.append(f'pmayg_span_duration_seconds_sum{{span="{name}"}} {hist["sum"]:.6f}')
+        lines.append(f'pmayg_span_duration_seconds_count{{span="{name}"}} {hist["count"]}')
+    for key, help_text in (("rows", "Rows returned by queries."),
+                           ("prompt_tokens", "LLM prompt tokens."),
+                           ("completion_tokens", "LLM completion tokens."),
+                           ("cache_hits", "Spans answered from a cache.")):
+        lines.append(f"# HELP pmayg_{key}_total {help_text}")
+        lines.append(f"# TYPE pmayg_{key}_total counter")
+        for name, hist in sorted(histograms.items()):
+            if hist[key]:
+                lines.append(f'pmayg_{key}_total{{span="{name}"}} {hist[key]}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path=PROMETHEUS_PATH):
+    """Write prometheus_text() atomically, e.g. for node_exporter's textfile collector."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        f.write(prometheus_text())
+    os.replace(tmp, path)